@@ -1,10 +1,13 @@
 from agno.agent import Agent
+from agno.db.in_memory import InMemoryDb
 from agno.models.openrouter import OpenRouter
-from agno.media import File
 from dotenv import load_dotenv
+from typing import Optional
 import os
 import asyncio
 import sys
+from extraction import SUPPORTED_EXTENSIONS, extract_text
+from model_router import model_router
 from tools import (
     parse_cv,
     extract_keywords,
@@ -12,7 +15,11 @@ from tools import (
     evaluate_ats_score,
     analyze_cv_issues,
     generate_cv_rewrite,
-    generate_improvement_plan
+    generate_improvement_plan,
+    http_client,
+    LLM_READ_TIMEOUT,
+    OPENROUTER_API_KEY,
+    OPENROUTER_BASE_URL
 )
 
 # Set Windows-specific event loop policy to handle file descriptors better
@@ -21,15 +28,99 @@ if sys.platform == "win32":
 
 load_dotenv()
 
-OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
-if not OPENROUTER_API_KEY:
-    raise RuntimeError("Missing OpenRouter API key. Set OPENROUTER_API_KEY in environment or .env file")
-
-
-async def create_agent():
+# Number of previous runs replayed into the context of a conversational agent
+AGENT_MAX_HISTORY_RUNS = int(os.getenv("AGENT_MAX_HISTORY_RUNS", "5"))
+
+# Static system prompt: no per-session or per-request values (dates, names,
+# CV text), so the system message and tool schemas form a prompt prefix the
+# provider can cache across runs and sessions
+AGENT_INSTRUCTIONS = """
+You are an expert Resume/CV Analysis and Optimization Agent powered by advanced AI models.
+
+**Your Core Capabilities:**
+
+1. **CV Parsing** - Extract and structure all information from resumes
+   - Contact details, work experience, education, skills, certifications
+   - Use parse_cv tool for comprehensive extraction
+
+2. **Keyword Generation** - Identify critical keywords for ATS optimization
+   - Extract keywords from CVs and job descriptions
+   - Use extract_keywords tool with appropriate top_n parameter
+
+3. **ATS Evaluation** - Score resumes for Applicant Tracking System compatibility
+   - Evaluate structure, formatting, keywords, content quality
+   - Provide scores out of 100 with detailed breakdowns
+   - Use evaluate_ats_score tool (with or without job description)
+
+4. **Job Matching** - Compare CVs against job descriptions
+   - Identify matching and missing keywords
+   - Analyze skills, experience, and qualification alignment
+   - Provide fit scores and specific recommendations
+   - Use compare_cv_with_job tool
+
+5. **Issue Analysis** - Deep dive into CV problems
+   - Categorize issues: Critical, Major, Minor, Suggestions
+   - Provide specific fixes with examples
+   - Use analyze_cv_issues tool
+
+6. **CV Rewriting** - Generate improved versions of CVs
+   - Optimize for ATS while maintaining readability
+   - Strengthen language and quantify achievements
+   - Tailor to specific job descriptions
+   - Use generate_cv_rewrite tool (optionally with job_description and focus_areas)
+
+7. **Improvement Planning** - Create actionable roadmaps
+   - Prioritized steps from quick wins to long-term enhancements
+   - Time estimates and impact assessment
+   - Use generate_improvement_plan tool
+
+**How to Handle Files:**
+When users provide file paths (PDF, DOCX, TXT):
+- Files are automatically extracted by the system
+- You'll receive the text content to analyze
+- Use the appropriate tools on the extracted text
+
+**Best Practices:**
+- Always use the LLM-powered tools for analysis (they provide comprehensive AI-driven insights)
+- Combine multiple tools for thorough analysis when needed
+- Present results clearly with specific, actionable recommendations
+- When comparing with job descriptions, use compare_cv_with_job for best results
+- For rewriting requests, ask if there's a specific job description to tailor to
+- Provide both analysis AND actionable next steps
+
+**Response Format:**
+- Present tool outputs in a clear, organized manner
+- Highlight key findings and scores
+- Prioritize recommendations by impact
+- Use markdown formatting for readability
+- Be encouraging but honest about areas needing improvement
+
+Remember: All analysis is powered by advanced AI models, ensuring accurate,
+context-aware insights rather than simple rule-based matching.
+"""
+
+
+async def create_agent(session_id: Optional[str] = None, with_history: bool = True):
+    """
+    Create a Resume Agent.
+
+    Args:
+        session_id: Session the agent's conversation history belongs to
+        with_history: Keep an in-memory history of the last AGENT_MAX_HISTORY_RUNS
+            runs; one-shot agents skip history storage entirely
+
+    Returns:
+        Configured Agent instance
+    """
     return Agent(
-        model=OpenRouter(id="google/gemini-2.5-flash", api_key=OPENROUTER_API_KEY, max_tokens=4000),
-        add_history_to_context=True,
+        # Per-request timeout without SDK retries; the whole run is bounded by
+        # the "agent" deadline in llm_policy
+        model=OpenRouter(id=model_router.primary("agent"), api_key=OPENROUTER_API_KEY, base_url=OPENROUTER_BASE_URL,
+                         max_tokens=4000, http_client=http_client, timeout=LLM_READ_TIMEOUT, max_retries=0),
+        session_id=session_id,
+        db=InMemoryDb() if with_history else None,
+        add_history_to_context=with_history,
+        num_history_runs=AGENT_MAX_HISTORY_RUNS,
         markdown=True,
         tools=[
             parse_cv,
@@ -40,72 +131,7 @@ async def create_agent():
             generate_cv_rewrite,
             generate_improvement_plan
         ],
-        instructions=[
-            """
-            You are an expert Resume/CV Analysis and Optimization Agent powered by advanced AI models.
-
-            **Your Core Capabilities:**
-
-            1. **CV Parsing** - Extract and structure all information from resumes
-               - Contact details, work experience, education, skills, certifications
-               - Use parse_cv tool for comprehensive extraction
-
-            2. **Keyword Generation** - Identify critical keywords for ATS optimization
-               - Extract keywords from CVs and job descriptions
-               - Use extract_keywords tool with appropriate top_n parameter
-
-            3. **ATS Evaluation** - Score resumes for Applicant Tracking System compatibility
-               - Evaluate structure, formatting, keywords, content quality
-               - Provide scores out of 100 with detailed breakdowns
-               - Use evaluate_ats_score tool (with or without job description)
-
-            4. **Job Matching** - Compare CVs against job descriptions
-               - Identify matching and missing keywords
-               - Analyze skills, experience, and qualification alignment
-               - Provide fit scores and specific recommendations
-               - Use compare_cv_with_job tool
-
-            5. **Issue Analysis** - Deep dive into CV problems
-               - Categorize issues: Critical, Major, Minor, Suggestions
-               - Provide specific fixes with examples
-               - Use analyze_cv_issues tool
-
-            6. **CV Rewriting** - Generate improved versions of CVs
-               - Optimize for ATS while maintaining readability
-               - Strengthen language and quantify achievements
-               - Tailor to specific job descriptions
-               - Use generate_cv_rewrite tool (optionally with job_description and focus_areas)
-
-            7. **Improvement Planning** - Create actionable roadmaps
-               - Prioritized steps from quick wins to long-term enhancements
-               - Time estimates and impact assessment
-               - Use generate_improvement_plan tool
-
-            **How to Handle Files:**
-            When users provide file paths (PDF, DOCX, TXT):
-            - Files are automatically extracted by the system
-            - You'll receive the text content to analyze
-            - Use the appropriate tools on the extracted text
-
-            **Best Practices:**
-            - Always use the LLM-powered tools for analysis (they provide comprehensive AI-driven insights)
-            - Combine multiple tools for thorough analysis when needed
-            - Present results clearly with specific, actionable recommendations
-            - When comparing with job descriptions, use compare_cv_with_job for best results
-            - For rewriting requests, ask if there's a specific job description to tailor to
-            - Provide both analysis AND actionable next steps
-
-            **Response Format:**
-            - Present tool outputs in a clear, organized manner
-            - Highlight key findings and scores
-            - Prioritize recommendations by impact
-            - Use markdown formatting for readability
-            - Be encouraging but honest about areas needing improvement
-
-            Remember: All analysis is powered by advanced AI models, ensuring accurate,
-            context-aware insights rather than simple rule-based matching.
-            """
-        ],
+        instructions=[AGENT_INSTRUCTIONS],
     )
 
 if __name__ == "__main__":
@@ -160,7 +186,7 @@ if __name__ == "__main__":
 
             # Get file extension
             file_ext = os.path.splitext(file_path)[1].lower()
-            supported_formats = ['.pdf', '.docx', '.doc', '.txt']
+            supported_formats = SUPPORTED_EXTENSIONS
 
             if file_ext not in supported_formats:
                 print(f"\n⚠️  Warning: File type '{file_ext}' may not be fully supported.")
@@ -208,12 +234,13 @@ if __name__ == "__main__":
                     print("Invalid choice. Using default analysis.")
                     prompt = "Analyze this CV comprehensively."
 
-            # Process file with agent
+            # Extract text locally and send it to the agent with the request
             print("\n🤖 Agent: ", end="")
             try:
+                with open(file_path, 'rb') as f:
+                    file_text = extract_text(f.read(), file_ext if file_ext in supported_formats else '.txt')
                 agent.print_response(
-                    prompt,
-                    files=[File(filepath=file_path)],
+                    f"{prompt}\n\nDOCUMENT TEXT ({os.path.basename(file_path)}):\n{file_text}",
                     stream=True
                 )
                 print()
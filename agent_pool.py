@@ -0,0 +1,117 @@
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
+import os
+import time
+
+from agent import create_agent
+
+AGENT_POOL_MAX_SESSIONS = int(os.getenv("AGENT_POOL_MAX_SESSIONS", "256"))
+AGENT_POOL_IDLE_TTL = float(os.getenv("AGENT_POOL_IDLE_TTL", "1800"))
+
+
+class _PooledAgent:
+    """A session's agent plus the lock that serializes runs on its history"""
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        # Runs holding or waiting for the lock; the session is not evicted while any are left
+        self.users = 0
+
+
+class AgentPool:
+    """
+    Agents keyed by session ID so conversation history never crosses sessions.
+
+    Sessions are evicted least-recently-used once max_sessions is reached, and
+    dropped entirely after idle_ttl seconds without a run. A session with a run
+    in progress (or waiting) is never evicted. Each agent keeps at
+    most AGENT_MAX_HISTORY_RUNS previous runs in its context.
+    """
+
+    def __init__(self, max_sessions: int = AGENT_POOL_MAX_SESSIONS, idle_ttl: float = AGENT_POOL_IDLE_TTL):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, _PooledAgent]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _prune(self, now: float):
+        # Sessions with a run in progress are never evicted; they are reconsidered once released
+        idle = [sid for sid, entry in self._sessions.items() if not entry.users]
+        for sid in idle:
+            if now - self._sessions[sid].last_used > self.idle_ttl:
+                del self._sessions[sid]
+        for sid in idle:
+            if len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.pop(sid, None)
+
+    async def _get(self, session_id: str) -> _PooledAgent:
+        async with self._lock:
+            now = time.monotonic()
+            entry = self._sessions.get(session_id)
+            if entry is not None and not entry.users and now - entry.last_used > self.idle_ttl:
+                # Expired: the session starts over with a fresh agent and history
+                del self._sessions[session_id]
+                entry = None
+            if entry is None:
+                entry = _PooledAgent(await create_agent(session_id=session_id))
+                self._sessions[session_id] = entry
+            else:
+                self._sessions.move_to_end(session_id)
+            entry.last_used = now
+            # Counted before pruning so the requested session is never the one evicted
+            entry.users += 1
+            self._prune(now)
+            return entry
+
+    @asynccontextmanager
+    async def session(self, session_id: str):
+        """Yield the session's agent, holding it exclusively for one run"""
+        entry = await self.acquire(session_id)
+        try:
+            yield entry.agent
+        finally:
+            self.release(entry)
+
+    async def acquire(self, session_id: str) -> _PooledAgent:
+        """
+        Hold the session's agent exclusively for a run that may outlive the
+        caller, such as a stream whose client disconnected. Pair with release().
+        """
+        entry = await self._get(session_id)
+        try:
+            await entry.lock.acquire()
+        except BaseException:
+            entry.users -= 1
+            raise
+        return entry
+
+    def release(self, entry: _PooledAgent):
+        """Release a session acquired with acquire(); call on the event loop"""
+        entry.last_used = time.monotonic()
+        entry.users -= 1
+        entry.lock.release()
+        # Evictions skipped while the session was busy happen now
+        self._prune(entry.last_used)
+
+    async def evict(self, session_id: str) -> bool:
+        """Drop a session and its history; returns whether it existed"""
+        async with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    async def one_shot(self):
+        """Create a stateless agent for requests that need no history"""
+        return await create_agent(with_history=False)
+
+    def stats(self) -> dict:
+        return {
+            "active_sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "idle_ttl_seconds": self.idle_ttl,
+        }
@@ -1,21 +1,46 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Callable, List, Optional
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from agno.agent import Agent
+from agno.run.agent import RunEvent
 import os
 import asyncio
+import contextvars
+import functools
 import sys
-import tempfile
+import threading
 import json
-from agno.media import File as AgnoFile
+import time
+import uuid
+import zipfile
 
 # Set Windows-specific event loop policy
 if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
-from agent import create_agent
+from agent_pool import AgentPool
+from batch import (BATCH_MAX_ITEMS, ArchiveMemberTooLarge, BatchItem, TooManyArchiveMembers, items_from_zip, run_batch,
+                   run_shortlisted_batch)
+from jobs import JobQueue
+from prefilter import PREFILTER_MIN_SCORE, PREFILTER_TOP_K
+from report import REPORT_SECTIONS, build_report, report_steps
+from search_index import SEARCH_INDEX_ENABLED, SearchIndex
+from cache import in_flight, response_cache, bypass as bypass_cache
+from model_router import model_router
+from rate_limit import rate_limiter
+import compaction
+import extraction
+import llm_policy
+import metrics
+import tools
+import tracing
+import uploads
+from extraction import ExtractionError, SUPPORTED_EXTENSIONS, extract_text_async
+from uploads import UPLOAD_MAX_FILE_BYTES, UploadLimitMiddleware, UploadRoute, charge_upload, read_upload
 
 load_dotenv()
 
@@ -24,6 +49,8 @@ app = FastAPI(
     description="AI-powered Resume/CV Analysis and Optimization API",
     version="1.0.0"
 )
+# Routes parse uploads with the app's own memory/disk spooling threshold
+app.router.route_class = UploadRoute
 
 # Configure CORS
 app.add_middleware(
@@ -34,21 +61,277 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store agent instance
-agent_instance = None
+# Bounds multipart bodies while they are received
+app.add_middleware(UploadLimitMiddleware)
+
+@app.middleware("http")
+async def cache_control_middleware(request: Request, call_next):
+    """Honour 'Cache-Control: no-cache' by skipping cached LLM responses"""
+    if "no-cache" in request.headers.get("cache-control", "").lower():
+        with bypass_cache():
+            return await call_next(request)
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def token_savings_middleware(request: Request, call_next):
+    """Collect prompt compaction savings and provider cache hits for the request and report them in headers"""
+    with compaction.track() as savings:
+        response = await call_next(request)
+    if savings.original_tokens:
+        response.headers["X-Tokens-Saved"] = str(savings.original_tokens - savings.sent_tokens)
+    if savings.cached_tokens:
+        response.headers["X-Tokens-Cached"] = str(savings.cached_tokens)
+    return response
+
+
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    """Record per-route latency and in-flight requests for /metrics"""
+    started = time.perf_counter()
+    in_flight = metrics.HTTP_REQUESTS_IN_FLIGHT.labels(request.method)
+    in_flight.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        in_flight.dec()
+        # Route templates keep label cardinality bounded; unknown paths share one label
+        route = request.scope.get("route")
+        metrics.observe_request(request.method, getattr(route, "path", "unmatched"), status, started)
+
+
+@app.middleware("http")
+async def tracing_middleware(request: Request, call_next):
+    """Open the request's root span and return its trace ID in X-Trace-Id"""
+    with tracing.trace(f"{request.method} {request.url.path}", request.headers.get("traceparent"),
+                       **{"http.method": request.method, "http.path": request.url.path}) as root:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None:
+            root.name = f"{request.method} {route.path}"
+        root.set(**{"http.status_code": response.status_code})
+    response.headers["X-Trace-Id"] = root.trace_id
+    return response
+
+
+# Pool of per-session agents, created on startup
+agent_pool = None
+
+# Background job queue for long-running analyses, created on startup
+job_queue = None
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "25"))
+
+# Semantic index of analyzed CVs, created on startup when SEARCH_INDEX_ENABLED
+search_index = None
+
+# Agent runs block (sync tools + sync HTTP client), so they are dispatched to a
+# bounded thread pool instead of running on the event loop. The pool size is the
+# maximum number of concurrent agent runs per process; extra requests queue.
+AGENT_MAX_WORKERS = int(os.getenv("AGENT_MAX_WORKERS", "8"))
+
+# Single-purpose endpoints either call their tool directly ("direct") or let
+# the agent pick the tool ("agent"); direct skips the tool-selection round trip
+API_TOOL_MODE = os.getenv("API_TOOL_MODE", "direct").lower()
+TOOL_MODES = ("direct", "agent")
+agent_executor = ThreadPoolExecutor(max_workers=AGENT_MAX_WORKERS, thread_name_prefix="agent-run")
+agent_runs_in_flight = 0
+metrics.track_agent_runs(lambda: agent_runs_in_flight)
 
 
 # Request/Response Models
 class ChatRequest(BaseModel):
     message: str
+    session_id: Optional[str] = None
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize the agent on startup"""
-    global agent_instance
-    agent_instance = await create_agent()
-    print("✅ Resume Agent initialized successfully")
+    """Initialize the agent pool, job workers and search index on startup"""
+    global agent_pool, job_queue, search_index
+    agent_pool = AgentPool()
+    job_queue = JobQueue(execute_job)
+    await job_queue.start()
+    if SEARCH_INDEX_ENABLED:
+        search_index = SearchIndex()
+    await tools.warm_up_connections()
+    print(f"✅ Resume Agent initialized successfully (agent pool size: {AGENT_MAX_WORKERS})")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop accepting agent work and release worker threads/processes"""
+    if job_queue is not None:
+        await job_queue.stop()
+    agent_executor.shutdown(wait=False, cancel_futures=True)
+    if search_index is not None:
+        search_index.close()
+    extraction.shutdown()
+    await tools.close_clients()
+
+
+async def run_agent(prompt: str, session_id: Optional[str] = None):
+    """
+    Run an agent in the worker pool without blocking the event loop.
+
+    With a session_id the run uses that session's agent and history; otherwise
+    a stateless one-shot agent is used.
+    """
+    if session_id:
+        # A run that missed its deadline is still winding down in its worker
+        # thread, so the session is released when the thread finishes
+        entry = await agent_pool.acquire(session_id)
+        return await _execute_agent_run(entry.agent, prompt, on_finished=lambda: agent_pool.release(entry))
+
+    agent = await agent_pool.one_shot()
+    return await _execute_agent_run(agent, prompt)
+
+
+async def _execute_agent_run(agent, prompt: str, on_finished: Optional[Callable[[], None]] = None):
+    global agent_runs_in_flight
+    run_id = uuid.uuid4().hex
+    call = functools.partial(agent.run, prompt, run_id=run_id)
+
+    def run_finished(_future):
+        global agent_runs_in_flight
+        agent_runs_in_flight -= 1
+        if on_finished is not None:
+            on_finished()
+
+    with tracing.span("agent.run", model=model_router.primary("agent")) as run_span:
+        # Copy the request context so context variables (and the span) are visible inside tools
+        ctx = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        agent_runs_in_flight += 1
+        future = loop.run_in_executor(agent_executor, ctx.run, call)
+        future.add_done_callback(run_finished)
+        try:
+            # Shielded: timing out must not mark the run finished while its thread still runs
+            run = await llm_policy.await_with_deadline("agent", asyncio.shield(future))
+        except llm_policy.LLMDeadlineExceeded:
+            Agent.cancel_run(run_id)
+            raise
+
+        run_metrics = getattr(run, "metrics", None)
+        if run_metrics is not None:
+            cached_tokens = getattr(run_metrics, "cache_read_tokens", 0) or 0
+            metrics.record_tokens("agent", model_router.primary("agent"), run_metrics.input_tokens,
+                                  run_metrics.output_tokens, cached_tokens)
+            compaction.record_cached_tokens(cached_tokens)
+            run_span.set(input_tokens=run_metrics.input_tokens or 0, output_tokens=run_metrics.output_tokens or 0,
+                         cached_tokens=cached_tokens)
+    return run
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_agent(prompt: str, session_id: Optional[str] = None, final: Optional[dict] = None):
+    """
+    Stream an agent run as Server-Sent Events.
+
+    Events: "content" (text delta), "tool_call_started", "tool_call_completed",
+    "error", and a closing "done" event carrying the response metadata.
+    """
+    if session_id:
+        # The run can outlive a disconnected client, so the session is released
+        # once the producer thread has stopped, not when this generator closes
+        entry = await agent_pool.acquire(session_id)
+        async for chunk in _stream_agent_run(entry.agent, prompt, final, on_finished=lambda: agent_pool.release(entry)):
+            yield chunk
+        return
+
+    agent = await agent_pool.one_shot()
+    async for chunk in _stream_agent_run(agent, prompt, final):
+        yield chunk
+
+
+async def _stream_agent_run(agent, prompt: str, final: Optional[dict], on_finished: Optional[Callable[[], None]] = None):
+    global agent_runs_in_flight
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
+    # Set when the client goes away or the deadline passes; the producer stops at the next event
+    stop = threading.Event()
+    run_id = uuid.uuid4().hex
+    deadline = time.monotonic() + llm_policy.tool_deadline("agent")
+
+    def produce():
+        # Runs in the worker pool; hands each event back to the event loop
+        try:
+            with tracing.span("agent.run", model=model_router.primary("agent"), stream=True) as run_span:
+                events = agent.run(prompt, stream=True, stream_events=True, run_id=run_id)
+                try:
+                    for event in events:
+                        if stop.is_set():
+                            run_span.set(cancelled=True)
+                            break
+                        run_metrics = getattr(event, "metrics", None)
+                        if run_metrics is not None and getattr(run_metrics, "input_tokens", None) is not None:
+                            run_span.set(input_tokens=run_metrics.input_tokens or 0, output_tokens=run_metrics.output_tokens or 0,
+                                         cached_tokens=getattr(run_metrics, "cache_read_tokens", 0) or 0)
+                        loop.call_soon_threadsafe(queue.put_nowait, event)
+                finally:
+                    events.close()
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+    def run_finished(_future):
+        global agent_runs_in_flight
+        agent_runs_in_flight -= 1
+        if on_finished is not None:
+            on_finished()
+
+    ctx = contextvars.copy_context()
+    agent_runs_in_flight += 1
+    future = loop.run_in_executor(agent_executor, ctx.run, produce)
+    future.add_done_callback(run_finished)
+    produced_all = False
+
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                yield sse_event("error", {"detail": "agent did not finish within its deadline"})
+                return
+            if item is finished:
+                produced_all = True
+                break
+            if isinstance(item, Exception):
+                yield sse_event("error", {"detail": str(item)})
+                return
+
+            event_type = getattr(item, "event", None)
+            if event_type == RunEvent.run_content.value and isinstance(item.content, str) and item.content:
+                yield sse_event("content", {"delta": item.content})
+            elif event_type in (RunEvent.tool_call_started.value, RunEvent.tool_call_completed.value):
+                tool = getattr(item, "tool", None)
+                name = "tool_call_started" if event_type == RunEvent.tool_call_started.value else "tool_call_completed"
+                yield sse_event(name, {"tool": tool.tool_name if tool else None})
+            elif event_type == RunEvent.run_error.value:
+                yield sse_event("error", {"detail": str(getattr(item, "content", "") or "Agent run failed")})
+                return
+
+        yield sse_event("done", final or {"success": True})
+    finally:
+        stop.set()
+        if not produced_all and not future.done():
+            Agent.cancel_run(run_id)
+
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.get("/")
@@ -66,25 +349,280 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "agent_initialized": agent_instance is not None
+        "agent_initialized": agent_pool is not None,
+        "agent_pool_size": AGENT_MAX_WORKERS,
+        "agent_runs_in_flight": agent_runs_in_flight,
+        "agent_sessions": agent_pool.stats() if agent_pool is not None else None,
+        "jobs": await job_queue.stats() if job_queue is not None else None,
+        "search_index": search_index.stats() if search_index is not None else None,
+        "rate_limits": rate_limiter.stats(),
+        "llm_calls": llm_policy.stats(),
+        "model_routing": model_router.stats(),
+        "prompt_compaction": compaction.stats(),
+        "uploads": uploads.stats()
     }
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics in text exposition format"""
+    # Collecting reads the SQLite cache tier
+    body, content_type = await asyncio.to_thread(metrics.render)
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """LLM response cache hit/miss counters and in-flight call coalescing"""
+    return {**(await asyncio.to_thread(response_cache.stats)), "coalescing": in_flight.stats()}
+
+
+@app.delete("/cache")
+async def clear_cache():
+    """Drop all cached LLM responses"""
+    await asyncio.to_thread(response_cache.clear)
+    return {"success": True}
+
+
+@app.get("/search")
+async def search_cvs(
+    q: str = Query(..., min_length=2),
+    top_k: int = Query(default=10, ge=1, le=100),
+    section: Optional[str] = Query(default=None)
+):
+    """
+    Semantic search over previously analyzed CVs
+    - q: free-text query, e.g. "Kubernetes SRE with fintech background"
+    - section: optionally restrict matches to one section (experience, skills, ...)
+    """
+    if search_index is None:
+        raise HTTPException(status_code=503, detail="Search index not enabled")
+
+    try:
+        results = await search_index.asearch(q, top_k, section.lower() if section else None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+    return {"success": True, "query": q, "results": results}
+
+
+@app.delete("/search/{cv_hash}")
+async def remove_from_search(cv_hash: str):
+    """Remove a CV from the search index"""
+    if search_index is None:
+        raise HTTPException(status_code=503, detail="Search index not enabled")
+
+    removed = await asyncio.to_thread(search_index.remove, cv_hash)
+    if not removed:
+        raise HTTPException(status_code=404, detail="CV not found in search index")
+    return {"success": True, "cv_hash": cv_hash, "chunks_removed": removed}
+
+
 async def process_file_input(file: UploadFile, input_name: str = "file"):
-    """Helper function to process uploaded files"""
-    allowed_extensions = ['.pdf', '.docx', '.doc', '.txt']
+    """Helper function to extract plain text from uploaded files"""
     file_ext = os.path.splitext(file.filename)[1].lower()
 
-    if file_ext not in allowed_extensions:
+    if file_ext not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type for {input_name}. Allowed: {', '.join(SUPPORTED_EXTENSIONS)}"
+        )
+
+    content = await read_upload(file, input_name)
+    try:
+        text = await extract_text_async(content, file_ext)
+    except ExtractionError as e:
+        raise HTTPException(status_code=400, detail=f"Could not read {input_name}: {str(e)}")
+
+    return text, file.filename
+
+
+def has_input(file: Optional[UploadFile], text: Optional[str]) -> bool:
+    """Check for an actual uploaded file or non-empty text"""
+    has_file = file is not None and hasattr(file, 'filename')
+    has_text = text is not None and isinstance(text, str) and text.strip() != ""
+    return has_file or has_text
+
+
+async def read_input(file: Optional[UploadFile], text: Optional[str], input_name: str):
+    """
+    Resolve a file-or-text input to plain text.
+
+    Returns:
+        (content, input_type, filename) - all None when nothing was provided
+    """
+    if file is not None and hasattr(file, 'filename'):
+        content, filename = await process_file_input(file, input_name)
+        if input_name == "CV":
+            index_cv(content, filename)
+        return content, "file", filename
+    if text is not None and isinstance(text, str) and text.strip() != "":
+        if input_name == "CV":
+            index_cv(text)
+        return text, "text", None
+    return None, None, None
+
+
+def index_cv(cv_content: str, filename: Optional[str] = None):
+    """Queue a CV for the search index; upgraded to parsed sections once parse_cv has run"""
+    if search_index is None:
+        return
+    # Indexing is a side effect: it must never fail the request that uploaded the CV
+    try:
+        search_index.schedule(
+            tools.cv_content_hash(cv_content), cv_content, filename, tools.cached_cv_document(cv_content)
+        )
+    except Exception as e:
+        print(f"⚠️ Search indexing failed: {str(e)}")
+
+
+def resolve_mode(mode: Optional[str]) -> str:
+    """Validate the requested execution mode, falling back to API_TOOL_MODE"""
+    mode = (mode or API_TOOL_MODE).strip().lower()
+    if mode not in TOOL_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid mode '{mode}'. Allowed: {', '.join(TOOL_MODES)}")
+    return mode
+
+
+def resolve_keyword_mode(keyword_mode: Optional[str]) -> str:
+    """Validate the keyword extraction engine, falling back to KEYWORD_MODE"""
+    keyword_mode = (keyword_mode or tools.KEYWORD_MODE).strip().lower()
+    if keyword_mode not in tools.KEYWORD_MODES:
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported file type for {input_name}. Allowed: {', '.join(allowed_extensions)}"
+            detail=f"Invalid keyword_mode '{keyword_mode}'. Allowed: {', '.join(tools.KEYWORD_MODES)}"
         )
+    return keyword_mode
+
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp_file:
-        content = await file.read()
-        tmp_file.write(content)
-        return tmp_file.name, file.filename
+def build_result(cv_input_type: str, cv_filename: Optional[str], jd_input_type: Optional[str] = None,
+                 jd_filename: Optional[str] = None, **content) -> dict:
+    """Assemble the common response envelope"""
+    result = {"success": True, "cv_input_type": cv_input_type}
+    if cv_filename:
+        result["cv_filename"] = cv_filename
+    if jd_input_type:
+        result["jd_input_type"] = jd_input_type
+    if jd_filename:
+        result["jd_filename"] = jd_filename
+    result.update(content)
+    savings = compaction.current_savings()
+    if savings is not None and savings.original_tokens:
+        result["token_savings"] = savings.to_dict()
+    return result
+
+
+# Analysis operations shared by the endpoints and the background job workers.
+# Each takes already-extracted text and returns the model output.
+
+DEFAULT_ANALYZE_PROMPT = "Analyze this CV comprehensively and provide detailed insights."
+
+
+async def run_analyze(cv_content: str, jd_content: Optional[str] = None,
+                      prompt: str = DEFAULT_ANALYZE_PROMPT, session_id: Optional[str] = None) -> str:
+    response = await run_agent(analyze_prompt(cv_content, jd_content, prompt), session_id=session_id)
+    return response.content
+
+
+async def stream_report(cv_content: str, jd_content: Optional[str], top_n: int, keyword_mode: Optional[str], final: dict):
+    """
+    Stream the full report as Server-Sent Events: one "section" event per
+    finished step, then "done" carrying the response metadata.
+    """
+    with compaction.track() as savings:
+        failed = 0
+        async for name, value, error, elapsed in report_steps(cv_content, jd_content, top_n, keyword_mode):
+            failed += error is not None
+            yield sse_event("section", {"section": name, "result": value, "error": error, "elapsed_ms": elapsed})
+        if savings.original_tokens:
+            final = {**final, "token_savings": savings.to_dict()}
+    yield sse_event("done", {**final, "success": failed == 0})
+
+
+def analyze_prompt(cv_content: str, jd_content: Optional[str], prompt: str) -> str:
+    prompt += f"\n\nCV TEXT:\n{cv_content}"
+    if jd_content:
+        prompt += f"\n\nJob Description:\n{jd_content}"
+    return prompt
+
+
+async def run_parse(cv_content: str, mode: str) -> str:
+    if mode == "direct":
+        parsed = await tools.aparse_cv(cv_content)
+    else:
+        prompt = "Parse this CV and extract all structured information in detail using the parse_cv tool."
+        prompt += f"\n\nCV TEXT:\n{cv_content}"
+        parsed = (await run_agent(prompt)).content
+    # The parsed document is cached now: upgrade the index to its sections
+    index_cv(cv_content)
+    return parsed
+
+
+async def run_ats_score(cv_content: str, jd_content: Optional[str], mode: str) -> str:
+    if mode == "direct":
+        return await tools.aevaluate_ats_score(cv_content, jd_content)
+    prompt = "Evaluate this CV for ATS compatibility and provide a detailed score with recommendations using the evaluate_ats_score tool."
+    prompt += f"\n\nCV TEXT:\n{cv_content}"
+    if jd_content:
+        prompt += f"\n\nJob Description:\n{jd_content}"
+    return (await run_agent(prompt)).content
+
+
+async def run_compare(cv_content: str, jd_content: str, mode: str) -> str:
+    if mode == "direct":
+        return await tools.acompare_cv_with_job(tools.compact_cv_input(cv_content), jd_content)
+    prompt = "Compare this CV with the job description using the compare_cv_with_job tool."
+    prompt += f"\n\nCV TEXT:\n{cv_content}"
+    prompt += f"\n\nJob Description:\n{jd_content}"
+    return (await run_agent(prompt)).content
+
+
+async def run_keywords(cv_content: str, top_n: int, mode: str, keyword_mode: Optional[str] = None) -> str:
+    if mode == "direct":
+        return await tools.aextract_keywords(cv_content, top_n, keyword_mode)
+    prompt = f"Extract the top {top_n} most important keywords from this document using the extract_keywords tool."
+    if keyword_mode:
+        prompt += f' Call it with mode="{keyword_mode}".'
+    prompt += f"\n\nTEXT:\n{cv_content}"
+    return (await run_agent(prompt)).content
+
+
+async def run_issues(cv_content: str, mode: str) -> str:
+    if mode == "direct":
+        return await tools.aanalyze_cv_issues(cv_content)
+    prompt = "Analyze this CV comprehensively and identify all issues categorized by severity using the analyze_cv_issues tool."
+    prompt += f"\n\nCV TEXT:\n{cv_content}"
+    return (await run_agent(prompt)).content
+
+
+def rewrite_prompt(cv_content: str, jd_content: Optional[str], focus_areas: Optional[str]) -> str:
+    prompt = "Rewrite this CV to optimize for ATS while maintaining readability using the generate_cv_rewrite tool."
+    if focus_areas:
+        prompt += f"\n\nFocus on these areas: {focus_areas}"
+    prompt += f"\n\nCV TEXT:\n{cv_content}"
+    if jd_content:
+        prompt += f"\n\nJob Description to tailor to:\n{jd_content}"
+    return prompt
+
+
+async def run_rewrite(cv_content: str, jd_content: Optional[str], focus_areas: Optional[str], mode: str) -> str:
+    if mode == "direct":
+        return await tools.agenerate_cv_rewrite(cv_content, jd_content, focus_areas)
+    return (await run_agent(rewrite_prompt(cv_content, jd_content, focus_areas))).content
+
+
+async def run_improvement_plan(cv_content: str, mode: str) -> str:
+    if mode == "direct":
+        return await tools.agenerate_improvement_plan(tools.compact_cv_input(cv_content))
+    prompt = "Create a prioritized improvement plan for this CV with actionable steps using the generate_improvement_plan tool."
+    prompt += f"\n\nCV TEXT:\n{cv_content}"
+    return (await run_agent(prompt)).content
+
+
+def normalize_focus_areas(focus_areas: Optional[str]) -> Optional[str]:
+    """Tidy a comma-separated focus area list"""
+    if not focus_areas:
+        return None
+    return ', '.join(area.strip() for area in focus_areas.split(','))
 
 
 @app.post("/analyze")
@@ -93,470 +631,253 @@ async def analyze(
     cv_text: Optional[str] = Form(default=None),
     jd_file: Optional[UploadFile] = File(default=None),
     jd_text: Optional[str] = Form(default=None),
-    prompt: str = Form(default="Analyze this CV comprehensively and provide detailed insights.")
+    prompt: str = Form(default=DEFAULT_ANALYZE_PROMPT),
+    session_id: Optional[str] = Form(default=None),
+    report: bool = Form(default=False),
+    top_n: int = Form(default=25),
+    keyword_mode: Optional[str] = Form(default=None),
+    stream: bool = Query(default=False)
 ):
     """
     Analyze CV - FLEXIBLE INPUT:
     - CV: Provide either cv_file OR cv_text (required)
     - Job Description: Optionally provide jd_file OR jd_text (optional)
+    - session_id: Optional, continues a conversation with history
+    - report: Optional, return the structured full report (built with concurrent
+      tool calls) instead of the agent's free-form analysis
+    - ?stream=true: Stream the analysis (or report sections) as Server-Sent Events
     """
-    if not agent_instance:
+    if agent_pool is None:
         raise HTTPException(status_code=503, detail="Agent not initialized")
 
-    # Validate CV input - check for actual file and non-empty text
-    has_cv_file = cv_file is not None and hasattr(cv_file, 'filename')
-    has_cv_text = cv_text is not None and isinstance(cv_text, str) and cv_text.strip() != ""
-
-    if not has_cv_file and not has_cv_text:
+    if not has_input(cv_file, cv_text):
         raise HTTPException(status_code=400, detail="Either 'cv_file' or 'cv_text' must be provided for the CV")
 
-    # Validate JD input (optional) - check for actual file and non-empty text
-    has_jd_file = jd_file is not None and hasattr(jd_file, 'filename')
-    has_jd_text = jd_text is not None and isinstance(jd_text, str) and jd_text.strip() != ""
+    keyword_mode = resolve_keyword_mode(keyword_mode)
+    cv_content, cv_input_type, cv_filename = await read_input(cv_file, cv_text, "CV")
+    jd_content, jd_input_type, jd_filename = await read_input(jd_file, jd_text, "Job Description")
 
-    cv_tmp_file = None
-    jd_tmp_file = None
-
-    try:
-        files_to_process = []
-
-        # Process CV
-        if has_cv_file:
-            cv_tmp_file, cv_filename = await process_file_input(cv_file, "CV")
-            files_to_process.append(AgnoFile(filepath=cv_tmp_file))
-            cv_input_type = "file"
-        else:
-            prompt += f"\n\nCV TEXT:\n{cv_text}"
-            cv_input_type = "text"
-
-        # Process Job Description if provided
-        if has_jd_file:
-            jd_tmp_file, jd_filename = await process_file_input(jd_file, "Job Description")
-            files_to_process.append(AgnoFile(filepath=jd_tmp_file))
-            prompt += f"\n\nJob Description is provided as a file."
-            jd_input_type = "file"
-        elif has_jd_text:
-            prompt += f"\n\nJob Description:\n{jd_text}"
-            jd_input_type = "text"
-        else:
-            jd_input_type = None
-
-        # Run agent
-        if files_to_process:
-            response = agent_instance.run(prompt, files=files_to_process)
-        else:
-            response = agent_instance.run(prompt)
-
-        # Clean up temp files
-        if cv_tmp_file:
-            os.unlink(cv_tmp_file)
-        if jd_tmp_file:
-            os.unlink(jd_tmp_file)
-
-        result = {
-            "success": True,
-            "cv_input_type": cv_input_type,
-            "analysis": response.content
-        }
+    result = build_result(cv_input_type, cv_filename, jd_input_type, jd_filename)
+    if session_id:
+        result["session_id"] = session_id
 
-        if has_cv_file:
-            result["cv_filename"] = cv_filename
-        if jd_input_type:
-            result["jd_input_type"] = jd_input_type
-            if has_jd_file:
-                result["jd_filename"] = jd_filename
+    if report:
+        if stream:
+            return sse_response(stream_report(cv_content, jd_content, top_n, keyword_mode, final=result))
+        full_report = await build_report(cv_content, jd_content, top_n, keyword_mode)
+        if all(full_report[section] is None for section in REPORT_SECTIONS if section in full_report):
+            raise HTTPException(status_code=500, detail=f"Analysis failed: {full_report['errors']}")
+        # The CV was parsed as part of the report: upgrade the index to its sections
+        index_cv(cv_content)
+        return build_result(cv_input_type, cv_filename, jd_input_type, jd_filename, report=full_report)
 
-        return result
+    if stream:
+        return sse_response(stream_agent(analyze_prompt(cv_content, jd_content, prompt), session_id=session_id, final=result))
 
-    except HTTPException:
-        raise
+    try:
+        result["analysis"] = await run_analyze(cv_content, jd_content, prompt, session_id)
     except Exception as e:
-        # Clean up temp files on error
-        if cv_tmp_file:
-            try:
-                os.unlink(cv_tmp_file)
-            except:
-                pass
-        if jd_tmp_file:
-            try:
-                os.unlink(jd_tmp_file)
-            except:
-                pass
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+    return result
+
 
 @app.post("/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, stream: bool = Query(default=False)):
     """
-    General chat endpoint for conversational interaction with the agent
+    General chat endpoint for conversational interaction with the agent.
+    Pass the returned session_id back to continue the same conversation.
+    Use ?stream=true to receive the reply as Server-Sent Events.
     """
-    if not agent_instance:
+    if agent_pool is None:
         raise HTTPException(status_code=503, detail="Agent not initialized")
 
+    session_id = request.session_id or uuid.uuid4().hex
+
+    if stream:
+        return sse_response(stream_agent(request.message, session_id=session_id,
+                                         final={"success": True, "session_id": session_id}))
+
     try:
-        response = agent_instance.run(request.message)
+        response = await run_agent(request.message, session_id=session_id)
 
         return {
             "success": True,
+            "session_id": session_id,
             "response": response.content
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
 
+@app.delete("/sessions/{session_id}")
+async def end_session(session_id: str):
+    """
+    End a chat session and discard its conversation history
+    """
+    if agent_pool is None:
+        raise HTTPException(status_code=503, detail="Agent not initialized")
+
+    if not await agent_pool.evict(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    return {"success": True, "session_id": session_id}
+
+
 @app.post("/parse")
 async def parse_cv(
     cv_file: Optional[UploadFile] = File(default=None),
-    cv_text: Optional[str] = Form(default=None)
+    cv_text: Optional[str] = Form(default=None),
+    mode: Optional[str] = Form(default=None)
 ):
     """
     Parse CV and extract structured information
     - CV: Provide either cv_file OR cv_text (required)
+    - mode: "direct" (call the tool) or "agent" (default: API_TOOL_MODE)
     """
-    if not agent_instance:
+    if agent_pool is None:
         raise HTTPException(status_code=503, detail="Agent not initialized")
 
-    has_cv_file = cv_file is not None and hasattr(cv_file, 'filename')
-    has_cv_text = cv_text is not None and isinstance(cv_text, str) and cv_text.strip() != ""
-
-    if not has_cv_file and not has_cv_text:
+    if not has_input(cv_file, cv_text):
         raise HTTPException(status_code=400, detail="Either 'cv_file' or 'cv_text' must be provided")
 
-    cv_tmp_file = None
+    mode = resolve_mode(mode)
+    cv_content, cv_input_type, cv_filename = await read_input(cv_file, cv_text, "CV")
 
     try:
-        prompt = "Parse this CV and extract all structured information in detail using the parse_cv tool."
-
-        if has_cv_file:
-            cv_tmp_file, cv_filename = await process_file_input(cv_file, "CV")
-            response = agent_instance.run(prompt, files=[AgnoFile(filepath=cv_tmp_file)])
-            os.unlink(cv_tmp_file)
-
-            return {
-                "success": True,
-                "cv_input_type": "file",
-                "cv_filename": cv_filename,
-                "parsed_data": response.content
-            }
-        else:
-            prompt += f"\n\nCV TEXT:\n{cv_text}"
-            response = agent_instance.run(prompt)
-
-            return {
-                "success": True,
-                "cv_input_type": "text",
-                "parsed_data": response.content
-            }
-
-    except HTTPException:
-        raise
+        parsed_data = await run_parse(cv_content, mode)
     except Exception as e:
-        if cv_tmp_file:
-            try:
-                os.unlink(cv_tmp_file)
-            except:
-                pass
         raise HTTPException(status_code=500, detail=f"Parsing failed: {str(e)}")
 
+    return build_result(cv_input_type, cv_filename, parsed_data=parsed_data)
+
 
 @app.post("/ats-score")
 async def evaluate_ats(
     cv_file: Optional[UploadFile] = File(default=None),
     cv_text: Optional[str] = Form(default=None),
     jd_file: Optional[UploadFile] = File(default=None),
-    jd_text: Optional[str] = Form(default=None)
+    jd_text: Optional[str] = Form(default=None),
+    mode: Optional[str] = Form(default=None)
 ):
     """
     Evaluate ATS score for a CV - FLEXIBLE INPUT:
     - CV: Provide either cv_file OR cv_text (required)
     - Job Description: Optionally provide jd_file OR jd_text (optional)
+    - mode: "direct" (call the tool) or "agent" (default: API_TOOL_MODE)
     """
-    if not agent_instance:
+    if agent_pool is None:
         raise HTTPException(status_code=503, detail="Agent not initialized")
 
-    has_cv_file = cv_file is not None and hasattr(cv_file, 'filename')
-    has_cv_text = cv_text is not None and isinstance(cv_text, str) and cv_text.strip() != ""
-    has_jd_file = jd_file is not None and hasattr(jd_file, 'filename')
-    has_jd_text = jd_text is not None and isinstance(jd_text, str) and jd_text.strip() != ""
-
-    if not has_cv_file and not has_cv_text:
+    if not has_input(cv_file, cv_text):
         raise HTTPException(status_code=400, detail="Either 'cv_file' or 'cv_text' must be provided")
 
-    cv_tmp_file = None
-    jd_tmp_file = None
+    mode = resolve_mode(mode)
+    cv_content, cv_input_type, cv_filename = await read_input(cv_file, cv_text, "CV")
+    jd_content, jd_input_type, jd_filename = await read_input(jd_file, jd_text, "Job Description")
 
     try:
-        prompt = "Evaluate this CV for ATS compatibility and provide a detailed score with recommendations using the evaluate_ats_score tool."
-        files_to_process = []
-
-        # Process CV
-        if has_cv_file:
-            cv_tmp_file, cv_filename = await process_file_input(cv_file, "CV")
-            files_to_process.append(AgnoFile(filepath=cv_tmp_file))
-            cv_input_type = "file"
-        else:
-            prompt += f"\n\nCV TEXT:\n{cv_text}"
-            cv_input_type = "text"
-
-        # Process Job Description if provided
-        if has_jd_file:
-            jd_tmp_file, jd_filename = await process_file_input(jd_file, "Job Description")
-            files_to_process.append(AgnoFile(filepath=jd_tmp_file))
-            prompt += f"\n\nJob Description is provided as a file."
-            jd_input_type = "file"
-        elif has_jd_text:
-            prompt += f"\n\nJob Description:\n{jd_text}"
-            jd_input_type = "text"
-        else:
-            jd_input_type = None
-
-        # Run agent
-        if files_to_process:
-            response = agent_instance.run(prompt, files=files_to_process)
-        else:
-            response = agent_instance.run(prompt)
-
-        # Clean up temp files
-        if cv_tmp_file:
-            os.unlink(cv_tmp_file)
-        if jd_tmp_file:
-            os.unlink(jd_tmp_file)
-
-        result = {
-            "success": True,
-            "cv_input_type": cv_input_type,
-            "ats_evaluation": response.content
-        }
-
-        if has_cv_file:
-            result["cv_filename"] = cv_filename
-        if jd_input_type:
-            result["jd_input_type"] = jd_input_type
-            if has_jd_file:
-                result["jd_filename"] = jd_filename
-
-        return result
-
-    except HTTPException:
-        raise
+        ats_evaluation = await run_ats_score(cv_content, jd_content, mode)
     except Exception as e:
-        if cv_tmp_file:
-            try:
-                os.unlink(cv_tmp_file)
-            except:
-                pass
-        if jd_tmp_file:
-            try:
-                os.unlink(jd_tmp_file)
-            except:
-                pass
         raise HTTPException(status_code=500, detail=f"ATS evaluation failed: {str(e)}")
 
+    return build_result(cv_input_type, cv_filename, jd_input_type, jd_filename, ats_evaluation=ats_evaluation)
+
 
 @app.post("/compare")
 async def compare_cv_with_job(
     cv_file: Optional[UploadFile] = File(default=None),
     cv_text: Optional[str] = Form(default=None),
     jd_file: Optional[UploadFile] = File(default=None),
-    jd_text: Optional[str] = Form(default=None)
+    jd_text: Optional[str] = Form(default=None),
+    mode: Optional[str] = Form(default=None)
 ):
     """
     Compare CV with job description - FLEXIBLE INPUT:
     - CV: Provide either cv_file OR cv_text (required)
     - Job Description: Provide either jd_file OR jd_text (required)
+    - mode: "direct" (call the tool) or "agent" (default: API_TOOL_MODE)
     """
-    if not agent_instance:
+    if agent_pool is None:
         raise HTTPException(status_code=503, detail="Agent not initialized")
 
-    has_cv_file = cv_file is not None and hasattr(cv_file, 'filename')
-    has_cv_text = cv_text is not None and isinstance(cv_text, str) and cv_text.strip() != ""
-    has_jd_file = jd_file is not None and hasattr(jd_file, 'filename')
-    has_jd_text = jd_text is not None and isinstance(jd_text, str) and jd_text.strip() != ""
-
-    if not has_cv_file and not has_cv_text:
+    if not has_input(cv_file, cv_text):
         raise HTTPException(status_code=400, detail="Either 'cv_file' or 'cv_text' must be provided for the CV")
 
-    if not has_jd_file and not has_jd_text:
+    if not has_input(jd_file, jd_text):
         raise HTTPException(status_code=400, detail="Either 'jd_file' or 'jd_text' must be provided for the Job Description")
 
-    cv_tmp_file = None
-    jd_tmp_file = None
+    mode = resolve_mode(mode)
+    cv_content, cv_input_type, cv_filename = await read_input(cv_file, cv_text, "CV")
+    jd_content, jd_input_type, jd_filename = await read_input(jd_file, jd_text, "Job Description")
 
     try:
-        prompt = "Compare this CV with the job description using the compare_cv_with_job tool."
-        files_to_process = []
-
-        # Process CV
-        if has_cv_file:
-            cv_tmp_file, cv_filename = await process_file_input(cv_file, "CV")
-            files_to_process.append(AgnoFile(filepath=cv_tmp_file))
-            cv_input_type = "file"
-        else:
-            prompt += f"\n\nCV TEXT:\n{cv_text}"
-            cv_input_type = "text"
-
-        # Process Job Description
-        if has_jd_file:
-            jd_tmp_file, jd_filename = await process_file_input(jd_file, "Job Description")
-            files_to_process.append(AgnoFile(filepath=jd_tmp_file))
-            prompt += f"\n\nJob Description is provided as a file."
-            jd_input_type = "file"
-        else:
-            prompt += f"\n\nJob Description:\n{jd_text}"
-            jd_input_type = "text"
-
-        # Run agent
-        if files_to_process:
-            response = agent_instance.run(prompt, files=files_to_process)
-        else:
-            response = agent_instance.run(prompt)
-
-        # Clean up temp files
-        if cv_tmp_file:
-            os.unlink(cv_tmp_file)
-        if jd_tmp_file:
-            os.unlink(jd_tmp_file)
-
-        result = {
-            "success": True,
-            "cv_input_type": cv_input_type,
-            "jd_input_type": jd_input_type,
-            "comparison": response.content
-        }
-
-        if has_cv_file:
-            result["cv_filename"] = cv_filename
-        if has_jd_file:
-            result["jd_filename"] = jd_filename
-
-        return result
-
-    except HTTPException:
-        raise
+        comparison = await run_compare(cv_content, jd_content, mode)
     except Exception as e:
-        if cv_tmp_file:
-            try:
-                os.unlink(cv_tmp_file)
-            except:
-                pass
-        if jd_tmp_file:
-            try:
-                os.unlink(jd_tmp_file)
-            except:
-                pass
         raise HTTPException(status_code=500, detail=f"Comparison failed: {str(e)}")
 
+    return build_result(cv_input_type, cv_filename, jd_input_type, jd_filename, comparison=comparison)
+
 
 @app.post("/keywords")
 async def extract_keywords(
     cv_file: Optional[UploadFile] = File(default=None),
     cv_text: Optional[str] = Form(default=None),
-    top_n: int = Form(default=25)
+    top_n: int = Form(default=25),
+    mode: Optional[str] = Form(default=None),
+    keyword_mode: Optional[str] = Form(default=None)
 ):
     """
     Extract keywords from CV
     - CV: Provide either cv_file OR cv_text (required)
+    - mode: "direct" (call the tool) or "agent" (default: API_TOOL_MODE)
+    - keyword_mode: "local", "llm" or "hybrid" (default: KEYWORD_MODE)
     """
-    if not agent_instance:
+    if agent_pool is None:
         raise HTTPException(status_code=503, detail="Agent not initialized")
 
-    has_cv_file = cv_file is not None and hasattr(cv_file, 'filename')
-    has_cv_text = cv_text is not None and isinstance(cv_text, str) and cv_text.strip() != ""
-
-    if not has_cv_file and not has_cv_text:
+    if not has_input(cv_file, cv_text):
         raise HTTPException(status_code=400, detail="Either 'cv_file' or 'cv_text' must be provided")
 
-    cv_tmp_file = None
+    mode = resolve_mode(mode)
+    keyword_mode = resolve_keyword_mode(keyword_mode)
+    cv_content, cv_input_type, cv_filename = await read_input(cv_file, cv_text, "CV")
 
     try:
-        prompt = f"Extract the top {top_n} most important keywords from this document using the extract_keywords tool."
-
-        if has_cv_file:
-            cv_tmp_file, cv_filename = await process_file_input(cv_file, "CV")
-            response = agent_instance.run(prompt, files=[AgnoFile(filepath=cv_tmp_file)])
-            os.unlink(cv_tmp_file)
-
-            return {
-                "success": True,
-                "cv_input_type": "file",
-                "cv_filename": cv_filename,
-                "keywords": response.content
-            }
-        else:
-            prompt += f"\n\nTEXT:\n{cv_text}"
-            response = agent_instance.run(prompt)
-
-            return {
-                "success": True,
-                "cv_input_type": "text",
-                "keywords": response.content
-            }
-
-    except HTTPException:
-        raise
+        keywords = await run_keywords(cv_content, top_n, mode, keyword_mode)
     except Exception as e:
-        if cv_tmp_file:
-            try:
-                os.unlink(cv_tmp_file)
-            except:
-                pass
         raise HTTPException(status_code=500, detail=f"Keyword extraction failed: {str(e)}")
 
+    return build_result(cv_input_type, cv_filename, keywords=keywords)
+
 
 @app.post("/analyze-issues")
 async def analyze_issues(
     cv_file: Optional[UploadFile] = File(default=None),
-    cv_text: Optional[str] = Form(default=None)
+    cv_text: Optional[str] = Form(default=None),
+    mode: Optional[str] = Form(default=None)
 ):
     """
     Analyze CV for issues and categorize by severity
     - CV: Provide either cv_file OR cv_text (required)
+    - mode: "direct" (call the tool) or "agent" (default: API_TOOL_MODE)
     """
-    if not agent_instance:
+    if agent_pool is None:
         raise HTTPException(status_code=503, detail="Agent not initialized")
 
-    has_cv_file = cv_file is not None and hasattr(cv_file, 'filename')
-    has_cv_text = cv_text is not None and isinstance(cv_text, str) and cv_text.strip() != ""
-
-    if not has_cv_file and not has_cv_text:
+    if not has_input(cv_file, cv_text):
         raise HTTPException(status_code=400, detail="Either 'cv_file' or 'cv_text' must be provided")
 
-    cv_tmp_file = None
+    mode = resolve_mode(mode)
+    cv_content, cv_input_type, cv_filename = await read_input(cv_file, cv_text, "CV")
 
     try:
-        prompt = "Analyze this CV comprehensively and identify all issues categorized by severity using the analyze_cv_issues tool."
-
-        if has_cv_file:
-            cv_tmp_file, cv_filename = await process_file_input(cv_file, "CV")
-            response = agent_instance.run(prompt, files=[AgnoFile(filepath=cv_tmp_file)])
-            os.unlink(cv_tmp_file)
-
-            return {
-                "success": True,
-                "cv_input_type": "file",
-                "cv_filename": cv_filename,
-                "issues": response.content
-            }
-        else:
-            prompt += f"\n\nCV TEXT:\n{cv_text}"
-            response = agent_instance.run(prompt)
-
-            return {
-                "success": True,
-                "cv_input_type": "text",
-                "issues": response.content
-            }
-
-    except HTTPException:
-        raise
+        issues = await run_issues(cv_content, mode)
     except Exception as e:
-        if cv_tmp_file:
-            try:
-                os.unlink(cv_tmp_file)
-            except:
-                pass
         raise HTTPException(status_code=500, detail=f"Issue analysis failed: {str(e)}")
 
+    return build_result(cv_input_type, cv_filename, issues=issues)
+
 
 @app.post("/rewrite")
 async def rewrite_cv(
@@ -564,153 +885,249 @@ async def rewrite_cv(
     cv_text: Optional[str] = Form(default=None),
     jd_file: Optional[UploadFile] = File(default=None),
     jd_text: Optional[str] = Form(default=None),
-    focus_areas: Optional[str] = Form(default=None)  # Comma-separated string
+    focus_areas: Optional[str] = Form(default=None),  # Comma-separated string
+    mode: Optional[str] = Form(default=None),
+    stream: bool = Query(default=False)
 ):
     """
     Generate an improved version of the CV - FLEXIBLE INPUT:
     - CV: Provide either cv_file OR cv_text (required)
     - Job Description: Optionally provide jd_file OR jd_text (optional)
+    - mode: "direct" (call the tool) or "agent" (default: API_TOOL_MODE)
+    - ?stream=true: Stream the rewrite as Server-Sent Events (always agent mode)
     """
-    if not agent_instance:
+    if agent_pool is None:
         raise HTTPException(status_code=503, detail="Agent not initialized")
 
-    has_cv_file = cv_file is not None and hasattr(cv_file, 'filename')
-    has_cv_text = cv_text is not None and isinstance(cv_text, str) and cv_text.strip() != ""
-    has_jd_file = jd_file is not None and hasattr(jd_file, 'filename')
-    has_jd_text = jd_text is not None and isinstance(jd_text, str) and jd_text.strip() != ""
-
-    if not has_cv_file and not has_cv_text:
+    if not has_input(cv_file, cv_text):
         raise HTTPException(status_code=400, detail="Either 'cv_file' or 'cv_text' must be provided")
 
-    cv_tmp_file = None
-    jd_tmp_file = None
+    mode = resolve_mode(mode)
+    cv_content, cv_input_type, cv_filename = await read_input(cv_file, cv_text, "CV")
+    jd_content, jd_input_type, jd_filename = await read_input(jd_file, jd_text, "Job Description")
+    focus_areas = normalize_focus_areas(focus_areas)
 
-    try:
-        prompt = "Rewrite this CV to optimize for ATS while maintaining readability using the generate_cv_rewrite tool."
-        files_to_process = []
-
-        if focus_areas:
-            areas_list = [area.strip() for area in focus_areas.split(',')]
-            prompt += f"\n\nFocus on these areas: {', '.join(areas_list)}"
-
-        # Process CV
-        if has_cv_file:
-            cv_tmp_file, cv_filename = await process_file_input(cv_file, "CV")
-            files_to_process.append(AgnoFile(filepath=cv_tmp_file))
-            cv_input_type = "file"
-        else:
-            prompt += f"\n\nCV TEXT:\n{cv_text}"
-            cv_input_type = "text"
-
-        # Process Job Description if provided
-        if has_jd_file:
-            jd_tmp_file, jd_filename = await process_file_input(jd_file, "Job Description")
-            files_to_process.append(AgnoFile(filepath=jd_tmp_file))
-            prompt += f"\n\nJob Description is provided as a file."
-            jd_input_type = "file"
-        elif has_jd_text:
-            prompt += f"\n\nJob Description to tailor to:\n{jd_text}"
-            jd_input_type = "text"
-        else:
-            jd_input_type = None
-
-        # Run agent
-        if files_to_process:
-            response = agent_instance.run(prompt, files=files_to_process)
-        else:
-            response = agent_instance.run(prompt)
-
-        # Clean up temp files
-        if cv_tmp_file:
-            os.unlink(cv_tmp_file)
-        if jd_tmp_file:
-            os.unlink(jd_tmp_file)
-
-        result = {
-            "success": True,
-            "cv_input_type": cv_input_type,
-            "rewritten_cv": response.content
-        }
-
-        if has_cv_file:
-            result["cv_filename"] = cv_filename
-        if jd_input_type:
-            result["jd_input_type"] = jd_input_type
-            if has_jd_file:
-                result["jd_filename"] = jd_filename
-
-        return result
+    if stream:
+        return sse_response(stream_agent(rewrite_prompt(cv_content, jd_content, focus_areas),
+                                         final=build_result(cv_input_type, cv_filename, jd_input_type, jd_filename)))
 
-    except HTTPException:
-        raise
+    try:
+        rewritten_cv = await run_rewrite(cv_content, jd_content, focus_areas, mode)
     except Exception as e:
-        if cv_tmp_file:
-            try:
-                os.unlink(cv_tmp_file)
-            except:
-                pass
-        if jd_tmp_file:
-            try:
-                os.unlink(jd_tmp_file)
-            except:
-                pass
         raise HTTPException(status_code=500, detail=f"CV rewrite failed: {str(e)}")
 
+    return build_result(cv_input_type, cv_filename, jd_input_type, jd_filename, rewritten_cv=rewritten_cv)
+
 
 @app.post("/improvement-plan")
 async def generate_improvement_plan(
     cv_file: Optional[UploadFile] = File(default=None),
-    cv_text: Optional[str] = Form(default=None)
+    cv_text: Optional[str] = Form(default=None),
+    mode: Optional[str] = Form(default=None)
 ):
     """
     Generate a prioritized improvement plan for the CV
     - CV: Provide either cv_file OR cv_text (required)
+    - mode: "direct" (call the tool) or "agent" (default: API_TOOL_MODE)
     """
-    if not agent_instance:
+    if agent_pool is None:
         raise HTTPException(status_code=503, detail="Agent not initialized")
 
-    has_cv_file = cv_file is not None and hasattr(cv_file, 'filename')
-    has_cv_text = cv_text is not None and isinstance(cv_text, str) and cv_text.strip() != ""
-
-    if not has_cv_file and not has_cv_text:
+    if not has_input(cv_file, cv_text):
         raise HTTPException(status_code=400, detail="Either 'cv_file' or 'cv_text' must be provided")
 
-    cv_tmp_file = None
+    mode = resolve_mode(mode)
+    cv_content, cv_input_type, cv_filename = await read_input(cv_file, cv_text, "CV")
 
     try:
-        prompt = "Create a prioritized improvement plan for this CV with actionable steps using the generate_improvement_plan tool."
-
-        if has_cv_file:
-            cv_tmp_file, cv_filename = await process_file_input(cv_file, "CV")
-            response = agent_instance.run(prompt, files=[AgnoFile(filepath=cv_tmp_file)])
-            os.unlink(cv_tmp_file)
-
-            return {
-                "success": True,
-                "cv_input_type": "file",
-                "cv_filename": cv_filename,
-                "improvement_plan": response.content
-            }
-        else:
-            prompt += f"\n\nCV TEXT:\n{cv_text}"
-            response = agent_instance.run(prompt)
-
-            return {
-                "success": True,
-                "cv_input_type": "text",
-                "improvement_plan": response.content
-            }
-
-    except HTTPException:
-        raise
+        improvement_plan = await run_improvement_plan(cv_content, mode)
     except Exception as e:
-        if cv_tmp_file:
-            try:
-                os.unlink(cv_tmp_file)
-            except:
-                pass
         raise HTTPException(status_code=500, detail=f"Plan generation failed: {str(e)}")
 
+    return build_result(cv_input_type, cv_filename, improvement_plan=improvement_plan)
+
+
+# Job kinds: result field name and the operation that produces it from a job payload
+JOB_KINDS = {
+    "analyze": ("analysis", lambda p: run_analyze(p["cv_content"], p.get("jd_content"), p.get("prompt") or DEFAULT_ANALYZE_PROMPT)),
+    "report": ("report", lambda p: build_report(p["cv_content"], p.get("jd_content"), p["top_n"], p.get("keyword_mode"))),
+    "parse": ("parsed_data", lambda p: run_parse(p["cv_content"], p["mode"])),
+    "ats-score": ("ats_evaluation", lambda p: run_ats_score(p["cv_content"], p.get("jd_content"), p["mode"])),
+    "compare": ("comparison", lambda p: run_compare(p["cv_content"], p["jd_content"], p["mode"])),
+    "keywords": ("keywords", lambda p: run_keywords(p["cv_content"], p.get("top_n") or 25, p["mode"], p.get("keyword_mode"))),
+    "analyze-issues": ("issues", lambda p: run_issues(p["cv_content"], p["mode"])),
+    "rewrite": ("rewritten_cv", lambda p: run_rewrite(p["cv_content"], p.get("jd_content"), p.get("focus_areas"), p["mode"])),
+    "improvement-plan": ("improvement_plan", lambda p: run_improvement_plan(p["cv_content"], p["mode"])),
+}
+
+
+async def execute_job(kind: str, payload: dict) -> dict:
+    """Run a queued job and build the same response the synchronous endpoint returns"""
+    result_key, operation = JOB_KINDS[kind]
+    # Jobs run outside the submitting request, so each gets its own trace
+    with tracing.trace(f"job {kind}", kind=kind), compaction.track():
+        content = await operation(payload)
+        return build_result(**payload["meta"], **{result_key: content})
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    kind: str = Form(...),
+    cv_file: Optional[UploadFile] = File(default=None),
+    cv_text: Optional[str] = Form(default=None),
+    jd_file: Optional[UploadFile] = File(default=None),
+    jd_text: Optional[str] = Form(default=None),
+    prompt: Optional[str] = Form(default=None),
+    focus_areas: Optional[str] = Form(default=None),
+    top_n: int = Form(default=25),
+    mode: Optional[str] = Form(default=None),
+    keyword_mode: Optional[str] = Form(default=None)
+):
+    """
+    Submit a long-running analysis as a background job - returns a job_id
+    - kind: analyze, report, parse, ats-score, compare, keywords, analyze-issues, rewrite, improvement-plan
+    - Other fields match the corresponding endpoint
+    """
+    if job_queue is None:
+        raise HTTPException(status_code=503, detail="Job queue not initialized")
+
+    if kind not in JOB_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind '{kind}'. Allowed: {', '.join(JOB_KINDS)}")
+
+    if not has_input(cv_file, cv_text):
+        raise HTTPException(status_code=400, detail="Either 'cv_file' or 'cv_text' must be provided for the CV")
+
+    if kind == "compare" and not has_input(jd_file, jd_text):
+        raise HTTPException(status_code=400, detail="Either 'jd_file' or 'jd_text' must be provided for the Job Description")
+
+    mode = resolve_mode(mode)
+    keyword_mode = resolve_keyword_mode(keyword_mode)
+    cv_content, cv_input_type, cv_filename = await read_input(cv_file, cv_text, "CV")
+    jd_content, jd_input_type, jd_filename = await read_input(jd_file, jd_text, "Job Description")
+
+    payload = {
+        "cv_content": cv_content,
+        "jd_content": jd_content,
+        "prompt": prompt,
+        "focus_areas": normalize_focus_areas(focus_areas),
+        "top_n": top_n,
+        "mode": mode,
+        "keyword_mode": keyword_mode,
+        "meta": {
+            "cv_input_type": cv_input_type,
+            "cv_filename": cv_filename,
+            "jd_input_type": jd_input_type,
+            "jd_filename": jd_filename,
+        },
+    }
+    return {"success": True, **(await job_queue.submit(kind, payload))}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = Query(default=0, ge=0)):
+    """
+    Get a job's status and, once finished, its result or error.
+    Use ?wait=<seconds> to long-poll until the job finishes (capped at JOB_MAX_WAIT).
+    """
+    if job_queue is None:
+        raise HTTPException(status_code=503, detail="Job queue not initialized")
+
+    job = await job_queue.wait(job_id, min(wait, JOB_MAX_WAIT))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+async def read_batch_items(
+    cv_files: Optional[List[UploadFile]],
+    cv_texts: Optional[List[str]],
+    cv_zip: Optional[UploadFile]
+) -> List[BatchItem]:
+    """Collect batch CVs from uploaded files, pasted texts and a zip archive"""
+    items = []
+    for cv_file in cv_files or []:
+        if hasattr(cv_file, 'filename'):
+            items.append(BatchItem(cv_file.filename, data=await read_upload(cv_file, cv_file.filename)))
+    for index, text in enumerate(cv_texts or []):
+        if text and text.strip():
+            items.append(BatchItem(f"cv_texts[{index}]", text=text))
+    if cv_zip is not None and hasattr(cv_zip, 'filename'):
+        # Read members straight from the spooled upload, off the event loop, instead of copying the whole archive.
+        # Decompressed bytes count against the request's upload limit and the shared upload budget.
+        try:
+            items.extend(await asyncio.to_thread(
+                items_from_zip, cv_zip.file, UPLOAD_MAX_FILE_BYTES, max(BATCH_MAX_ITEMS - len(items), 1), charge_upload
+            ))
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="'cv_zip' is not a valid zip archive")
+        except TooManyArchiveMembers as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ArchiveMemberTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+    if not items:
+        raise HTTPException(status_code=400, detail="Provide at least one CV via 'cv_files', 'cv_texts' or 'cv_zip'")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch too large: {len(items)} CVs (max {BATCH_MAX_ITEMS})")
+    return items
+
+
+@app.post("/batch/ats-score")
+async def batch_ats_score(
+    cv_files: Optional[List[UploadFile]] = File(default=None),
+    cv_texts: Optional[List[str]] = Form(default=None),
+    cv_zip: Optional[UploadFile] = File(default=None),
+    jd_file: Optional[UploadFile] = File(default=None),
+    jd_text: Optional[str] = Form(default=None)
+):
+    """
+    Score many CVs against one job description - streams NDJSON:
+    - CVs: any mix of cv_files, cv_texts and a cv_zip archive (at least one)
+    - Job Description: Optionally provide jd_file OR jd_text
+    - One line per CV as it finishes, then a summary line
+    """
+    items = await read_batch_items(cv_files, cv_texts, cv_zip)
+    jd_content, _, _ = await read_input(jd_file, jd_text, "Job Description")
+
+    async def score(cv_content: str) -> dict:
+        index_cv(cv_content)
+        return {"ats_evaluation": await tools.aevaluate_ats_score(cv_content, jd_content)}
+
+    return StreamingResponse(run_batch(items, score), media_type="application/x-ndjson")
+
+
+@app.post("/batch/compare")
+async def batch_compare(
+    cv_files: Optional[List[UploadFile]] = File(default=None),
+    cv_texts: Optional[List[str]] = Form(default=None),
+    cv_zip: Optional[UploadFile] = File(default=None),
+    jd_file: Optional[UploadFile] = File(default=None),
+    jd_text: Optional[str] = Form(default=None),
+    top_k: int = Form(default=PREFILTER_TOP_K, ge=0),
+    min_score: float = Form(default=PREFILTER_MIN_SCORE, ge=0, le=1)
+):
+    """
+    Shortlist many CVs for one job description, then compare only the best matches - streams NDJSON:
+    - CVs: any mix of cv_files, cv_texts and a cv_zip archive (at least one)
+    - Job Description: Provide either jd_file OR jd_text (required)
+    - top_k / min_score: prefilter cutoff (default: PREFILTER_TOP_K / PREFILTER_MIN_SCORE)
+    - Every line carries the CV's TF-IDF prefilter_score; shortlisted CVs also get the LLM comparison
+    """
+    if not has_input(jd_file, jd_text):
+        raise HTTPException(status_code=400, detail="Either 'jd_file' or 'jd_text' must be provided for the Job Description")
+
+    items = await read_batch_items(cv_files, cv_texts, cv_zip)
+    jd_content, _, _ = await read_input(jd_file, jd_text, "Job Description")
+
+    async def compare(cv_content: str) -> dict:
+        index_cv(cv_content)
+        return {"comparison": await tools.acompare_cv_with_job(tools.compact_cv_input(cv_content), jd_content)}
+
+    return StreamingResponse(
+        run_shortlisted_batch(items, jd_content, compare, top_k, min_score),
+        media_type="application/x-ndjson"
+    )
+
 
 if __name__ == "__main__":
     import uvicorn
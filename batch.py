@@ -0,0 +1,188 @@
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, List, Optional, Tuple, Union
+import asyncio
+import io
+import json
+import os
+import zipfile
+
+from extraction import SUPPORTED_EXTENSIONS, ExtractionError, extract_text_async
+from prefilter import PREFILTER_MIN_SCORE, PREFILTER_TOP_K, shortlist, similarity_scores
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+
+class BatchItem:
+    """One CV in a batch: either raw file bytes or pasted text"""
+
+    def __init__(self, source: str, data: Optional[bytes] = None, text: Optional[str] = None):
+        self.source = source
+        self.data = data
+        self.text = text
+
+    async def read_text(self) -> str:
+        """Extract the CV text; raises ExtractionError for unreadable items"""
+        if self.text is not None:
+            return self.text
+        file_ext = os.path.splitext(self.source)[1].lower()
+        if file_ext not in SUPPORTED_EXTENSIONS:
+            raise ExtractionError(f"Unsupported file type. Allowed: {', '.join(SUPPORTED_EXTENSIONS)}")
+        return await extract_text_async(self.data, file_ext)
+
+
+class ArchiveMemberTooLarge(ValueError):
+    """Raised when a zip member would decompress beyond the per-file limit"""
+
+
+class TooManyArchiveMembers(ValueError):
+    """Raised when a zip archive holds more CVs than a batch may contain"""
+
+
+ZIP_READ_CHUNK_BYTES = 64 * 1024
+
+
+def _is_archived_cv(info: zipfile.ZipInfo) -> bool:
+    name = info.filename
+    return not (info.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."))
+
+
+def items_from_zip(archive_file: Union[bytes, BinaryIO], max_member_bytes: int = 0, max_items: int = 0,
+                   reserve: Optional[Callable[[int], None]] = None) -> List[BatchItem]:
+    """
+    Expand a zip archive into batch items, skipping folders and OS metadata.
+
+    Args:
+        archive_file: Archive bytes or a seekable file object
+        max_member_bytes: Refuse members larger than this once decompressed (0 = no limit)
+        max_items: Refuse archives with more members than this, before reading any (0 = no limit)
+        reserve: Called with the size of every decompressed chunk before it is kept;
+            raises to stop the expansion (e.g. when the request's upload budget runs out)
+    """
+    if isinstance(archive_file, bytes):
+        archive_file = io.BytesIO(archive_file)
+    items = []
+    with zipfile.ZipFile(archive_file) as archive:
+        members = [info for info in archive.infolist() if _is_archived_cv(info)]
+        if max_items and len(members) > max_items:
+            raise TooManyArchiveMembers(f"Batch too large: the archive holds {len(members)} CVs (max {max_items})")
+        for info in members:
+            too_large = ArchiveMemberTooLarge(f"{info.filename} is too large (max {max_member_bytes / (1024 * 1024):.3g} MB)")
+            if max_member_bytes and info.file_size > max_member_bytes:
+                raise too_large
+            data = bytearray()
+            with archive.open(info) as member:
+                # Read in chunks: the declared size in the archive header is not trusted
+                while chunk := member.read(ZIP_READ_CHUNK_BYTES):
+                    if max_member_bytes and len(data) + len(chunk) > max_member_bytes:
+                        raise too_large
+                    if reserve is not None:
+                        reserve(len(chunk))
+                    data += chunk
+            items.append(BatchItem(info.filename, data=bytes(data)))
+    return items
+
+
+async def _run_items(
+    items: List[Tuple[int, BatchItem, dict]],
+    worker: Callable[[str], Awaitable[dict]],
+    concurrency: int
+) -> AsyncIterator[dict]:
+    """Run worker over (index, item, extra fields) entries, yielding results in completion order"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(index: int, item: BatchItem, extra: dict) -> dict:
+        async with semaphore:
+            try:
+                text = await item.read_text()
+                return {"index": index, "source": item.source, "success": True, **extra, **await worker(text)}
+            except Exception as e:
+                return {"index": index, "source": item.source, "success": False, **extra, "error": str(e)}
+
+    tasks = [asyncio.create_task(run_one(index, item, extra)) for index, item, extra in items]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        # Client went away or the stream was closed: stop outstanding calls
+        for task in tasks:
+            task.cancel()
+
+
+async def run_batch(
+    items: List[BatchItem],
+    worker: Callable[[str], Awaitable[dict]],
+    concurrency: int = BATCH_MAX_CONCURRENCY
+) -> AsyncIterator[str]:
+    """
+    Run worker over every item with bounded concurrency, yielding NDJSON lines
+    in completion order. A failing item produces an error line instead of
+    aborting the batch; a final summary line closes the stream.
+    """
+    succeeded = 0
+    async for result in _run_items([(index, item, {}) for index, item in enumerate(items)], worker, concurrency):
+        succeeded += result["success"]
+        yield json.dumps(result) + "\n"
+
+    yield json.dumps({"summary": {"total": len(items), "succeeded": succeeded, "failed": len(items) - succeeded}}) + "\n"
+
+
+async def run_shortlisted_batch(
+    items: List[BatchItem],
+    jd_text: str,
+    worker: Callable[[str], Awaitable[dict]],
+    top_k: int = PREFILTER_TOP_K,
+    min_score: float = PREFILTER_MIN_SCORE,
+    concurrency: int = BATCH_MAX_CONCURRENCY
+) -> AsyncIterator[str]:
+    """
+    Like run_batch, but only the CVs shortlisted by the TF-IDF prefilter reach
+    the worker. Every line carries the CV's prefilter_score; CVs left out of
+    the shortlist are reported first with shortlisted=false.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def read(item: BatchItem) -> str:
+        async with semaphore:
+            return await item.read_text()
+
+    texts = await asyncio.gather(*(read(item) for item in items), return_exceptions=True)
+    readable = [index for index, text in enumerate(texts) if not isinstance(text, Exception)]
+    # Scoring a large batch is CPU-bound; keep it off the event loop
+    scores = await asyncio.to_thread(similarity_scores, [texts[index] for index in readable], jd_text)
+    selected = {readable[position]: rank for rank, position in enumerate(shortlist(scores, top_k, min_score), start=1)}
+    prefilter_scores = {index: round(float(score), 4) for index, score in zip(readable, scores)}
+
+    succeeded = 0
+    for index, item in enumerate(items):
+        if isinstance(texts[index], Exception):
+            yield json.dumps({"index": index, "source": item.source, "success": False, "error": str(texts[index])}) + "\n"
+        elif index not in selected:
+            succeeded += 1
+            yield json.dumps({
+                "index": index,
+                "source": item.source,
+                "success": True,
+                "shortlisted": False,
+                "prefilter_score": prefilter_scores[index],
+            }) + "\n"
+
+    entries = [
+        (
+            index,
+            BatchItem(items[index].source, text=texts[index]),
+            {"shortlisted": True, "prefilter_rank": rank, "prefilter_score": prefilter_scores[index]},
+        )
+        for index, rank in sorted(selected.items(), key=lambda entry: entry[1])
+    ]
+    async for result in _run_items(entries, worker, concurrency):
+        succeeded += result["success"]
+        yield json.dumps(result) + "\n"
+
+    yield json.dumps({
+        "summary": {
+            "total": len(items),
+            "shortlisted": len(selected),
+            "succeeded": succeeded,
+            "failed": len(items) - succeeded,
+        }
+    }) + "\n"
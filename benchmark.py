@@ -0,0 +1,328 @@
+from typing import Callable, Dict, List, Optional
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+SAMPLE_CV = """John Smith
+john.smith@example.com | +44 7700 900123 | London, UK
+
+Professional Summary
+Backend engineer with 7 years of experience building Python services and data pipelines.
+
+Experience
+Senior Software Engineer - Acme Payments (2020 - Present)
+- Designed event-driven payment services in Python and Go handling 2M transactions per day
+- Led migration from a monolith to Kubernetes, cutting deployment time by 80%
+- Mentored four engineers and introduced code review guidelines
+
+Software Engineer - DataCorp (2017 - 2020)
+- Built ETL pipelines with Airflow and PostgreSQL
+- Reduced report generation time from 40 to 5 minutes
+
+Education
+BSc Computer Science - University of Manchester (2013 - 2017)
+
+Skills
+Python, Go, FastAPI, PostgreSQL, Redis, Kafka, Docker, Kubernetes, AWS, Terraform
+"""
+
+SAMPLE_JD = """Senior Backend Engineer - FinTech
+
+We are looking for a senior backend engineer to build scalable payment APIs.
+Requirements: 5+ years of Python, experience with FastAPI or Django, PostgreSQL,
+Kafka, Kubernetes and AWS. Experience in payments or financial services is a plus.
+Strong communication skills and experience mentoring engineers.
+"""
+
+BATCH_SIZE = 5
+
+
+def _form(**fields) -> dict:
+    return {"data": fields}
+
+
+# name -> (method, path, request kwargs); kwargs are passed to httpx
+SCENARIOS: Dict[str, tuple] = {
+    "health": ("GET", "/health", {}),
+    "parse": ("POST", "/parse", _form(cv_text=SAMPLE_CV)),
+    "keywords-local": ("POST", "/keywords", _form(cv_text=SAMPLE_CV, keyword_mode="local")),
+    "keywords-llm": ("POST", "/keywords", _form(cv_text=SAMPLE_CV, keyword_mode="llm")),
+    "ats-score": ("POST", "/ats-score", _form(cv_text=SAMPLE_CV, jd_text=SAMPLE_JD)),
+    "compare": ("POST", "/compare", _form(cv_text=SAMPLE_CV, jd_text=SAMPLE_JD)),
+    "analyze-issues": ("POST", "/analyze-issues", _form(cv_text=SAMPLE_CV)),
+    "rewrite": ("POST", "/rewrite", _form(cv_text=SAMPLE_CV, jd_text=SAMPLE_JD)),
+    "improvement-plan": ("POST", "/improvement-plan", _form(cv_text=SAMPLE_CV)),
+    "analyze": ("POST", "/analyze", _form(cv_text=SAMPLE_CV, jd_text=SAMPLE_JD)),
+    "analyze-report": ("POST", "/analyze", _form(cv_text=SAMPLE_CV, jd_text=SAMPLE_JD, report="true")),
+    "chat": ("POST", "/chat", {"json": {"message": f"Review this CV:\n{SAMPLE_CV}"}}),
+    "chat-stream": ("POST", "/chat?stream=true", {"json": {"message": f"Review this CV:\n{SAMPLE_CV}"}}),
+    "batch-ats-score": ("POST", "/batch/ats-score", _form(cv_texts=[SAMPLE_CV] * BATCH_SIZE, jd_text=SAMPLE_JD)),
+    "batch-compare": ("POST", "/batch/compare", _form(cv_texts=[SAMPLE_CV] * BATCH_SIZE, jd_text=SAMPLE_JD)),
+    # Submit, then long-poll until the job finishes
+    "job-ats-score": ("JOB", "/jobs", _form(kind="ats-score", cv_text=SAMPLE_CV, jd_text=SAMPLE_JD)),
+}
+
+_psutil = None
+if importlib.util.find_spec("psutil") is not None:
+    import psutil as _psutil
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    """Resident memory of a process: psutil when installed, otherwise /proc on Linux"""
+    try:
+        if _psutil is not None:
+            return _psutil.Process(pid).memory_info().rss
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        return None
+    return None
+
+
+def _percentile(ordered: List[float], percent: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(int(round(percent / 100 * len(ordered) + 0.5)) - 1, 0))]
+
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with code {process.returncode} while starting ({url})")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def start_servers(args, workdir: str) -> tuple:
+    """Start the mock upstream and the API; returns (mock process, api process, api base URL, mock base URL)"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    mock_port, api_port = _free_port(), _free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+
+    mock = subprocess.Popen(
+        [sys.executable, os.path.join(here, "mock_openrouter.py"), "--port", str(mock_port),
+         "--latency-ms", str(args.latency_ms), "--tokens-per-second", str(args.tokens_per_second),
+         "--completion-tokens", str(args.completion_tokens), "--error-rate", str(args.error_rate),
+         "--error-status", str(args.error_status)],
+        cwd=here
+    )
+    env = {
+        **os.environ,
+        "OPENROUTER_API_KEY": os.environ.get("OPENROUTER_API_KEY", "benchmark"),
+        "LLM_BACKEND": "openrouter",
+        "OPENROUTER_BASE_URL": f"{mock_url}/api/v1",
+        "API_TOOL_MODE": args.tool_mode,
+        "JOBS_DB_PATH": os.path.join(workdir, "jobs.db"),
+        "SEARCH_INDEX_ENABLED": "false",
+        "TRACE_EXPORTER": "none",
+        "LLM_PREWARM_CONNECTIONS": "0",
+    }
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(api_port),
+         "--log-level", "warning"],
+        cwd=here, env=env
+    )
+    try:
+        _wait_until_up(f"{mock_url}/stats", mock)
+        _wait_until_up(f"http://127.0.0.1:{api_port}/health", api)
+    except Exception:
+        stop_servers(mock, api)
+        raise
+    return mock, api, f"http://127.0.0.1:{api_port}", mock_url
+
+
+def stop_servers(*processes: subprocess.Popen):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def _send(client: httpx.AsyncClient, method: str, path: str, kwargs: dict) -> int:
+    if method == "JOB":
+        response = await client.post(path, **kwargs)
+        if response.status_code != 202:
+            return response.status_code
+        job_id = response.json()["job_id"]
+        while True:
+            job = await client.get(f"/jobs/{job_id}", params={"wait": 25})
+            if job.status_code != 200 or job.json()["status"] not in ("queued", "running"):
+                return 200 if job.status_code == 200 and job.json()["status"] == "succeeded" else 500
+    async with client.stream(method, path, **kwargs) as response:
+        # Read the whole body so streaming endpoints are timed to completion
+        async for _ in response.aiter_bytes():
+            pass
+        return response.status_code
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, concurrency: int, total: int,
+                       api_pid: int, upstream_calls: Callable[[], int]) -> dict:
+    """Send `total` requests of one scenario with `concurrency` in flight and summarise them"""
+    method, path, kwargs = SCENARIOS[name]
+    latencies, statuses = [], {}
+    remaining = total
+    rss_start = _rss_bytes(api_pid)
+    rss_peak = rss_start or 0
+    upstream_before = await upstream_calls()
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                status = await _send(client, method, path, kwargs)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    async def sample_memory():
+        nonlocal rss_peak
+        while True:
+            rss_peak = max(rss_peak, _rss_bytes(api_pid) or 0)
+            await asyncio.sleep(0.1)
+
+    sampler = asyncio.create_task(sample_memory())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+    sampler.cancel()
+
+    ordered = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 1) if value is not None else None
+
+    def mb(value: Optional[int]) -> Optional[float]:
+        return round(value / 2 ** 20, 1) if value else None
+
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "status_codes": statuses,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(total / duration, 2) if duration else None,
+        "latency_ms": {
+            "p50": ms(_percentile(ordered, 50)),
+            "p95": ms(_percentile(ordered, 95)),
+            "p99": ms(_percentile(ordered, 99)),
+            "mean": ms(sum(ordered) / len(ordered)) if ordered else None,
+            "max": ms(ordered[-1]) if ordered else None,
+        },
+        "upstream_calls_per_request": round((await upstream_calls() - upstream_before) / total, 2),
+        "rss_mb": {"start": mb(rss_start), "peak": mb(rss_peak), "end": mb(_rss_bytes(api_pid))},
+    }
+
+
+async def run_benchmark(args, api_url: str, mock_url: str, api_pid: int) -> List[dict]:
+    headers = {} if args.use_cache else {"Cache-Control": "no-cache"}
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=api_url, headers=headers, timeout=args.timeout, limits=limits) as client, \
+            httpx.AsyncClient(base_url=mock_url) as mock_client:
+
+        async def upstream_calls() -> int:
+            return (await mock_client.get("/stats")).json()["requests"]
+
+        results = []
+        for name in args.scenarios:
+            for concurrency in args.concurrency:
+                total = args.requests or max(concurrency * 4, 20)
+                result = await run_scenario(client, name, concurrency, total, api_pid, upstream_calls)
+                print(
+                    f"{name:18} c={concurrency:<4} {result['throughput_rps']:>8} req/s  "
+                    f"p50={result['latency_ms']['p50']}ms p95={result['latency_ms']['p95']}ms "
+                    f"p99={result['latency_ms']['p99']}ms errors={result['errors']}",
+                    file=sys.stderr
+                )
+                results.append(result)
+        return results
+
+
+def _csv(convert):
+    return lambda value: [convert(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Resume Agent API against a mock OpenRouter")
+    parser.add_argument("--scenarios", type=_csv(str), default=list(SCENARIOS),
+                        help=f"Comma-separated scenarios (default: all): {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=_csv(int), default=[1, 4, 16, 64],
+                        help="Comma-separated concurrency levels (default: 1,4,16,64)")
+    parser.add_argument("--requests", type=int, default=0,
+                        help="Requests per scenario and level (default: 4 x concurrency, at least 20)")
+    parser.add_argument("--tool-mode", choices=("direct", "agent"), default="direct",
+                        help="API_TOOL_MODE of the API under test")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="Allow cached LLM responses (by default every request sends Cache-Control: no-cache)")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request timeout in seconds")
+    parser.add_argument("--latency-ms", type=float, default=500, help="Mock time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=100, help="Mock output token rate (0 = instant)")
+    parser.add_argument("--completion-tokens", type=int, default=300, help="Mock tokens per completion")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of mock calls that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    with tempfile.TemporaryDirectory(prefix="resume-agent-bench-") as workdir:
+        mock, api, api_url, mock_url = start_servers(args, workdir)
+        try:
+            results = asyncio.run(run_benchmark(args, api_url, mock_url, api.pid))
+        finally:
+            stop_servers(api, mock)
+
+    report = {
+        "started_at": started_at,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "scenarios")
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as report_file:
+            report_file.write(output + "\n")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_SQLITE_PATH = os.getenv("LLM_CACHE_SQLITE_PATH")  # unset = memory tier only
+LLM_CACHE_SQLITE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_SQLITE_MAX_ENTRIES", "100000"))
+# Expired and over-limit rows are deleted every this many writes, or sooner once the limit is passed
+LLM_CACHE_SQLITE_EVICT_EVERY = int(os.getenv("LLM_CACHE_SQLITE_EVICT_EVERY", "256"))
+# Identical LLM calls made while one is already in flight wait for its result
+LLM_COALESCE_ENABLED = os.getenv("LLM_COALESCE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Set per request (e.g. "Cache-Control: no-cache") to skip cache reads
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+def content_hash(*parts: Any) -> str:
+    """Stable SHA-256 over JSON-serializable parts"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def normalize_text(value: Any) -> Any:
+    """Collapse whitespace so cosmetic differences map to the same key"""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+@contextmanager
+def bypass():
+    """Skip cache lookups for calls made inside this block; results are still stored"""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def is_bypassed() -> bool:
+    return _bypass.get()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with a per-entry time to live"""
+
+    def __init__(self, max_entries: int, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        expires_at = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class _SQLiteTier:
+    """On-disk cache tier shared by worker processes on the same host"""
+
+    def __init__(self, path: str, max_entries: int, ttl: Optional[float], evict_every: int = LLM_CACHE_SQLITE_EVICT_EVERY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evict_every = max(evict_every, 1)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, expires_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_created ON llm_cache (created_at)")
+        self._conn.commit()
+        # Upper bound on the row count (replacements and other processes' evictions are not subtracted)
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        self._writes_since_eviction = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at < time.time():
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, expires_at),
+            )
+            self._rows += 1
+            self._writes_since_eviction += 1
+            if self._writes_since_eviction >= self.evict_every or self._rows > self.max_entries:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Delete expired rows and trim to the limit; called with the lock held"""
+        self._conn.execute("DELETE FROM llm_cache WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        # Trim below the limit so a full cache does not evict again on every write
+        keep = max(self.max_entries - min(self.evict_every, self.max_entries // 10), 1)
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (keep,),
+        )
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        self._writes_since_eviction = 0
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._rows = 0
+
+
+class ResponseCache:
+    """
+    Two-tier cache for LLM completions.
+
+    Keys are content hashes of everything that affects the completion: tool name,
+    normalized inputs, model, sampling parameters and the prompt version. The
+    memory tier is checked first; the optional SQLite tier survives restarts and
+    repopulates the memory tier on a hit.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl: Optional[float] = LLM_CACHE_TTL,
+        sqlite_path: Optional[str] = LLM_CACHE_SQLITE_PATH,
+        sqlite_max_entries: int = LLM_CACHE_SQLITE_MAX_ENTRIES,
+        enabled: bool = LLM_CACHE_ENABLED,
+    ):
+        self.enabled = enabled
+        self.memory = LRUCache(max_entries, ttl)
+        self.disk = _SQLiteTier(sqlite_path, sqlite_max_entries, ttl) if sqlite_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(tool: str, inputs: dict, model: str, temperature: float, max_tokens: Optional[int], prompt_version: str) -> str:
+        normalized = {name: normalize_text(value) for name, value in inputs.items()}
+        return content_hash(tool, normalized, model, temperature, max_tokens, prompt_version)
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled or is_bypassed():
+            return None
+
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+                with self._stats_lock:
+                    self.disk_hits += 1
+
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: str):
+        if not self.enabled or not value:
+            return
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() for async callers: a memory hit is served inline, the SQLite tier is read in a thread"""
+        if not self.enabled or is_bypassed():
+            return None
+        if self.disk is None or self.memory.get(key) is not None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: str):
+        """set() for async callers; the SQLite write runs in a thread"""
+        if self.disk is None:
+            self.set(key, value)
+        else:
+            await asyncio.to_thread(self.set, key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_entries": self.disk.count() if self.disk is not None else None,
+        }
+
+
+class _LeaderCancelled(Exception):
+    """Handed to waiting callers when the call they joined was cancelled"""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls.
+
+    The first caller for a key runs the call; callers arriving with the same
+    key while it is in flight wait for its outcome (result or exception)
+    instead of making their own. Sync and async callers share the in-flight
+    table, so a tool called from an agent thread can join a call made by an
+    endpoint. If an async leader is cancelled, its waiters run the call again.
+    """
+
+    def __init__(self, enabled: bool = LLM_COALESCE_ENABLED):
+        self.enabled = enabled
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._calls[key] = Future()
+            # A running future cannot be cancelled by one of its waiters
+            future.set_running_or_notify_cancel()
+            self.leaders += 1
+            return future, True
+
+    def _rejoin(self):
+        # The waiter runs the call itself after all; it was not served by another call
+        with self._lock:
+            self.coalesced -= 1
+
+    def _finish(self, key: str, future: Future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def do(self, key: str, call: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run call() once for concurrent callers of key; returns (result, whether it was shared)"""
+        if not self.enabled:
+            return call(), False
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                try:
+                    return future.result(), True
+                except _LeaderCancelled:
+                    self._rejoin()
+                    continue
+            try:
+                result = call()
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            except BaseException:
+                future.set_exception(_LeaderCancelled())
+                raise
+            else:
+                future.set_result(result)
+                return result, False
+            finally:
+                self._finish(key, future)
+
+    async def ado(self, key: str, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Async counterpart of do"""
+        if not self.enabled:
+            return await call(), False
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                try:
+                    return await asyncio.wrap_future(future), True
+                except _LeaderCancelled:
+                    self._rejoin()
+                    continue
+            try:
+                result = await call()
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            except BaseException:
+                future.set_exception(_LeaderCancelled())
+                raise
+            else:
+                future.set_result(result)
+                return result, False
+            finally:
+                self._finish(key, future)
+
+    def stats(self) -> dict:
+        calls = self.leaders + self.coalesced
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls),
+            "upstream_calls": self.leaders,
+            "coalesced_calls": self.coalesced,
+            "coalesced_rate": round(self.coalesced / calls, 4) if calls else 0.0,
+        }
+
+
+response_cache = ResponseCache()
+in_flight = SingleFlight()
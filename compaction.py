@@ -0,0 +1,268 @@
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+import contextvars
+import importlib.util
+import os
+import re
+import threading
+
+from extraction import PAGE_BREAK, normalize_text
+
+# Combined CV + job description budget per prompt, in tokens; 0 disables trimming
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "16000"))
+# Share of the budget the job description keeps when both must be cut
+JD_BUDGET_SHARE = 0.3
+CHARS_PER_TOKEN = 4
+
+# Sections dropped first when over budget, least valuable first
+LOW_VALUE_SECTIONS = [
+    "references", "interests", "hobbies", "volunteering", "publications", "awards",
+    "languages", "certifications", "projects", "education",
+]
+
+# Lines that open a CV section: a known heading, optionally followed by a colon
+_HEADING = re.compile(
+    r"^(?:professional\s+|work\s+|career\s+)?(summary|profile|objective|about me|experience|employment(?: history)?|"
+    r"education|skills|technical skills|core competencies|projects|certifications|licenses|awards|"
+    r"publications|languages|volunteering|interests|hobbies|references)\s*:?\s*$",
+    re.I
+)
+# Non-empty lines at the top and bottom of a page that may hold headers, footers or page numbers
+PAGE_EDGE_LINES = 2
+_PAGE_NUMBER = re.compile(r"^(?:page\s*)?\d{1,3}(?:\s*(?:/|of)\s*\d{1,3})?$|^[-–—]\s*\d{1,3}\s*[-–—]$", re.I)
+_BULLET = re.compile(r"^[•·●▪◦■□➢►✓✔*\uf0b7]+\s*")
+_LEADER = re.compile(r"(?:\.{4,}|_{4,}|-{4,}|={4,})")
+
+_encoding = None
+if importlib.util.find_spec("tiktoken") is not None:
+    try:
+        import tiktoken
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        _encoding = None
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """Local token count: tiktoken when installed, otherwise a characters-per-token estimate"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens, preferring a line boundary"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding is not None:
+        cut = _encoding.decode(_encoding.encode(text, disallowed_special=())[:max(max_tokens, 0)])
+    else:
+        cut = text[:max(max_tokens, 0) * CHARS_PER_TOKEN]
+    if "\n" in cut[len(cut) // 2:]:
+        cut = cut[:cut.rindex("\n")]
+    return cut.rstrip() + "\n[...]"
+
+
+def _edge_lines(page: List[str]) -> set:
+    """Positions of the first and last PAGE_EDGE_LINES non-empty lines of a page"""
+    filled = [position for position, line in enumerate(page) if line]
+    return set(filled[:PAGE_EDGE_LINES] + filled[-PAGE_EDGE_LINES:])
+
+
+def compact_text(text: str) -> str:
+    """
+    Remove noise that costs tokens but carries no information.
+
+    Normalizes whitespace, rejoins words hyphenated across line breaks, drops
+    dot leaders and unifies bullet glyphs. Page furniture is only recognised at
+    page boundaries: page numbers in the first or last lines of a page, and
+    running headers/footers that sit at the edge of several pages, once per
+    page (the first copy is kept). Lines inside a page's body are never dropped.
+    """
+    text = normalize_text(text)
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+
+    lines = [line if line == PAGE_BREAK else _LEADER.sub(" ", line).strip() for line in text.split("\n")]
+    pages, page = [], []
+    for line in lines:
+        if line == PAGE_BREAK:
+            pages.append(page)
+            page = []
+        else:
+            page.append(line)
+    pages.append(page)
+
+    running = set()
+    if len(pages) > 1:
+        edges = [_edge_lines(page) for page in pages]
+        at_edge, anywhere = Counter(), Counter()
+        for page, edge in zip(pages, edges):
+            for position, line in enumerate(page):
+                if line:
+                    anywhere[line] += 1
+                    at_edge[line] += position in edge
+        running = {
+            line for line, count in at_edge.items()
+            if count >= 2 and anywhere[line] == count and len(line) < 80
+            and all(page.count(line) <= 1 for page in pages)
+        }
+
+    kept, seen_running = [], set()
+    for page in pages:
+        if kept and kept[-1]:
+            kept.append("")
+        edge = _edge_lines(page)
+        for position, line in enumerate(page):
+            if position in edge and _PAGE_NUMBER.match(line):
+                continue
+            if line in running:
+                if line in seen_running:
+                    continue
+                seen_running.add(line)
+            line = _BULLET.sub("- ", line)
+            if not line and (not kept or not kept[-1]):
+                continue
+            kept.append(line)
+    return "\n".join(kept).strip()
+
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """Split CV text into (section, text) parts at recognised headings; text keeps its heading line"""
+    sections = []
+    name, lines = "header", []
+    for line in text.splitlines():
+        heading = _HEADING.match(line.strip())
+        if heading:
+            sections.append((name, "\n".join(lines).strip()))
+            name, lines = heading.group(1).lower(), [line]
+        else:
+            lines.append(line)
+    sections.append((name, "\n".join(lines).strip()))
+    return [(name, body) for name, body in sections if body]
+
+
+def fit_budget(cv_text: str, jd_text: Optional[str], budget: int = PROMPT_TOKEN_BUDGET) -> Tuple[str, Optional[str], List[str]]:
+    """
+    Trim a CV (and job description) to a combined token budget.
+
+    Low-value CV sections are dropped first; if that is not enough the JD is
+    cut to its share of the budget and the CV to the remainder.
+
+    Returns:
+        (cv_text, jd_text, names of dropped sections)
+    """
+    jd_tokens = count_tokens(jd_text)
+    if budget <= 0 or count_tokens(cv_text) + jd_tokens <= budget:
+        return cv_text, jd_text, []
+
+    sections = split_sections(cv_text)
+    total = sum(count_tokens(body) for _, body in sections) + jd_tokens
+    dropped = []
+    for low_value in LOW_VALUE_SECTIONS:
+        if total <= budget:
+            break
+        for position, (name, body) in enumerate(sections):
+            if name == low_value and body:
+                total -= count_tokens(body)
+                sections[position] = (name, "")
+                if name not in dropped:
+                    dropped.append(name)
+    cv_text = "\n\n".join(body for _, body in sections if body)
+
+    if count_tokens(cv_text) + jd_tokens > budget:
+        if jd_text:
+            jd_text = truncate_tokens(jd_text, max(int(budget * JD_BUDGET_SHARE), budget - count_tokens(cv_text)))
+        cv_text = truncate_tokens(cv_text, budget - count_tokens(jd_text))
+    return cv_text, jd_text, dropped
+
+
+class TokenSavings:
+    """
+    Prompt input tokens before and after compaction, accumulated per request,
+    plus the input tokens the provider served from its prompt cache
+    """
+
+    def __init__(self):
+        self.original_tokens = 0
+        self.sent_tokens = 0
+        self.cached_tokens = 0
+        self.dropped_sections = []
+
+    def add(self, original: int, sent: int, dropped: List[str]):
+        self.original_tokens += original
+        self.sent_tokens += sent
+        self.dropped_sections.extend(name for name in dropped if name not in self.dropped_sections)
+
+    def to_dict(self) -> dict:
+        return {
+            "original_tokens": self.original_tokens,
+            "sent_tokens": self.sent_tokens,
+            "tokens_saved": self.original_tokens - self.sent_tokens,
+            "cached_tokens": self.cached_tokens,
+            "dropped_sections": self.dropped_sections,
+        }
+
+
+_current_savings = contextvars.ContextVar("token_savings", default=None)
+_totals = TokenSavings()
+_totals_lock = threading.Lock()
+
+
+@contextmanager
+def track():
+    """Collect the token savings of every prompt built inside the block"""
+    savings = TokenSavings()
+    token = _current_savings.set(savings)
+    try:
+        yield savings
+    finally:
+        _current_savings.reset(token)
+
+
+def current_savings() -> Optional[TokenSavings]:
+    return _current_savings.get()
+
+
+def prepare_inputs(cv_text: str, jd_text: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """
+    Compact the prompt inputs and fit them to PROMPT_TOKEN_BUDGET, recording the savings.
+
+    Args:
+        cv_text: CV text to send (raw or the compact parsed form)
+        jd_text: Optional job description text
+
+    Returns:
+        (cv_text, jd_text) ready for the prompt
+    """
+    original = count_tokens(cv_text) + count_tokens(jd_text)
+    cv_text = compact_text(cv_text)
+    jd_text = compact_text(jd_text) if jd_text else jd_text
+    cv_text, jd_text, dropped = fit_budget(cv_text, jd_text)
+    sent = count_tokens(cv_text) + count_tokens(jd_text)
+
+    savings = current_savings()
+    if savings is not None:
+        savings.add(original, sent, dropped)
+    with _totals_lock:
+        _totals.add(original, sent, [])
+    return cv_text, jd_text
+
+
+def record_cached_tokens(tokens: int):
+    """Record prompt tokens a completion read from the provider's prompt cache"""
+    if not tokens:
+        return
+    savings = current_savings()
+    if savings is not None:
+        savings.cached_tokens += tokens
+    with _totals_lock:
+        _totals.cached_tokens += tokens
+
+
+def stats() -> dict:
+    with _totals_lock:
+        totals = _totals.to_dict()
+    del totals["dropped_sections"]
+    return {"token_budget": PROMPT_TOKEN_BUDGET, "tokenizer": "tiktoken" if _encoding is not None else "estimate", **totals}
@@ -0,0 +1,174 @@
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, List, Optional, Tuple
+import json
+import re
+
+
+class _Section(BaseModel):
+    # LLM output is loosely typed: ignore unknown keys and accept numbers for text
+    model_config = ConfigDict(extra="ignore", coerce_numbers_to_str=True)
+
+
+class ContactInfo(_Section):
+    name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    linkedin: Optional[str] = None
+    location: Optional[str] = None
+
+
+class Experience(_Section):
+    company: Optional[str] = None
+    role: Optional[str] = None
+    duration: Optional[str] = None
+    responsibilities: List[str] = Field(default_factory=list)
+    achievements: List[str] = Field(default_factory=list)
+
+
+class Education(_Section):
+    institution: Optional[str] = None
+    degree: Optional[str] = None
+    year: Optional[str] = None
+    gpa: Optional[str] = None
+
+
+class Skills(_Section):
+    technical: List[str] = Field(default_factory=list)
+    soft: List[str] = Field(default_factory=list)
+    tools: List[str] = Field(default_factory=list)
+    languages: List[str] = Field(default_factory=list)
+
+
+class Project(_Section):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    technologies: List[str] = Field(default_factory=list)
+
+
+class CVDocument(_Section):
+    """Structured CV produced once by parse_cv and reused by the downstream tools"""
+
+    contact: ContactInfo = Field(default_factory=ContactInfo)
+    summary: Optional[str] = None
+    experience: List[Experience] = Field(default_factory=list)
+    education: List[Education] = Field(default_factory=list)
+    skills: Skills = Field(default_factory=Skills)
+    certifications: List[str] = Field(default_factory=list)
+    projects: List[Project] = Field(default_factory=list)
+    additional: Dict[str, List[str]] = Field(default_factory=dict)
+    content_hash: Optional[str] = None
+
+    @classmethod
+    def from_llm_json(cls, raw: str, content_hash: Optional[str] = None) -> "CVDocument":
+        """Validate a JSON completion, tolerating markdown code fences around it"""
+        text = raw.strip()
+        fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, re.S)
+        if fenced:
+            text = fenced.group(1)
+        document = cls.model_validate(json.loads(text))
+        if document.is_empty():
+            # Valid JSON under other keys validates to an empty document; never treat it as a parse
+            raise ValueError("Model output has none of the CV document fields")
+        document.content_hash = content_hash
+        return document
+
+    def is_empty(self) -> bool:
+        return not self.to_prompt().strip()
+
+    def to_prompt(self) -> str:
+        """Compact plain-text serialization used in downstream prompts"""
+        lines = []
+        contact = [v for v in (self.contact.email, self.contact.phone, self.contact.linkedin, self.contact.location) if v]
+        if self.contact.name:
+            lines.append(f"NAME: {self.contact.name}")
+        if contact:
+            lines.append(f"CONTACT: {' | '.join(contact)}")
+        if self.summary:
+            lines.append(f"SUMMARY: {self.summary}")
+
+        if self.experience:
+            lines.append("EXPERIENCE:")
+            for job in self.experience:
+                header = " @ ".join(v for v in (job.role, job.company) if v)
+                lines.append(f"- {header}" + (f" ({job.duration})" if job.duration else ""))
+                lines.extend(f"  * {item}" for item in job.responsibilities + job.achievements)
+
+        if self.education:
+            lines.append("EDUCATION:")
+            for school in self.education:
+                details = ", ".join(v for v in (school.year, f"GPA {school.gpa}" if school.gpa else None) if v)
+                entry = ", ".join(v for v in (school.degree, school.institution) if v)
+                lines.append(f"- {entry}" + (f" ({details})" if details else ""))
+
+        skills = {
+            "technical": self.skills.technical,
+            "tools": self.skills.tools,
+            "soft": self.skills.soft,
+            "languages": self.skills.languages,
+        }
+        skill_groups = [f"{group}: {', '.join(items)}" for group, items in skills.items() if items]
+        if skill_groups:
+            lines.append(f"SKILLS: {'; '.join(skill_groups)}")
+        if self.certifications:
+            lines.append(f"CERTIFICATIONS: {', '.join(self.certifications)}")
+
+        if self.projects:
+            lines.append("PROJECTS:")
+            for project in self.projects:
+                entry = ": ".join(v for v in (project.name, project.description) if v)
+                if project.technologies:
+                    entry += f" [{', '.join(project.technologies)}]"
+                lines.append(f"- {entry}")
+
+        for section, items in self.additional.items():
+            if items:
+                lines.append(f"{section.upper()}: {'; '.join(items)}")
+
+        return "\n".join(lines)
+
+    def sections(self) -> List[Tuple[str, str]]:
+        """(section, text) chunks for search indexing; one chunk per job and project"""
+        chunks = []
+        if self.summary:
+            chunks.append(("summary", self.summary))
+
+        for job in self.experience:
+            header = " @ ".join(v for v in (job.role, job.company) if v)
+            lines = [header + (f" ({job.duration})" if job.duration else "")]
+            lines.extend(job.responsibilities + job.achievements)
+            chunks.append(("experience", "\n".join(line for line in lines if line)))
+
+        education = [", ".join(v for v in (school.degree, school.institution, school.year) if v) for school in self.education]
+        if any(education):
+            chunks.append(("education", "\n".join(entry for entry in education if entry)))
+
+        skills = self.skills.technical + self.skills.tools + self.skills.soft + self.skills.languages
+        if skills:
+            chunks.append(("skills", ", ".join(skills)))
+        if self.certifications:
+            chunks.append(("certifications", ", ".join(self.certifications)))
+
+        for project in self.projects:
+            text = ": ".join(v for v in (project.name, project.description) if v)
+            if project.technologies:
+                text += f" [{', '.join(project.technologies)}]"
+            if text:
+                chunks.append(("projects", text))
+
+        for section, items in self.additional.items():
+            if items:
+                chunks.append((section.lower(), "; ".join(items)))
+
+        return [(section, text) for section, text in chunks if text.strip()]
+
+
+# JSON shape requested from the model; mirrors CVDocument without content_hash
+CV_DOCUMENT_SHAPE = json.dumps(
+    CVDocument().model_dump(exclude={"content_hash"})
+    | {
+        "experience": [Experience().model_dump()],
+        "education": [Education().model_dump()],
+        "projects": [Project().model_dump()],
+        "additional": {"awards": []},
+    }
+)
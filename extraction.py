@@ -0,0 +1,146 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+from cache import LRUCache
+
+# Legacy binary .doc files are not supported: without a real parser they only yield formatting noise
+SUPPORTED_EXTENSIONS = ['.pdf', '.docx', '.txt']
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACTION_CACHE_ENTRIES = int(os.getenv("EXTRACTION_CACHE_ENTRIES", "512"))
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# Line marking a page boundary in extracted text (PDF pages, DOCX page breaks)
+PAGE_BREAK = "\f"
+
+_executor: Optional[ProcessPoolExecutor] = None
+_text_cache = LRUCache(EXTRACTION_CACHE_ENTRIES)
+
+
+class ExtractionError(ValueError):
+    """Raised when a document contains no readable text"""
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace runs and blank lines into compact plain text; page breaks stay on their own line"""
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\u00a0", " ")
+    text = re.sub(r"[\x00-\x08\x0b\x0e-\x1f\x7f]", "", text)
+    text = re.sub(r"[ \t]*\f[ \t]*", f"\n{PAGE_BREAK}\n", text)
+    lines = [re.sub(r"[ \t]+", " ", line).strip(" \t") for line in text.split("\n")]
+    text = "\n".join(lines)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def _extract_pdf(data: bytes) -> str:
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    return f"\n{PAGE_BREAK}\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def _extract_docx(data: bytes) -> str:
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        root = ET.fromstring(archive.read("word/document.xml"))
+
+    paragraphs = []
+    for paragraph in root.iter(f"{_WORD_NS}p"):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == f"{_WORD_NS}t" and node.text:
+                parts.append(node.text)
+            elif node.tag == f"{_WORD_NS}tab":
+                parts.append("\t")
+            elif node.tag == f"{_WORD_NS}br" and node.get(f"{_WORD_NS}type") == "page":
+                parts.append(PAGE_BREAK)
+            elif node.tag in (f"{_WORD_NS}br", f"{_WORD_NS}cr"):
+                parts.append("\n")
+        paragraphs.append("".join(parts))
+    return "\n".join(paragraphs)
+
+
+def _extract_txt(data: bytes) -> str:
+    for encoding in ("utf-8-sig", "utf-16"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("latin-1")
+
+
+_EXTRACTORS = {
+    ".pdf": _extract_pdf,
+    ".docx": _extract_docx,
+    ".txt": _extract_txt,
+}
+
+
+def extract_text(data: bytes, file_ext: str) -> str:
+    """
+    Extract normalized plain text from a document.
+
+    Args:
+        data: Raw file bytes
+        file_ext: File extension including the dot (.pdf, .docx, .txt)
+
+    Returns:
+        Normalized plain text
+    """
+    extractor = _EXTRACTORS.get(file_ext.lower())
+    if extractor is None:
+        raise ExtractionError(f"Unsupported file type: {file_ext}")
+
+    try:
+        text = normalize_text(extractor(data))
+    except ExtractionError:
+        raise
+    except Exception as e:
+        raise ExtractionError(f"Could not read {file_ext} file: {str(e)}") from e
+
+    if not text:
+        raise ExtractionError(f"No extractable text found in {file_ext} file (scanned or empty document?)")
+    return text
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # Workers start from a clean process instead of forking the server with its
+        # threads, locks and client pools; forkserver is unavailable on Windows
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _executor = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS,
+                                        mp_context=multiprocessing.get_context(start_method))
+    return _executor
+
+
+async def extract_text_async(data: bytes, file_ext: str) -> str:
+    """Extract text in the process pool, reusing earlier results for identical files"""
+    key = hashlib.sha256(data).hexdigest() + file_ext.lower()
+    cached = _text_cache.get(key)
+    if cached is not None:
+        return cached
+
+    if file_ext.lower() == ".txt":
+        # Decoding plain text is cheaper than the round trip to a worker process
+        text = extract_text(data, file_ext)
+    else:
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(_get_executor(), extract_text, data, file_ext)
+    _text_cache.set(key, text)
+    return text
+
+
+def shutdown():
+    """Stop the extraction worker processes"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
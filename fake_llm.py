@@ -0,0 +1,415 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+
+import httpx
+
+from cache import LRUCache, content_hash
+from compaction import compact_text, count_tokens, split_sections
+from keywords import ACTION_VERBS, extract_keywords_local
+from prompt_cache import message_text
+
+# Time to first token, in milliseconds
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+# Output token generation speed; 0 returns the whole completion at once
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0"))
+
+# Tool a completion is for, set by tools._complete around its upstream call.
+# Process-local, so routing metadata never reaches a real provider.
+_current_tool: ContextVar[Optional[str]] = ContextVar("fake_llm_tool", default=None)
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE = re.compile(r"\+?\d[\d\s().-]{7,}\d")
+_QUANTIFIED = re.compile(r"\d+\s*%|[$£€]\s?\d|\b\d+[kKmM]?\+?\b")
+_YEARS = re.compile(r"\b(19|20)\d{2}\b")
+
+# Lines that end the CV or job description block inside a tool prompt
+_PROMPT_STOPS = (
+    "Job Description:", "Job Description for context:", "Tailor the CV for this job:", "Focus especially on:",
+    "Original CV:", "Provide:", "Provide detailed analysis", "Provide a step-by-step plan", "For each issue:",
+    "Return a JSON array", "Text excerpt for context:", "Findings from the ATS evaluation",
+)
+_ESSENTIAL_SECTIONS = ("experience", "education", "skills")
+
+# Simulated provider prompt cache: hashes of the most recent cache_control-marked prefixes
+_cached_prefixes = LRUCache(1024)
+
+# Agent requests: first matching phrase in the user message picks the tool
+_AGENT_TOOL_HINTS = [
+    ("improvement plan", "generate_improvement_plan"),
+    ("rewrite", "generate_cv_rewrite"),
+    ("ats", "evaluate_ats_score"),
+    ("keyword", "extract_keywords"),
+    ("compare", "compare_cv_with_job"),
+    ("job description", "compare_cv_with_job"),
+    ("parse", "parse_cv"),
+    ("issue", "analyze_cv_issues"),
+]
+
+
+def _block(prompt: str, *labels: str) -> str:
+    """Text following the first of `labels` in a prompt, up to the next known prompt heading"""
+    lines = prompt.splitlines()
+    for label in labels:
+        for position, line in enumerate(lines):
+            if line.strip() != label:
+                continue
+            block = []
+            for following in lines[position + 1:]:
+                if following.strip().startswith(_PROMPT_STOPS):
+                    break
+                block.append(following.strip())
+            return "\n".join(block).strip()
+    return ""
+
+
+def _cv_and_jd(prompt: str) -> Tuple[str, str]:
+    cv_text = _block(prompt, "CV Content:", "CV:", "Original CV:")
+    jd_text = _block(prompt, "Job Description:", "Job Description for context:", "Tailor the CV for this job:")
+    return cv_text, jd_text
+
+
+def _section_names(cv_text: str) -> set:
+    """Sections present in raw CV text or in the compact CVDocument.to_prompt form"""
+    names = {name for name, _ in split_sections(cv_text)}
+    return names | {label.lower() for label in re.findall(r"^([A-Z]+):", cv_text, re.M)}
+
+
+def _keyword_match(cv_text: str, jd_text: str) -> Tuple[List[str], List[str]]:
+    """JD keywords present in and missing from the CV"""
+    cv_lower = cv_text.lower()
+    keywords = [item["keyword"] for item in extract_keywords_local(jd_text, 30)] if jd_text else []
+    present = [keyword for keyword in keywords if keyword.lower() in cv_lower]
+    return present, [keyword for keyword in keywords if keyword.lower() not in cv_lower]
+
+
+def _issues(cv_text: str) -> dict:
+    """CV problems found by simple checks, grouped by severity"""
+    sections = _section_names(cv_text)
+    words = re.findall(r"[a-z]+", cv_text.lower())
+    issues = {"critical_issues": [], "major_issues": [], "minor_issues": [], "suggestions": []}
+
+    def add(severity: str, issue: str, why: str, fix: str):
+        issues[severity].append({"issue": issue, "why_it_matters": why, "fix": fix})
+
+    if not _EMAIL.search(cv_text):
+        add("critical_issues", "Missing email address", "Recruiters cannot contact you", "Add a professional email address")
+    if not _PHONE.search(cv_text):
+        add("major_issues", "Missing phone number", "Many recruiters call first", "Add a phone number with country code")
+    if "linkedin" not in cv_text.lower():
+        add("minor_issues", "No LinkedIn profile", "Recruiters check profiles", "Add your LinkedIn URL")
+    for section in _ESSENTIAL_SECTIONS:
+        if section not in sections:
+            add("critical_issues", f"No '{section}' section", "ATS parsers look for standard headings",
+                f"Add a clearly titled {section.title()} section")
+    if not sections & {"summary", "profile", "objective", "about me"}:
+        add("major_issues", "No professional summary", "The summary is read first", "Add a 2-3 line summary")
+    if len(_QUANTIFIED.findall(cv_text)) < 3:
+        add("major_issues", "Few quantified achievements", "Numbers make impact concrete",
+            "Add metrics (%, amounts, team sizes) to your achievements")
+    if sum(word in ACTION_VERBS for word in words) < 3:
+        add("minor_issues", "Weak action verbs", "Strong verbs signal ownership", "Start bullets with verbs like 'led' or 'built'")
+    if len(words) > 900:
+        add("minor_issues", "CV is long", "Recruiters skim", "Trim to the most relevant two pages")
+    for section in ("projects", "certifications"):
+        if section not in sections:
+            add("suggestions", f"Add a {section} section", "It adds evidence of your skills", f"List relevant {section}")
+    return issues
+
+
+def _ats_evaluation(cv_text: str, jd_text: str) -> dict:
+    sections = _section_names(cv_text)
+    words = re.findall(r"[a-z]+", cv_text.lower())
+    present, missing = _keyword_match(cv_text, jd_text)
+    breakdown = {
+        "structure_formatting": min(25, 5 + 4 * len(sections - {"header"})),
+        "contact_information": 5 * bool(_EMAIL.search(cv_text)) + 5 * bool(_PHONE.search(cv_text))
+        + 5 * ("linkedin" in cv_text.lower()),
+        "keywords_content": min(30, 2 * sum(word in ACTION_VERBS for word in words)
+                                + 2 * len(_QUANTIFIED.findall(cv_text)) + len(extract_keywords_local(cv_text, 20)) // 2),
+        "completeness": 5 * sum(section in sections for section in _ESSENTIAL_SECTIONS)
+        + 5 * bool(sections & {"summary", "profile", "objective"}),
+        "job_match": round(10 * len(present) / (len(present) + len(missing))) if present or missing else 5,
+    }
+    issues = _issues(cv_text)
+    found = [item for severity in ("critical_issues", "major_issues", "minor_issues") for item in issues[severity]]
+    return {
+        "overall_score": sum(breakdown.values()),
+        "score_breakdown": breakdown,
+        "issues": [item["issue"] for item in found],
+        "recommendations": [item["fix"] for item in found] + [f"Mention '{keyword}' if relevant" for keyword in missing[:5]],
+        "priority_ranking": (
+            [{"fix": item["fix"], "priority": "Critical"} for item in issues["critical_issues"]]
+            + [{"fix": item["fix"], "priority": "High"} for item in issues["major_issues"]]
+            + [{"fix": item["fix"], "priority": "Low"} for item in issues["minor_issues"]]
+        ),
+    }
+
+
+def _parsed_cv(cv_text: str) -> dict:
+    """A CVDocument-shaped dict read from headings, contact patterns and skill lists"""
+    sections = dict(split_sections(cv_text))
+    header = sections.get("header", "").splitlines()
+    email, phone = _EMAIL.search(cv_text), _PHONE.search(cv_text)
+    linkedin = re.search(r"(?:https?://)?(?:www\.)?linkedin\.com/\S+", cv_text, re.I)
+
+    def body(*names: str) -> List[str]:
+        lines = next((sections[name] for name in names if name in sections), "").splitlines()[1:]
+        return [line.strip() for line in lines if line.strip()]
+
+    experience = []
+    for line in body("experience", "employment", "employment history"):
+        bullet = re.match(r"^[-•*]\s*(.+)", line)
+        if bullet and experience:
+            experience[-1]["responsibilities"].append(bullet.group(1))
+        elif not bullet:
+            role, _, rest = line.partition(" - ")
+            years = re.search(r"\(([^)]*\d{4}[^)]*)\)", rest)
+            experience.append({
+                "company": rest[:years.start()].strip() if years else (rest.strip() or None),
+                "role": role.strip(),
+                "duration": years.group(1) if years else None,
+                "responsibilities": [],
+                "achievements": [],
+            })
+
+    education = []
+    for line in body("education"):
+        degree, _, institution = line.partition(" - ")
+        year = _YEARS.search(line)
+        education.append({"institution": institution.split("(")[0].strip() or None, "degree": degree.strip(),
+                          "year": year.group(0) if year else None, "gpa": None})
+
+    skills = [skill.strip() for line in body("skills", "technical skills", "core competencies")
+              for skill in re.split(r"[,;|]", line.lstrip("-•* ")) if skill.strip()]
+    return {
+        "contact": {
+            "name": header[0].strip() if header else None,
+            "email": email.group(0) if email else None,
+            "phone": phone.group(0).strip() if phone else None,
+            "linkedin": linkedin.group(0) if linkedin else None,
+            "location": None,
+        },
+        "summary": " ".join(body("summary", "profile", "objective", "about me")) or None,
+        "experience": experience,
+        "education": education,
+        "skills": {"technical": skills, "soft": [], "tools": [], "languages": []},
+        "certifications": body("certifications", "licenses"),
+        "projects": [{"name": line.lstrip("-•* "), "description": None, "technologies": []} for line in body("projects")],
+        "additional": {"awards": body("awards")} if "awards" in sections else {},
+    }
+
+
+def tool_response(tool: str, prompt: str) -> str:
+    """Deterministic completion text for one of the tools in tools.py"""
+    top_n = int((re.search(r"Number of keywords: (\d+)", prompt) or [None, 20])[1])
+    if tool == "parse_cv":
+        return json.dumps(_parsed_cv(_block(prompt, "CV Content:")))
+    if tool == "extract_keywords":
+        return json.dumps(extract_keywords_local(_block(prompt, "Text:"), top_n), indent=2)
+    if tool == "extract_keywords_rerank":
+        candidates = re.findall(r"^\s*- (.+) \((\w+)\)\s*$", _block(prompt, "Candidates:"), re.M)
+        return json.dumps([
+            {"keyword": keyword, "category": category, "importance": round(1 - rank / max(len(candidates), 1), 2)}
+            for rank, (keyword, category) in enumerate(candidates[:top_n])
+        ], indent=2)
+
+    cv_text, jd_text = _cv_and_jd(prompt)
+    if tool == "compare_cv_with_job":
+        present, missing = _keyword_match(cv_text, jd_text)
+        return json.dumps({
+            "overall_fit_score": round(100 * len(present) / (len(present) + len(missing))) if present or missing else 0,
+            "keyword_match": {"present": present, "missing": missing},
+            "recommendations": [f"Add evidence of {keyword} to your experience" for keyword in missing[:5]],
+        }, indent=2)
+    if tool == "evaluate_ats_score":
+        return json.dumps(_ats_evaluation(cv_text, jd_text), indent=2)
+    if tool == "analyze_cv_issues":
+        return json.dumps(_issues(cv_text), indent=2)
+    if tool == "generate_cv_rewrite":
+        issues = _issues(cv_text)
+        return json.dumps({
+            "rewritten_cv": compact_text(cv_text),
+            "key_changes": [item["fix"] for severity in issues.values() for item in severity],
+            "tailored_keywords": _keyword_match(cv_text, jd_text)[1][:10],
+        }, indent=2)
+    if tool == "generate_improvement_plan":
+        evaluation, issues = _ats_evaluation(cv_text, jd_text), _issues(cv_text)
+        fixes = {severity: [{"action": item["fix"], "impact": impact} for item in issues[severity]]
+                 for severity, impact in (("critical_issues", "High"), ("major_issues", "Medium"), ("minor_issues", "Low"))}
+        return json.dumps({
+            "current_score": evaluation["overall_score"],
+            "projected_score": min(100, evaluation["overall_score"] + 5 * len(evaluation["issues"])),
+            "quick_wins": fixes["critical_issues"] + fixes["minor_issues"],
+            "essential_improvements": fixes["major_issues"],
+            "advanced_optimization": [{"action": f"Tailor the CV to mention {keyword}", "impact": "Medium"}
+                                      for keyword in _keyword_match(cv_text, jd_text)[1][:5]],
+            "long_term_enhancements": [{"action": item["fix"], "impact": "Low"} for item in issues["suggestions"]],
+        }, indent=2)
+    return json.dumps({"result": f"Fake response for {tool}"})
+
+
+def _agent_tool_call(body: dict) -> Optional[dict]:
+    """Pick a tool from the last user message and fill its required arguments with that message"""
+    offered = {tool["function"]["name"]: tool["function"] for tool in body.get("tools", [])}
+    messages = body.get("messages", [])
+    if not offered or any(message.get("role") == "tool" for message in messages):
+        return None
+    user_text = next((message_text(message.get("content")) for message in reversed(messages) if message.get("role") == "user"), "")
+    lowered = user_text.lower()
+    name = next((tool for hint, tool in _AGENT_TOOL_HINTS if re.search(rf"\b{hint}", lowered) and tool in offered),
+                "analyze_cv_issues" if "analyze_cv_issues" in offered else next(iter(offered)))
+    parameters = offered[name].get("parameters", {})
+    arguments = {}
+    for argument in parameters.get("required", []):
+        schema = parameters.get("properties", {}).get(argument, {})
+        arguments[argument] = schema.get("default", 20) if schema.get("type") == "integer" else user_text
+    return {"id": f"call_{uuid.uuid5(uuid.NAMESPACE_OID, user_text).hex[:12]}", "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+def _agent_response(body: dict) -> str:
+    results = [message_text(message.get("content")) for message in body.get("messages", []) if message.get("role") == "tool"]
+    if results:
+        return "## Analysis\n\n" + "\n\n".join(results)
+    return "I can parse, score, compare, rewrite and plan improvements for CVs. Share a CV to get started."
+
+
+def respond(body: dict, tool: Optional[str]) -> Tuple[Optional[str], Optional[dict]]:
+    """(content, tool_call) for a chat completion request"""
+    if tool:
+        prompt = next((message_text(message.get("content")) for message in body.get("messages", [])
+                       if message.get("role") == "user"), "")
+        return tool_response(tool, prompt), None
+    tool_call = _agent_tool_call(body)
+    return (None, tool_call) if tool_call else (_agent_response(body), None)
+
+
+def _cached_tokens(body: dict) -> int:
+    """Tokens of the marked prompt prefix if an earlier request already cached it"""
+    for message in body.get("messages", []):
+        parts = message.get("content")
+        if isinstance(parts, list) and any(isinstance(part, dict) and "cache_control" in part for part in parts):
+            prefix = message_text(parts)
+            key = content_hash(prefix)
+            if _cached_prefixes.get(key) is not None:
+                return count_tokens(prefix)
+            _cached_prefixes.set(key, True)
+            return 0
+    return 0
+
+
+def _usage(body: dict, content: Optional[str], tool_call: Optional[dict]) -> dict:
+    prompt_tokens = sum(count_tokens(message_text(message.get("content"))) for message in body.get("messages", []))
+    completion_tokens = count_tokens(content or json.dumps(tool_call))
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": _cached_tokens(body)}}
+
+
+def _completion(body: dict, content: Optional[str], tool_call: Optional[dict], usage: dict) -> dict:
+    message = {"role": "assistant", "content": content}
+    if tool_call:
+        message["tool_calls"] = [tool_call]
+    return {
+        "id": f"chatcmpl-fake-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}],
+        "usage": usage,
+    }
+
+
+def _stream_events(body: dict, content: Optional[str], tool_call: Optional[dict], usage: dict) -> Iterator[Tuple[bytes, int]]:
+    """SSE chunks of a streamed completion, each with the number of tokens it carries"""
+    completion_id = f"chatcmpl-fake-{uuid.uuid4().hex[:12]}"
+
+    def chunk(delta: dict, finish_reason: Optional[str] = None, usage: Optional[dict] = None) -> bytes:
+        payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                   "model": body.get("model", "fake"), "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+        if usage is not None:
+            payload["usage"] = usage
+        return f"data: {json.dumps(payload)}\n\n".encode()
+
+    yield chunk({"role": "assistant"}), 0
+    if tool_call:
+        yield chunk({"tool_calls": [{"index": 0, **tool_call}]}), usage["completion_tokens"]
+    else:
+        words = content.split(" ")
+        for position in range(0, len(words), 8):
+            piece = " ".join(words[position:position + 8]) + (" " if position + 8 < len(words) else "")
+            yield chunk({"content": piece}), count_tokens(piece)
+    yield chunk({}, "tool_calls" if tool_call else "stop", usage), 0
+    yield b"data: [DONE]\n\n", 0
+
+
+@contextmanager
+def tool_scope(tool: str):
+    """Mark completions made inside the block as calls of `tool`"""
+    token = _current_tool.set(tool)
+    try:
+        yield
+    finally:
+        _current_tool.reset(token)
+
+
+def _generation_seconds(tokens: int) -> float:
+    return tokens / FAKE_LLM_TOKENS_PER_SECOND if FAKE_LLM_TOKENS_PER_SECOND > 0 else 0.0
+
+
+def _prepare(request: httpx.Request):
+    """Parsed body and response parts for a chat completion request; None for any other request"""
+    if request.method != "POST" or not request.url.path.endswith("/chat/completions"):
+        return None
+    body = json.loads(request.content or b"{}")
+    content, tool_call = respond(body, _current_tool.get())
+    return body, content, tool_call, _usage(body, content, tool_call)
+
+
+class FakeLLMTransport(httpx.BaseTransport):
+    """Sync transport answering chat completions locally, with simulated latency"""
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        prepared = _prepare(request)
+        if prepared is None:
+            return httpx.Response(200, json={}, request=request)
+        body, content, tool_call, usage = prepared
+        time.sleep(FAKE_LLM_LATENCY_MS / 1000)
+
+        if body.get("stream"):
+            def stream():
+                for event, tokens in _stream_events(body, content, tool_call, usage):
+                    time.sleep(_generation_seconds(tokens))
+                    yield event
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=stream(), request=request)
+
+        time.sleep(_generation_seconds(usage["completion_tokens"]))
+        return httpx.Response(200, json=_completion(body, content, tool_call, usage), request=request)
+
+
+class AsyncFakeLLMTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of FakeLLMTransport"""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        prepared = _prepare(request)
+        if prepared is None:
+            return httpx.Response(200, json={}, request=request)
+        body, content, tool_call, usage = prepared
+        await asyncio.sleep(FAKE_LLM_LATENCY_MS / 1000)
+
+        if body.get("stream"):
+            async def stream():
+                for event, tokens in _stream_events(body, content, tool_call, usage):
+                    await asyncio.sleep(_generation_seconds(tokens))
+                    yield event
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=stream(), request=request)
+
+        await asyncio.sleep(_generation_seconds(usage["completion_tokens"]))
+        return httpx.Response(200, json=_completion(body, content, tool_call, usage), request=request)
@@ -0,0 +1,243 @@
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+# A running job's heartbeat is refreshed every JOB_HEARTBEAT_SECONDS; once it is
+# older than JOB_LEASE_SECONDS the process running it is presumed dead and the job is queued again
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# How often long-polls check for jobs finished by another process
+JOB_POLL_SECONDS = 1.0
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+
+class JobQueue:
+    """
+    Persistent background job queue with an in-process worker pool.
+
+    Jobs are stored in SQLite so queued work survives a restart, and several
+    processes may share one database: a job is claimed atomically, so only one
+    worker runs it. Running jobs hold a lease renewed by heartbeats; jobs whose
+    lease expired (their process died) are queued again. Finished jobs are
+    deleted once they are older than the retention period.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str, dict], Awaitable[dict]],
+        db_path: str = JOBS_DB_PATH,
+        workers: int = JOB_WORKERS,
+        retention: float = JOB_RETENTION_SECONDS,
+        lease: float = JOB_LEASE_SECONDS,
+        heartbeat: float = JOB_HEARTBEAT_SECONDS
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.retention = retention
+        self.lease = lease
+        self.heartbeat = heartbeat
+        # Identifies this process's claims in the shared database
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, payload TEXT NOT NULL, "
+            "result TEXT, error TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+            "worker TEXT, heartbeat_at REAL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in (("worker", "TEXT"), ("heartbeat_at", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._conn.commit()
+        self._pending: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._finished_events: Dict[str, asyncio.Event] = {}
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            self._conn.commit()
+            return rows
+
+    def _update(self, sql: str, params: tuple = ()) -> int:
+        """Run a write and return the number of rows it changed"""
+        with self._lock:
+            count = self._conn.execute(sql, params).rowcount
+            self._conn.commit()
+            return count
+
+    async def _aexecute(self, sql: str, params: tuple = ()):
+        # SQLite calls block; keep them off the event loop
+        return await asyncio.to_thread(self._execute, sql, params)
+
+    async def _aupdate(self, sql: str, params: tuple = ()) -> int:
+        return await asyncio.to_thread(self._update, sql, params)
+
+    async def start(self):
+        """Recover jobs whose lease expired and start the workers"""
+        # Requeued before the local queue exists; the scan below picks them up
+        await self._requeue_expired()
+        self._pending = asyncio.Queue()
+        for (job_id,) in await self._aexecute("SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)):
+            self._pending.put_nowait(job_id)
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._purge_loop()))
+        self._tasks.append(asyncio.create_task(self._heartbeat_loop()))
+
+    async def stop(self):
+        """Stop workers; this process's unfinished jobs are queued again for the next start or another process"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._aupdate(
+            "UPDATE jobs SET status = ?, worker = NULL, started_at = NULL, heartbeat_at = NULL "
+            "WHERE status = ? AND worker = ?",
+            (QUEUED, RUNNING, self.worker_id)
+        )
+        with self._lock:
+            self._conn.close()
+
+    async def submit(self, kind: str, payload: dict) -> dict:
+        """Persist a job and queue it for the workers"""
+        job_id = uuid.uuid4().hex
+        await self._aexecute(
+            "INSERT INTO jobs (id, kind, status, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, json.dumps(payload), time.time())
+        )
+        self._pending.put_nowait(job_id)
+        return await self.get(job_id)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        rows = await self._aexecute(
+            "SELECT id, kind, status, result, error, created_at, started_at, finished_at FROM jobs WHERE id = ?",
+            (job_id,)
+        )
+        if not rows:
+            return None
+        job_id, kind, status, result, error, created_at, started_at, finished_at = rows[0]
+        job = {
+            "job_id": job_id,
+            "kind": kind,
+            "status": status,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+        }
+        if status == SUCCEEDED:
+            job["result"] = json.loads(result)
+        elif status == FAILED:
+            job["error"] = error
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """Return the job once finished, or its current state after timeout seconds"""
+        job = await self.get(job_id)
+        if job is None or job["status"] in FINISHED or timeout <= 0:
+            return job
+
+        # Woken by this process's workers; jobs run by another process are noticed by polling
+        deadline = time.monotonic() + timeout
+        event = self._finished_events.setdefault(job_id, asyncio.Event())
+        while True:
+            try:
+                await asyncio.wait_for(event.wait(), min(JOB_POLL_SECONDS, max(deadline - time.monotonic(), 0)))
+            except asyncio.TimeoutError:
+                pass
+            job = await self.get(job_id)
+            if job is None or job["status"] in FINISHED or time.monotonic() >= deadline:
+                if not event.is_set():
+                    self._finished_events.pop(job_id, None)
+                return job
+
+    async def stats(self) -> dict:
+        counts = dict(await self._aexecute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        return {
+            "workers": self.workers,
+            "retention_seconds": self.retention,
+            **{status: counts.get(status, 0) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)},
+        }
+
+    async def _worker(self):
+        while True:
+            job_id = await self._pending.get()
+            # Atomic claim: of all workers (in any process) that see this job, one wins
+            now = time.time()
+            claimed = await self._aupdate(
+                "UPDATE jobs SET status = ?, worker = ?, started_at = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, self.worker_id, now, now, job_id, QUEUED)
+            )
+            if not claimed:
+                continue
+            kind, payload = (await self._aexecute("SELECT kind, payload FROM jobs WHERE id = ?", (job_id,)))[0]
+
+            try:
+                result = await self.handler(kind, json.loads(payload))
+                await self._aupdate(
+                    "UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ? AND worker = ?",
+                    (SUCCEEDED, json.dumps(result), time.time(), job_id, self.worker_id)
+                )
+            except asyncio.CancelledError:
+                # Shutting down: stop() queues the job again
+                raise
+            except Exception as e:
+                await self._aupdate(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND worker = ?",
+                    (FAILED, str(e), time.time(), job_id, self.worker_id)
+                )
+
+            event = self._finished_events.pop(job_id, None)
+            if event is not None:
+                event.set()
+
+    async def _requeue_expired(self):
+        """Queue again the running jobs whose lease expired, i.e. whose process stopped heartbeating"""
+        expired_before = time.time() - self.lease
+        rows = await self._aexecute(
+            "SELECT id FROM jobs WHERE status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (RUNNING, expired_before)
+        )
+        for (job_id,) in rows:
+            # Conditional, so a job whose heartbeat was just renewed is left alone
+            requeued = await self._aupdate(
+                "UPDATE jobs SET status = ?, worker = NULL, started_at = NULL, heartbeat_at = NULL "
+                "WHERE id = ? AND status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                (QUEUED, job_id, RUNNING, expired_before)
+            )
+            if requeued and self._pending is not None:
+                self._pending.put_nowait(job_id)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            await self._aupdate(
+                "UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND worker = ?", (time.time(), RUNNING, self.worker_id)
+            )
+            await self._requeue_expired()
+
+    async def _purge_loop(self):
+        while True:
+            await self._aexecute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (SUCCEEDED, FAILED, time.time() - self.retention)
+            )
+            await asyncio.sleep(min(self.retention, 300))
@@ -0,0 +1,168 @@
+from collections import Counter, defaultdict
+from typing import Dict, List
+import re
+
+# Curated lexicon of ATS-relevant terms -> category (skill/tool/domain).
+# Multi-word entries are matched as phrases before single words.
+LEXICON: Dict[str, str] = {
+    # Programming languages and core skills
+    "python": "skill", "java": "skill", "javascript": "skill", "typescript": "skill", "go": "skill",
+    "golang": "skill", "rust": "skill", "c++": "skill", "c#": "skill", "ruby": "skill", "php": "skill",
+    "scala": "skill", "kotlin": "skill", "swift": "skill", "r": "skill", "sql": "skill", "bash": "skill",
+    "html": "skill", "css": "skill", "machine learning": "skill", "deep learning": "skill",
+    "data analysis": "skill", "data science": "skill", "data engineering": "skill", "statistics": "skill",
+    "natural language processing": "skill", "nlp": "skill", "computer vision": "skill",
+    "system design": "skill", "microservices": "skill", "rest api": "skill", "graphql": "skill",
+    "distributed systems": "skill", "ci/cd": "skill", "devops": "skill", "agile": "skill", "scrum": "skill",
+    "project management": "skill", "product management": "skill", "stakeholder management": "skill",
+    "leadership": "skill", "communication": "skill", "mentoring": "skill", "problem solving": "skill",
+    "test automation": "skill", "unit testing": "skill", "etl": "skill", "financial modeling": "skill",
+    "seo": "skill", "ux design": "skill", "ui design": "skill", "budgeting": "skill", "negotiation": "skill",
+    # Tools, platforms and frameworks
+    "aws": "tool", "azure": "tool", "gcp": "tool", "google cloud": "tool", "docker": "tool",
+    "kubernetes": "tool", "terraform": "tool", "ansible": "tool", "jenkins": "tool", "github actions": "tool",
+    "gitlab": "tool", "git": "tool", "linux": "tool", "react": "tool", "angular": "tool", "vue": "tool",
+    "node.js": "tool", "django": "tool", "flask": "tool", "fastapi": "tool", "spring": "tool",
+    "spring boot": "tool", ".net": "tool", "postgresql": "tool", "mysql": "tool", "mongodb": "tool",
+    "redis": "tool", "elasticsearch": "tool", "kafka": "tool", "rabbitmq": "tool", "spark": "tool",
+    "hadoop": "tool", "airflow": "tool", "snowflake": "tool", "databricks": "tool", "tableau": "tool",
+    "power bi": "tool", "excel": "tool", "pandas": "tool", "numpy": "tool", "scikit-learn": "tool",
+    "tensorflow": "tool", "pytorch": "tool", "jira": "tool", "confluence": "tool", "figma": "tool",
+    "salesforce": "tool", "sap": "tool", "prometheus": "tool", "grafana": "tool", "datadog": "tool",
+    # Domains and qualifications
+    "fintech": "domain", "healthcare": "domain", "e-commerce": "domain", "saas": "domain",
+    "banking": "domain", "insurance": "domain", "cybersecurity": "domain", "security": "domain",
+    "compliance": "domain", "cloud computing": "domain", "site reliability engineering": "domain",
+    "sre": "domain", "blockchain": "domain", "logistics": "domain", "marketing": "domain",
+    "digital marketing": "domain", "supply chain": "domain", "telecommunications": "domain",
+    "pmp": "domain", "cissp": "domain", "cpa": "domain", "phd": "domain", "mba": "domain",
+}
+
+ACTION_VERBS = {
+    "achieved", "architected", "automated", "built", "coordinated", "created", "delivered", "designed",
+    "developed", "drove", "established", "executed", "grew", "implemented", "improved", "increased",
+    "launched", "led", "managed", "mentored", "migrated", "negotiated", "optimized", "orchestrated",
+    "owned", "reduced", "scaled", "spearheaded", "streamlined", "trained", "transformed",
+}
+
+STOPWORDS = {
+    "a", "about", "above", "across", "after", "all", "also", "am", "an", "and", "any", "are", "as", "at",
+    "be", "been", "being", "between", "both", "but", "by", "can", "could", "did", "do", "does", "during",
+    "each", "etc", "for", "from", "had", "has", "have", "having", "he", "her", "his", "how", "i", "if",
+    "in", "into", "is", "it", "its", "me", "more", "most", "my", "no", "not", "of", "on", "one", "or",
+    "other", "our", "out", "over", "own", "per", "same", "she", "should", "so", "some", "such", "than",
+    "that", "the", "their", "them", "then", "there", "these", "they", "this", "those", "through", "to",
+    "under", "up", "us", "using", "very", "via", "was", "we", "were", "what", "when", "where", "which",
+    "while", "who", "will", "with", "within", "would", "you", "your", "years", "year", "experience",
+    "including", "responsible", "responsibilities", "work", "worked", "working", "team", "strong",
+    "ability", "new", "various", "well", "based", "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december", "present", "current",
+}
+
+# Tokens keep characters common in tech names: c++, c#, node.js, ci/cd, scikit-learn
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#./\-]*[a-z0-9+#]|[a-z0-9]")
+_PHRASE_BREAK = re.compile(r"[,;:!?()\[\]{}\"|•·●▪\n\t]|\.\s|\s-\s")
+_LEXICON_PHRASES = sorted((term for term in LEXICON if " " in term), key=len, reverse=True)
+
+
+def _tokens(fragment: str) -> List[str]:
+    return _TOKEN.findall(fragment)
+
+
+def _candidate_phrases(text: str) -> List[List[str]]:
+    """RAKE-style candidates: runs of content words split at stopwords and punctuation"""
+    phrases = []
+    for fragment in _PHRASE_BREAK.split(text.lower()):
+        current = []
+        for token in _tokens(fragment):
+            if token in STOPWORDS or token.isdigit() or token in ACTION_VERBS:
+                if current:
+                    phrases.append(current)
+                current = []
+            else:
+                current.append(token)
+        if current:
+            phrases.append(current)
+    # Very long runs are usually sentences without stopwords, not key phrases
+    return [phrase for phrase in phrases if len(phrase) <= 4]
+
+
+def _category(keyword: str) -> str:
+    if keyword in LEXICON:
+        return LEXICON[keyword]
+    if keyword in ACTION_VERBS:
+        return "action"
+    words = keyword.split()
+    if any(word in LEXICON and LEXICON[word] == "tool" for word in words):
+        return "tool"
+    if any(word in LEXICON and LEXICON[word] == "skill" for word in words):
+        return "skill"
+    return "domain"
+
+
+def extract_keywords_local(text: str, top_n: int = 20) -> List[dict]:
+    """
+    Rank keywords without an LLM.
+
+    Combines RAKE phrase scores (word degree / frequency), term frequency, a
+    boost for curated lexicon terms and action verbs found in the text.
+
+    Args:
+        text: Text to extract keywords from
+        top_n: Number of top keywords to return
+
+    Returns:
+        Keywords as dicts with keyword, category and importance (0-1), best first
+    """
+    lowered = text.lower()
+    scores: Dict[str, float] = defaultdict(float)
+
+    # RAKE word scores
+    phrases = _candidate_phrases(text)
+    frequency = Counter()
+    degree = Counter()
+    for phrase in phrases:
+        for word in phrase:
+            frequency[word] += 1
+            degree[word] += len(phrase) - 1
+    word_score = {word: (degree[word] + frequency[word]) / frequency[word] for word in frequency}
+
+    phrase_counts = Counter(" ".join(phrase) for phrase in phrases)
+    for phrase, count in phrase_counts.items():
+        if len(phrase) < 2:  # stray single characters
+            continue
+        rake = sum(word_score[word] for word in phrase.split())
+        scores[phrase] = max(scores[phrase], 0.5 * rake + count)
+
+    # Lexicon terms: exact phrase/word hits get a strong boost
+    token_counts = Counter(_tokens(lowered))
+    for term in _LEXICON_PHRASES:
+        hits = len(re.findall(r"(?<![a-z0-9])" + re.escape(term) + r"(?![a-z0-9])", lowered))
+        if hits:
+            scores[term] = max(scores[term], 10.0 + 2.0 * hits)
+    for term, category in LEXICON.items():
+        if " " not in term and token_counts.get(term):
+            # Single letters such as "r" need to appear as a distinct, listed token
+            if len(term) == 1 and not re.search(r"(?:^|[,;/]\s*)" + re.escape(term) + r"(?:\s*[,;/]|$)", lowered, re.M):
+                continue
+            scores[term] = max(scores[term], 8.0 + 2.0 * token_counts[term])
+
+    for verb in ACTION_VERBS:
+        if token_counts.get(verb):
+            scores[verb] = max(scores[verb], 3.0 + token_counts[verb])
+
+    # Drop phrases that merely contain a higher-scored lexicon term
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    selected = []
+    for keyword, score in ranked:
+        if any(keyword != other and other in LEXICON and f" {other} " in f" {keyword} " for other, _ in selected):
+            continue
+        selected.append((keyword, score))
+        if len(selected) >= top_n:
+            break
+
+    best = selected[0][1] if selected else 1.0
+    return [
+        {"keyword": keyword, "category": _category(keyword), "importance": round(score / best, 2)}
+        for keyword, score in selected
+    ]
@@ -0,0 +1,302 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+
+import openai
+
+import metrics
+
+T = TypeVar("T")
+
+# Overall deadline per tool call in seconds, covering retries and backoff.
+# Overrides: "tool=seconds,tool=seconds"
+LLM_DEFAULT_DEADLINE = float(os.getenv("LLM_DEFAULT_DEADLINE", "120"))
+TOOL_DEADLINES = {
+    "parse_cv": 60.0,
+    "extract_keywords": 30.0,
+    "extract_keywords_rerank": 30.0,
+    "evaluate_ats_score": 90.0,
+    "compare_cv_with_job": 90.0,
+    "analyze_cv_issues": 90.0,
+    "generate_improvement_plan": 120.0,
+    "generate_cv_rewrite": 180.0,
+    # A whole agent run: its model calls plus the tools it invokes
+    "agent": 300.0,
+}
+for _entry in filter(None, (part.strip() for part in os.getenv("LLM_TOOL_DEADLINES", "").split(","))):
+    _tool, _, _seconds = _entry.partition("=")
+    TOOL_DEADLINES[_tool.strip()] = float(_seconds)
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+
+# Short tools may send a duplicate request once the first has been running
+# longer than the tool's p95 latency; the first answer wins
+LLM_HEDGE_TOOLS = {tool.strip() for tool in os.getenv("LLM_HEDGE_TOOLS", "extract_keywords,extract_keywords_rerank,parse_cv").split(",") if tool.strip()}
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+
+# 429, 5xx and transport failures are worth another attempt; other 4xx are not
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+)
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """Raised when a tool call does not finish within its deadline"""
+
+
+class ToolStats:
+    """Rolling latency window and retry/hedge counters for one tool"""
+
+    def __init__(self, window: int = LLM_LATENCY_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def to_dict(self) -> dict:
+        ordered = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p50_seconds": round(ordered[len(ordered) // 2], 3) if ordered else None,
+            "p95_seconds": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3) if ordered else None,
+        }
+
+
+_stats: Dict[str, ToolStats] = {}
+_stats_lock = threading.Lock()
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+
+
+def _tool_stats(tool: str) -> ToolStats:
+    with _stats_lock:
+        return _stats.setdefault(tool, ToolStats())
+
+
+def _record(tool: str, **counters):
+    stats = _tool_stats(tool)
+    with _stats_lock:
+        for name, value in counters.items():
+            if name == "latency":
+                stats.latencies.append(value)
+            else:
+                setattr(stats, name, getattr(stats, name) + value)
+
+
+def _backoff(attempt: int, error: Exception) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when the server sends one"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), LLM_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+def _hedge_delay(tool: str) -> Optional[float]:
+    if tool not in LLM_HEDGE_TOOLS:
+        return None
+    return _tool_stats(tool).p95()
+
+
+def _hedged(tool: str, call: Callable[[float], T], timeout: float) -> T:
+    delay = _hedge_delay(tool)
+    if delay is None or delay >= timeout:
+        return call(timeout)
+
+    started = time.monotonic()
+    # Each attempt runs in a copy of the caller's context so tracing spans keep their parent
+    primary = _hedge_executor.submit(contextvars.copy_context().run, call, timeout)
+    done, _ = wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+
+    _record(tool, hedges=1)
+    backup = _hedge_executor.submit(contextvars.copy_context().run, call, max(timeout - (time.monotonic() - started), 0.001))
+    pending = {primary, backup}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                # The loser keeps running in its thread; its result is discarded
+                if future is backup:
+                    _record(tool, hedge_wins=1)
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+async def _ahedged(tool: str, call: Callable[[float], Awaitable[T]], timeout: float) -> T:
+    delay = _hedge_delay(tool)
+    if delay is None or delay >= timeout:
+        return await call(timeout)
+
+    started = time.monotonic()
+    primary = asyncio.ensure_future(call(timeout))
+    done, _ = await asyncio.wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+
+    _record(tool, hedges=1)
+    backup = asyncio.ensure_future(call(max(timeout - (time.monotonic() - started), 0.001)))
+    pending = {primary, backup}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is backup:
+                        _record(tool, hedge_wins=1)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def tool_deadline(tool: str) -> float:
+    return TOOL_DEADLINES.get(tool, LLM_DEFAULT_DEADLINE)
+
+
+def call_with_policy(tool: str, call: Callable[[float], T], deadline: Optional[float] = None) -> T:
+    """
+    Run a blocking LLM call under the tool's deadline, retry and hedging policy.
+
+    Args:
+        tool: Tool name, used to look up the deadline and latency statistics
+        call: Performs one request; receives the seconds left before the deadline as its timeout
+        deadline: Absolute time.monotonic() deadline shared with earlier calls (e.g.
+            other fallback models); defaults to the tool's deadline from now
+
+    Returns:
+        The result of the first successful attempt
+    """
+    if deadline is None:
+        deadline = time.monotonic() + tool_deadline(tool)
+    _record(tool, calls=1)
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            _record(tool, failures=1, timeouts=1)
+            raise LLMDeadlineExceeded(f"{tool} did not finish within its deadline")
+        started = time.monotonic()
+        try:
+            result = _hedged(tool, call, remaining)
+            _record(tool, latency=time.monotonic() - started)
+            return result
+        except RETRYABLE_ERRORS as e:
+            metrics.record_upstream_error(tool, e)
+            pause = _backoff(attempt, e)
+            if attempt >= LLM_MAX_RETRIES or time.monotonic() + pause >= deadline:
+                _record(tool, failures=1, timeouts=int(isinstance(e, openai.APITimeoutError)))
+                if isinstance(e, openai.APITimeoutError):
+                    raise LLMDeadlineExceeded(f"{tool} did not finish within its deadline") from e
+                raise
+            _record(tool, retries=1)
+            attempt += 1
+            time.sleep(pause)
+        except Exception as e:
+            metrics.record_upstream_error(tool, e)
+            _record(tool, failures=1)
+            raise
+
+
+async def acall_with_policy(tool: str, call: Callable[[float], Awaitable[T]], deadline: Optional[float] = None) -> T:
+    """Async counterpart of call_with_policy; call returns an awaitable"""
+    if deadline is None:
+        deadline = time.monotonic() + tool_deadline(tool)
+    _record(tool, calls=1)
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            _record(tool, failures=1, timeouts=1)
+            raise LLMDeadlineExceeded(f"{tool} did not finish within its deadline")
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(_ahedged(tool, call, remaining), remaining)
+            _record(tool, latency=time.monotonic() - started)
+            return result
+        except asyncio.TimeoutError as e:
+            metrics.record_upstream_error(tool, e)
+            _record(tool, failures=1, timeouts=1)
+            raise LLMDeadlineExceeded(f"{tool} did not finish within its deadline") from e
+        except RETRYABLE_ERRORS as e:
+            metrics.record_upstream_error(tool, e)
+            pause = _backoff(attempt, e)
+            if attempt >= LLM_MAX_RETRIES or time.monotonic() + pause >= deadline:
+                _record(tool, failures=1, timeouts=int(isinstance(e, openai.APITimeoutError)))
+                if isinstance(e, openai.APITimeoutError):
+                    raise LLMDeadlineExceeded(f"{tool} did not finish within its deadline") from e
+                raise
+            _record(tool, retries=1)
+            attempt += 1
+            await asyncio.sleep(pause)
+        except Exception as e:
+            metrics.record_upstream_error(tool, e)
+            _record(tool, failures=1)
+            raise
+
+
+async def await_with_deadline(tool: str, awaitable: Awaitable[T]) -> T:
+    """
+    Await a call that must not be retried or hedged, such as an agent run that
+    writes to its session history, under the tool's deadline.
+
+    Args:
+        tool: Tool name, used to look up the deadline and record statistics
+        awaitable: The call; it is cancelled once the deadline passes
+
+    Returns:
+        The call's result
+    """
+    _record(tool, calls=1)
+    started = time.monotonic()
+    try:
+        result = await asyncio.wait_for(awaitable, tool_deadline(tool))
+    except asyncio.TimeoutError as e:
+        metrics.record_upstream_error(tool, e)
+        _record(tool, failures=1, timeouts=1)
+        raise LLMDeadlineExceeded(f"{tool} did not finish within its deadline") from e
+    except Exception as e:
+        metrics.record_upstream_error(tool, e)
+        _record(tool, failures=1)
+        raise
+    _record(tool, latency=time.monotonic() - started)
+    return result
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return {tool: tool_stats.to_dict() for tool, tool_stats in _stats.items()}
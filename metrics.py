@@ -0,0 +1,106 @@
+from typing import Callable, Optional
+import time
+
+import openai
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from cache import response_cache
+from prompt_cache import cached_tokens
+from rate_limit import rate_limiter
+
+# LLM calls run from under a second to minutes; HTTP routes from milliseconds
+_LLM_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120, 240)
+_HTTP_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to response headers per route",
+    ["method", "route", "status"], buckets=_HTTP_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled", ["method"])
+
+LLM_CALL_DURATION = Histogram(
+    "llm_call_duration_seconds", "LLM completion latency per tool and model, retries included",
+    ["tool", "model", "outcome"], buckets=_LLM_BUCKETS
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by the upstream API", ["tool", "model", "direction"])
+LLM_UPSTREAM_ERRORS = Counter("llm_upstream_errors_total", "Failed upstream attempts by status code", ["tool", "status"])
+LLM_COALESCED_CALLS = Counter(
+    "llm_coalesced_calls_total", "Tool calls that joined an identical in-flight call instead of calling upstream", ["tool"]
+)
+
+AGENT_RUNS_IN_FLIGHT = Gauge("agent_runs_in_flight", "Agent runs currently executing in the worker pool")
+
+
+class _StatsCollector:
+    """Exports counters the cache and rate limiter already keep, read only at scrape time"""
+
+    def collect(self):
+        cache = response_cache.stats()
+        lookups = CounterMetricFamily("llm_cache_lookups", "LLM response cache lookups by result", labels=["result"])
+        lookups.add_metric(["memory_hit"], cache["hits"] - cache["disk_hits"])
+        lookups.add_metric(["disk_hit"], cache["disk_hits"])
+        lookups.add_metric(["miss"], cache["misses"])
+        yield lookups
+        yield GaugeMetricFamily("llm_cache_entries", "Entries in the in-memory LLM response cache", value=cache["memory_entries"])
+
+        queue_depth = GaugeMetricFamily("llm_rate_limit_queue_depth", "Calls waiting for rate limit capacity", labels=["model"])
+        wait_seconds = GaugeMetricFamily("llm_rate_limit_max_wait_seconds", "Longest rate limit wait so far", labels=["model"])
+        for model, stats in rate_limiter.stats().items():
+            queue_depth.add_metric([model], stats["queue_depth"])
+            wait_seconds.add_metric([model], stats["max_wait_seconds"])
+        yield queue_depth
+        yield wait_seconds
+
+
+REGISTRY.register(_StatsCollector())
+
+
+def track_agent_runs(in_flight: Callable[[], int]):
+    """Report the agent pool's in-flight count, read at scrape time"""
+    AGENT_RUNS_IN_FLIGHT.set_function(in_flight)
+
+
+def observe_request(method: str, route: str, status: int, started: float):
+    HTTP_REQUEST_DURATION.labels(method, route, str(status)).observe(time.perf_counter() - started)
+
+
+def observe_llm_call(tool: str, model: str, started: float, response=None):
+    """Record a finished completion: latency, and token usage when the call succeeded"""
+    outcome = "success" if response is not None else "error"
+    LLM_CALL_DURATION.labels(tool, model, outcome).observe(time.perf_counter() - started)
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        record_tokens(tool, model, usage.prompt_tokens or 0, usage.completion_tokens or 0, cached_tokens(usage))
+
+
+def record_tokens(tool: str, model: str, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0):
+    """Count usage; cached_input tokens are the part of the input served from the provider's prompt cache"""
+    if input_tokens:
+        LLM_TOKENS.labels(tool, model, "input").inc(input_tokens)
+    if output_tokens:
+        LLM_TOKENS.labels(tool, model, "output").inc(output_tokens)
+    if cached_input_tokens:
+        LLM_TOKENS.labels(tool, model, "cached_input").inc(cached_input_tokens)
+
+
+def record_coalesced(tool: str):
+    LLM_COALESCED_CALLS.labels(tool).inc()
+
+
+def record_upstream_error(tool: str, error: Exception):
+    """Count a failed attempt by HTTP status, or timeout/connection for transport failures"""
+    status: Optional[str] = None
+    if isinstance(error, openai.APIStatusError):
+        status = str(error.status_code)
+    elif isinstance(error, (openai.APITimeoutError, TimeoutError)):
+        status = "timeout"
+    elif isinstance(error, openai.APIConnectionError):
+        status = "connection"
+    if status is not None:
+        LLM_UPSTREAM_ERRORS.labels(tool, status).inc()
+
+
+def render() -> tuple:
+    """Current metrics in Prometheus text format, with the matching content type"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,170 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+# Time to first token, in milliseconds
+MOCK_LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "500"))
+# Output token generation speed; 0 returns the whole completion at once
+MOCK_TOKENS_PER_SECOND = float(os.getenv("MOCK_TOKENS_PER_SECOND", "100"))
+# Tokens generated per completion (capped by the request's max_tokens)
+MOCK_COMPLETION_TOKENS = int(os.getenv("MOCK_COMPLETION_TOKENS", "300"))
+# Share of requests answered with MOCK_ERROR_STATUS instead of a completion
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+MOCK_ERROR_STATUS = int(os.getenv("MOCK_ERROR_STATUS", "503"))
+# Answer the first agent turn with a tool call so agent runs make a tool round trip
+MOCK_AGENT_TOOL_CALLS = os.getenv("MOCK_AGENT_TOOL_CALLS", "true").lower() in ("1", "true", "yes")
+
+app = FastAPI(title="Mock OpenRouter")
+
+stats = {"requests": 0, "errors": 0, "tool_calls": 0}
+
+
+def _prompt_tokens(body: dict) -> int:
+    return sum(len(str(message.get("content") or "")) for message in body.get("messages", [])) // 4
+
+
+def _completion_tokens(body: dict) -> int:
+    max_tokens = body.get("max_tokens") or body.get("max_completion_tokens")
+    return min(MOCK_COMPLETION_TOKENS, max_tokens) if max_tokens else MOCK_COMPLETION_TOKENS
+
+
+def _content(body: dict, tokens: int) -> str:
+    """Completion text of roughly `tokens` tokens; valid JSON when JSON mode was requested"""
+    filler = " ".join(["lorem"] * max(tokens - 10, 1))
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        return json.dumps({"mock": True, "summary": filler})
+    return f"Mock analysis. {filler}"
+
+
+def _tool_call(body: dict):
+    """A call to the first offered tool, with every required string argument set to the last user message"""
+    if not (MOCK_AGENT_TOOL_CALLS and body.get("tools")):
+        return None
+    if any(message.get("role") == "tool" for message in body.get("messages", [])):
+        return None
+    user_text = next(
+        (str(message.get("content")) for message in reversed(body["messages"]) if message.get("role") == "user"), ""
+    )
+    function = body["tools"][0]["function"]
+    parameters = function.get("parameters", {})
+    arguments = {
+        name: user_text
+        for name in parameters.get("required", [])
+        if parameters.get("properties", {}).get(name, {}).get("type", "string") == "string"
+    }
+    return {
+        "id": f"call_{uuid.uuid4().hex[:12]}",
+        "type": "function",
+        "function": {"name": function["name"], "arguments": json.dumps(arguments)},
+    }
+
+
+def _usage(body: dict, completion_tokens: int) -> dict:
+    prompt_tokens = _prompt_tokens(body)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+async def _generation_delay(tokens: int):
+    if MOCK_TOKENS_PER_SECOND > 0:
+        await asyncio.sleep(tokens / MOCK_TOKENS_PER_SECOND)
+
+
+@app.post("/api/v1/chat/completions")
+@app.post("/v1/chat/completions")
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    await asyncio.sleep(MOCK_LATENCY_MS / 1000)
+
+    if random.random() < MOCK_ERROR_RATE:
+        stats["errors"] += 1
+        return JSONResponse({"error": {"message": "Injected error", "code": MOCK_ERROR_STATUS}},
+                            status_code=MOCK_ERROR_STATUS)
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:16]}"
+    model = body.get("model", "mock")
+    tool_call = _tool_call(body)
+    tokens = 20 if tool_call else _completion_tokens(body)
+    content = None if tool_call else _content(body, tokens)
+    if tool_call:
+        stats["tool_calls"] += 1
+
+    if body.get("stream"):
+        return StreamingResponse(_stream(completion_id, model, body, content, tool_call, tokens),
+                                 media_type="text/event-stream")
+
+    await _generation_delay(tokens)
+    message = {"role": "assistant", "content": content}
+    if tool_call:
+        message["tool_calls"] = [tool_call]
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}],
+        "usage": _usage(body, tokens),
+    }
+
+
+async def _stream(completion_id: str, model: str, body: dict, content, tool_call, tokens: int):
+    def chunk(delta: dict, finish_reason=None, usage=None) -> str:
+        payload = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        if usage is not None:
+            payload["usage"] = usage
+        return f"data: {json.dumps(payload)}\n\n"
+
+    yield chunk({"role": "assistant"})
+    if tool_call:
+        await _generation_delay(tokens)
+        yield chunk({"tool_calls": [{"index": 0, **tool_call}]})
+    else:
+        # Emit the completion word by word at the configured token rate
+        words = content.split(" ")
+        for position in range(0, len(words), 10):
+            await _generation_delay(min(10, len(words) - position))
+            yield chunk({"content": " ".join(words[position:position + 10]) + " "})
+    yield chunk({}, "tool_calls" if tool_call else "stop", _usage(body, tokens))
+    yield "data: [DONE]\n\n"
+
+
+@app.get("/api/v1/models")
+async def list_models():
+    return {"data": [{"id": "mock", "object": "model"}]}
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Mock OpenRouter chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=MOCK_LATENCY_MS)
+    parser.add_argument("--tokens-per-second", type=float, default=MOCK_TOKENS_PER_SECOND)
+    parser.add_argument("--completion-tokens", type=int, default=MOCK_COMPLETION_TOKENS)
+    parser.add_argument("--error-rate", type=float, default=MOCK_ERROR_RATE)
+    parser.add_argument("--error-status", type=int, default=MOCK_ERROR_STATUS)
+    args = parser.parse_args()
+
+    MOCK_LATENCY_MS = args.latency_ms
+    MOCK_TOKENS_PER_SECOND = args.tokens_per_second
+    MOCK_COMPLETION_TOKENS = args.completion_tokens
+    MOCK_ERROR_RATE = args.error_rate
+    MOCK_ERROR_STATUS = args.error_status
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
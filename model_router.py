@@ -0,0 +1,141 @@
+from collections import deque
+from typing import Dict, List, Optional
+import json
+import os
+import random
+import threading
+
+# Quality tiers a route can require; higher is stronger
+QUALITY_TIERS = {"basic": 1, "standard": 2, "high": 3}
+
+DEFAULT_MODEL = "google/gemini-2.5-flash"
+
+# "cache_control": the provider honours explicit prompt cache breakpoints (see prompt_cache.py)
+MODELS = {
+    "google/gemini-2.5-flash-lite": {"quality": "basic", "cache_control": True},
+    "google/gemini-2.5-flash": {"quality": "standard", "cache_control": True},
+    "google/gemini-2.5-pro": {"quality": "high", "cache_control": True},
+}
+
+# tool -> models in preference order (primary first, then fallbacks) and the
+# minimum quality adaptive routing may pick from
+ROUTES = {
+    "default": {"models": [DEFAULT_MODEL, "google/gemini-2.5-flash-lite"], "min_quality": "standard"},
+    "agent": {"models": [DEFAULT_MODEL], "min_quality": "standard"},
+    "parse_cv": {"models": ["google/gemini-2.5-flash-lite", DEFAULT_MODEL], "min_quality": "basic"},
+    "extract_keywords": {"models": ["google/gemini-2.5-flash-lite", DEFAULT_MODEL], "min_quality": "basic"},
+    "extract_keywords_rerank": {"models": ["google/gemini-2.5-flash-lite", DEFAULT_MODEL], "min_quality": "basic"},
+    "generate_cv_rewrite": {"models": [DEFAULT_MODEL, "google/gemini-2.5-pro"], "min_quality": "standard"},
+}
+
+# JSON file overriding/extending MODELS and ROUTES: {"models": {...}, "routes": {...}}
+MODEL_ROUTES_FILE = os.getenv("MODEL_ROUTES_FILE", "")
+# Adaptive routing sends each tool to its eligible model with the lowest observed p95
+MODEL_ROUTING_ADAPTIVE = os.getenv("MODEL_ROUTING_ADAPTIVE", "false").lower() in ("1", "true", "yes")
+ADAPTIVE_MIN_SAMPLES = int(os.getenv("ADAPTIVE_MIN_SAMPLES", "20"))
+ADAPTIVE_EXPLORE_RATE = float(os.getenv("ADAPTIVE_EXPLORE_RATE", "0.05"))
+ADAPTIVE_WINDOW = int(os.getenv("ADAPTIVE_WINDOW", "200"))
+
+
+class ModelRouter:
+    """
+    Chooses the model for each tool call from a routing table.
+
+    Static routing uses each route's model list in order: the first is the
+    primary, the rest are fallbacks tried when a call fails. With adaptive
+    routing the primary becomes the route's model with the lowest observed
+    p95 latency among those meeting the route's min_quality; models without
+    enough samples are tried occasionally so they get measured.
+    """
+
+    def __init__(self, models: dict = None, routes: dict = None, adaptive: bool = MODEL_ROUTING_ADAPTIVE):
+        self.models = {name: dict(spec) for name, spec in (models or MODELS).items()}
+        self.routes = {tool: dict(route) for tool, route in (routes or ROUTES).items()}
+        self.adaptive = adaptive
+        self._latencies: Dict[str, deque] = {}
+        self._calls: Dict[str, int] = {}
+        self._failures: Dict[str, int] = {}
+        self._fallbacks: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def load(self, path: str):
+        """Merge a routing config file into the built-in table"""
+        with open(path) as config_file:
+            config = json.load(config_file)
+        self.models.update(config.get("models", {}))
+        self.routes.update(config.get("routes", {}))
+
+    def route(self, tool: str) -> dict:
+        return self.routes.get(tool) or self.routes["default"]
+
+    def primary(self, tool: str) -> str:
+        """The configured primary model of a tool, independent of adaptive choices"""
+        return self.route(tool)["models"][0]
+
+    def supports_cache_control(self, model: Optional[str]) -> bool:
+        return bool(self.models.get(model, {}).get("cache_control"))
+
+    def _quality(self, model: str) -> int:
+        return QUALITY_TIERS.get(self.models.get(model, {}).get("quality", "standard"), 2)
+
+    def _p95(self, model: str) -> Optional[float]:
+        latencies = self._latencies.get(model)
+        if not latencies or len(latencies) < ADAPTIVE_MIN_SAMPLES:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def candidates(self, tool: str) -> List[str]:
+        """Models to try for a tool call, in order"""
+        route = self.route(tool)
+        models = list(route["models"])
+        if not (route.get("adaptive", self.adaptive) and len(models) > 1):
+            return models
+
+        required = QUALITY_TIERS.get(route.get("min_quality", "standard"), 2)
+        eligible = [model for model in models if self._quality(model) >= required] or models[:1]
+        with self._lock:
+            measured = [(self._p95(model), model) for model in eligible if self._p95(model) is not None]
+        unmeasured = [model for model in eligible if model not in {model for _, model in measured}]
+
+        if unmeasured and (not measured or random.random() < ADAPTIVE_EXPLORE_RATE):
+            first = random.choice(unmeasured)
+        elif measured:
+            first = min(measured)[1]
+        else:
+            first = eligible[0]
+        return [first] + [model for model in models if model != first]
+
+    def record(self, model: str, latency: Optional[float] = None, fallback: bool = False):
+        """Record a finished call: its latency on success, or a failure (optionally followed by a fallback)"""
+        with self._lock:
+            self._calls[model] = self._calls.get(model, 0) + 1
+            if latency is not None:
+                self._latencies.setdefault(model, deque(maxlen=ADAPTIVE_WINDOW)).append(latency)
+            else:
+                self._failures[model] = self._failures.get(model, 0) + 1
+            if fallback:
+                self._fallbacks[model] = self._fallbacks.get(model, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = {
+                model: {
+                    "quality": self.models.get(model, {}).get("quality", "standard"),
+                    "calls": self._calls.get(model, 0),
+                    "failures": self._failures.get(model, 0),
+                    "fallbacks": self._fallbacks.get(model, 0),
+                    "p95_seconds": round(self._p95(model), 3) if self._p95(model) is not None else None,
+                }
+                for model in sorted(set(self._calls) | {model for route in self.routes.values() for model in route["models"]})
+            }
+        return {
+            "adaptive": self.adaptive,
+            "routes": {tool: route["models"] for tool, route in self.routes.items()},
+            "models": models,
+        }
+
+
+model_router = ModelRouter()
+if MODEL_ROUTES_FILE:
+    model_router.load(MODEL_ROUTES_FILE)
@@ -0,0 +1,90 @@
+from collections import Counter
+from typing import List
+import math
+import os
+import re
+
+import numpy as np
+
+from keywords import STOPWORDS
+
+PREFILTER_TOP_K = int(os.getenv("PREFILTER_TOP_K", "20"))
+PREFILTER_MIN_SCORE = float(os.getenv("PREFILTER_MIN_SCORE", "0.0"))
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#./\-]*[a-z0-9+#]|[a-z0-9]")
+
+
+def _terms(text: str) -> Counter:
+    """Unigram and bigram counts, ignoring stopwords and bare numbers"""
+    words = [word for word in _TOKEN.findall(text.lower()) if word not in STOPWORDS and not word.isdigit()]
+    terms = Counter(words)
+    terms.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    return terms
+
+
+def similarity_scores(cv_texts: List[str], jd_text: str) -> np.ndarray:
+    """
+    TF-IDF cosine similarity of every CV against the job description.
+
+    IDF is computed over the JD plus the candidate set. Only terms that occur in
+    the JD contribute to the dot product, so the CV matrix is built over the JD
+    vocabulary alone; CV norms still use every term in the CV.
+
+    Args:
+        cv_texts: CV texts to score
+        jd_text: Job description text
+
+    Returns:
+        Array of scores in [0, 1], one per CV
+    """
+    if not cv_texts:
+        return np.zeros(0, dtype=np.float32)
+
+    documents = [_terms(text) for text in cv_texts]
+    jd_terms = _terms(jd_text)
+    if not jd_terms:
+        return np.zeros(len(cv_texts), dtype=np.float32)
+
+    document_frequency = Counter(jd_terms.keys())
+    for terms in documents:
+        document_frequency.update(terms.keys())
+    total = len(documents) + 1
+
+    def idf(term: str) -> float:
+        return math.log((1 + total) / (1 + document_frequency[term])) + 1.0
+
+    vocabulary = {term: column for column, term in enumerate(jd_terms)}
+    term_idf = np.array([idf(term) for term in vocabulary], dtype=np.float32)
+
+    jd_vector = np.array([1.0 + math.log(count) for count in jd_terms.values()], dtype=np.float32) * term_idf
+    jd_vector /= np.linalg.norm(jd_vector)
+
+    matrix = np.zeros((len(documents), len(vocabulary)), dtype=np.float32)
+    norms = np.zeros(len(documents), dtype=np.float32)
+    for row, terms in enumerate(documents):
+        weights = {term: (1.0 + math.log(count)) * idf(term) for term, count in terms.items()}
+        norms[row] = math.sqrt(sum(weight * weight for weight in weights.values()))
+        for term, weight in weights.items():
+            column = vocabulary.get(term)
+            if column is not None:
+                matrix[row, column] = weight
+
+    # One matrix-vector product scores the whole candidate set
+    scores = matrix @ jd_vector
+    return np.divide(scores, norms, out=np.zeros_like(scores), where=norms > 0)
+
+
+def shortlist(scores: np.ndarray, top_k: int = PREFILTER_TOP_K, min_score: float = PREFILTER_MIN_SCORE) -> List[int]:
+    """
+    Pick the CVs worth an LLM comparison.
+
+    Args:
+        scores: Prefilter scores from similarity_scores
+        top_k: Maximum number of CVs to keep
+        min_score: Minimum score a CV needs to be kept
+
+    Returns:
+        Indexes of the kept CVs, best first
+    """
+    order = np.argsort(-scores, kind="stable")[:max(top_k, 0)]
+    return [int(index) for index in order if scores[index] >= min_score]
@@ -0,0 +1,90 @@
+import json
+import os
+
+import httpx
+
+from compaction import count_tokens
+from model_router import model_router
+
+# Add cache_control breakpoints for models flagged with "cache_control" in the routing table
+PROMPT_CACHE_CONTROL = os.getenv("PROMPT_CACHE_CONTROL", "true").lower() in ("1", "true", "yes")
+# Providers do not cache prefixes shorter than this; marking them would only add a cache write
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+
+
+def message_text(content) -> str:
+    """Text of a chat message content, either a string or a list of content parts"""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content or "")
+
+
+def add_cache_control(body: dict) -> bool:
+    """
+    Mark the end of the static prompt prefix with an ephemeral cache_control breakpoint.
+
+    Args:
+        body: Chat completion request body, changed in place
+
+    Returns:
+        True if a breakpoint was added
+    """
+    if not model_router.supports_cache_control(body.get("model")):
+        return False
+    messages = body.get("messages") or []
+    if not messages or messages[0].get("role") != "system":
+        return False
+
+    system = messages[0]
+    text = message_text(system.get("content"))
+    prefix_tokens = count_tokens(text) + (count_tokens(json.dumps(body["tools"])) if body.get("tools") else 0)
+    if prefix_tokens < PROMPT_CACHE_MIN_TOKENS:
+        return False
+    system["content"] = [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+    return True
+
+
+def cached_tokens(usage) -> int:
+    """Prompt tokens the provider served from its cache, from a completion's usage"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None) or 0
+
+
+def _with_cache_control(request: httpx.Request) -> httpx.Request:
+    if not PROMPT_CACHE_CONTROL or request.method != "POST" or not request.url.path.endswith("/chat/completions"):
+        return request
+    try:
+        body = json.loads(request.content)
+    except ValueError:
+        return request
+    if not add_cache_control(body):
+        return request
+    headers = [(name, value) for name, value in request.headers.raw if name.lower() != b"content-length"]
+    return httpx.Request(request.method, request.url, headers=headers, content=json.dumps(body).encode(),
+                         extensions=request.extensions)
+
+
+class PromptCacheTransport(httpx.BaseTransport):
+    """Adds cache_control breakpoints to outgoing chat completions"""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self._transport.handle_request(_with_cache_control(request))
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncPromptCacheTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of PromptCacheTransport"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(_with_cache_control(request))
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -0,0 +1,169 @@
+from typing import Dict, Optional, Tuple
+import asyncio
+import json
+import os
+import threading
+import time
+
+# Default per-model limits; 0 disables that limit
+LLM_RPM = float(os.getenv("LLM_RPM", "0"))
+LLM_TPM = float(os.getenv("LLM_TPM", "0"))
+# Per-model overrides: "model=rpm:tpm,model=rpm:tpm"
+LLM_RATE_LIMITS = os.getenv("LLM_RATE_LIMITS", "")
+
+# Rough prompt size estimate used before the real usage is known
+CHARS_PER_TOKEN = 4
+DEFAULT_COMPLETION_TOKENS = 1000
+
+
+def _parse_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, values = entry.rpartition("=")
+        rpm, _, tpm = values.partition(":")
+        limits[model.strip()] = (float(rpm or 0), float(tpm or 0))
+    return limits
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate_per_minute with a one-minute burst.
+
+    Callers reserve capacity up front, letting the level go negative, and then
+    sleep until their reservation is covered. Reservations are taken in call
+    order, so waiting callers form a FIFO queue instead of racing each other.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = rate_per_minute
+        self.rate = rate_per_minute / 60.0
+        self.level = rate_per_minute
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take amount from the bucket and return how long to wait before using it"""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # A single request larger than the burst would otherwise never fit
+        self.level -= min(amount, self.capacity)
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+
+class ModelLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one model"""
+
+    def __init__(self, model: str, rpm: float, tpm: float):
+        self.model = model
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.waiting = 0
+        self.acquired = 0
+        self.delayed = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def reserve(self, tokens: int) -> float:
+        now = time.monotonic()
+        delay = 0.0
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1, now))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.reserve(tokens, now))
+        self.acquired += 1
+        if delay > 0:
+            self.delayed += 1
+            self.wait_seconds += delay
+            self.max_wait_seconds = max(self.max_wait_seconds, delay)
+        return delay
+
+    def stats(self) -> dict:
+        return {
+            "rpm": self.requests.capacity if self.requests is not None else None,
+            "tpm": self.tokens.capacity if self.tokens is not None else None,
+            "queue_depth": self.waiting,
+            "requests": self.acquired,
+            "delayed_requests": self.delayed,
+            "avg_wait_seconds": round(self.wait_seconds / self.acquired, 4) if self.acquired else 0.0,
+            "max_wait_seconds": round(self.max_wait_seconds, 4),
+        }
+
+
+class RateLimiter:
+    """
+    Shared outbound limiter for LLM calls, keyed by model.
+
+    Works from both threads (acquire) and coroutines (aacquire); both draw
+    from the same buckets. Models without configured limits pass straight
+    through.
+    """
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM, overrides: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.default = (rpm, tpm)
+        self.overrides = _parse_limits(LLM_RATE_LIMITS) if overrides is None else overrides
+        self._models: Dict[str, ModelLimiter] = {}
+        self._lock = threading.Lock()
+
+    def _limiter(self, model: str) -> Optional[ModelLimiter]:
+        limiter = self._models.get(model)
+        if limiter is None:
+            rpm, tpm = self.overrides.get(model, self.default)
+            if rpm <= 0 and tpm <= 0:
+                return None
+            limiter = self._models.setdefault(model, ModelLimiter(model, rpm, tpm))
+        return limiter
+
+    def _reserve(self, model: str, tokens: int) -> Tuple[Optional[ModelLimiter], float]:
+        with self._lock:
+            limiter = self._limiter(model)
+            if limiter is None:
+                return None, 0.0
+            delay = limiter.reserve(tokens)
+            if delay > 0:
+                limiter.waiting += 1
+            return limiter, delay
+
+    def _release(self, limiter: ModelLimiter):
+        with self._lock:
+            limiter.waiting -= 1
+
+    def acquire(self, model: str, tokens: int):
+        """Block the calling thread until a request of this size may be sent"""
+        limiter, delay = self._reserve(model, tokens)
+        if delay > 0:
+            try:
+                time.sleep(delay)
+            finally:
+                self._release(limiter)
+
+    async def aacquire(self, model: str, tokens: int):
+        """Wait (without blocking the event loop) until a request of this size may be sent"""
+        limiter, delay = self._reserve(model, tokens)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self._release(limiter)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {model: limiter.stats() for model, limiter in self._models.items()}
+
+
+def estimate_request(body: bytes) -> Tuple[Optional[str], int]:
+    """
+    Model and estimated total tokens (prompt + completion budget) of a chat
+    completion request body; (None, 0) if the body is not one.
+    """
+    try:
+        payload = json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        return None, 0
+    if not isinstance(payload, dict) or "model" not in payload:
+        return None, 0
+
+    prompt_chars = sum(len(json.dumps(message.get("content", ""))) for message in payload.get("messages", []))
+    completion = payload.get("max_tokens") or payload.get("max_completion_tokens") or DEFAULT_COMPLETION_TOKENS
+    return payload["model"], prompt_chars // CHARS_PER_TOKEN + int(completion)
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,115 @@
+from typing import Any, AsyncIterator, Optional, Tuple
+import asyncio
+import json
+import os
+import re
+import time
+
+from compaction import truncate_tokens
+import tools
+
+# Token budget for the ATS/issues findings handed to the improvement plan step
+REPORT_FINDINGS_TOKENS = int(os.getenv("REPORT_FINDINGS_TOKENS", "1500"))
+
+# Report sections in response order
+REPORT_SECTIONS = ("parsed_cv", "ats_evaluation", "issues", "keywords", "comparison", "improvement_plan")
+
+
+def parse_json(text: Optional[str]) -> Any:
+    """Decode a JSON completion (tolerating markdown code fences); non-JSON text is returned as is"""
+    if text is None:
+        return None
+    stripped = text.strip()
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", stripped, re.S)
+    try:
+        return json.loads(fenced.group(1) if fenced else stripped)
+    except ValueError:
+        return text
+
+
+async def _step(name: str, call) -> Tuple[str, Optional[str], Optional[str], float]:
+    started = time.perf_counter()
+    try:
+        value, error = await call, None
+    except Exception as e:
+        value, error = None, str(e)
+    return name, value, error, round((time.perf_counter() - started) * 1000, 1)
+
+
+async def _parsed_cv_input(cv_content: str) -> tools.CVInput:
+    # Joins the report's own parse_cv call (coalesced, then cached); raw text if parsing fails
+    try:
+        return await tools.aparse_cv_document(cv_content)
+    except Exception:
+        return cv_content
+
+
+async def _compare(cv_content: str, jd_content: str) -> str:
+    return await tools.acompare_cv_with_job(await _parsed_cv_input(cv_content), jd_content)
+
+
+async def report_steps(cv_content: str, jd_content: Optional[str] = None, top_n: int = 25,
+                       keyword_mode: Optional[str] = None) -> AsyncIterator[Tuple[str, Any, Optional[str], float]]:
+    """
+    Run the full-report tools, yielding each section as it finishes.
+
+    Parsing, ATS scoring, issue analysis, keyword extraction and (with a job
+    description) the job comparison run concurrently. ATS scoring and issue
+    analysis judge formatting, so they get the original text. The comparison
+    waits for the parse and gets the compact parsed CV. The improvement plan
+    runs last: it is built on the ATS and issue findings and on the parsed CV.
+
+    Yields:
+        (section, parsed value, error message, elapsed milliseconds)
+    """
+    calls = {
+        "parsed_cv": tools.aparse_cv(cv_content),
+        "ats_evaluation": tools.aevaluate_ats_score(cv_content, jd_content),
+        "issues": tools.aanalyze_cv_issues(cv_content),
+        "keywords": tools.aextract_keywords(cv_content, top_n, keyword_mode),
+    }
+    if jd_content:
+        calls["comparison"] = _compare(cv_content, jd_content)
+
+    tasks = [asyncio.ensure_future(_step(name, call)) for name, call in calls.items()]
+    results = {}
+    try:
+        for finished in asyncio.as_completed(tasks):
+            name, value, error, elapsed = await finished
+            results[name] = value
+            yield name, parse_json(value), error, elapsed
+    finally:
+        # The consumer went away (e.g. a closed stream): do not leave calls running
+        for task in tasks:
+            task.cancel()
+
+    findings = "\n\n".join(f"{name}:\n{results[name]}" for name in ("ats_evaluation", "issues") if results.get(name))
+    name, value, error, elapsed = await _step("improvement_plan", tools.agenerate_improvement_plan(
+        tools.compact_cv_input(cv_content), jd_content,
+        truncate_tokens(findings, REPORT_FINDINGS_TOKENS) if findings else None
+    ))
+    yield name, parse_json(value), error, elapsed
+
+
+async def build_report(cv_content: str, jd_content: Optional[str] = None, top_n: int = 25,
+                       keyword_mode: Optional[str] = None) -> dict:
+    """
+    Build the structured full report.
+
+    Returns:
+        Sections keyed by name, "timings_ms" per step plus the total, and
+        "errors" for steps that failed (their section is null)
+    """
+    started = time.perf_counter()
+    sections, errors, timings = {}, {}, {}
+    async for name, value, error, elapsed in report_steps(cv_content, jd_content, top_n, keyword_mode):
+        sections[name] = value
+        timings[name] = elapsed
+        if error:
+            errors[name] = error
+
+    report = {name: sections[name] for name in REPORT_SECTIONS if name in sections}
+    report["timings_ms"] = {**timings, "total": round((time.perf_counter() - started) * 1000, 1)}
+    if errors:
+        report["errors"] = errors
+    return report
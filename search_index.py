@@ -0,0 +1,203 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import asyncio
+import importlib.util
+import os
+import threading
+
+import chromadb
+
+from compaction import split_sections
+from cv_document import CVDocument
+
+# Opt-in: the index stores CV text (personal data) on disk under SEARCH_INDEX_PATH
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "false").lower() in ("1", "true", "yes")
+# Local sentence-transformers model directory used for embeddings; required when the
+# index is enabled, so nothing is downloaded at runtime
+SEARCH_EMBEDDING_MODEL = os.getenv("SEARCH_EMBEDDING_MODEL", "")
+SEARCH_EMBEDDING_DEVICE = os.getenv("SEARCH_EMBEDDING_DEVICE", "cpu")
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "./search_index")
+SEARCH_COLLECTION = os.getenv("SEARCH_COLLECTION", "cvs")
+SEARCH_CHUNK_CHARS = int(os.getenv("SEARCH_CHUNK_CHARS", "1500"))
+
+
+def local_embedding_function(model_path: str = SEARCH_EMBEDDING_MODEL, device: str = SEARCH_EMBEDDING_DEVICE):
+    """
+    Embedding function backed by a sentence-transformers model on local disk.
+
+    Raises:
+        RuntimeError: If no model directory is configured, it does not exist,
+            or sentence-transformers is not installed
+    """
+    if not model_path:
+        raise RuntimeError(
+            "SEARCH_INDEX_ENABLED requires SEARCH_EMBEDDING_MODEL: the path of a local sentence-transformers model"
+        )
+    if not os.path.isdir(model_path):
+        raise RuntimeError(f"SEARCH_EMBEDDING_MODEL directory not found: {model_path}")
+    if importlib.util.find_spec("sentence_transformers") is None:
+        raise RuntimeError("The search index needs the sentence-transformers package: pip install sentence-transformers")
+
+    from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+    return SentenceTransformerEmbeddingFunction(model_name=model_path, device=device)
+
+
+class SearchIndex:
+    """
+    Persistent semantic index of CV sections backed by chromadb.
+
+    Each CV is split into section chunks stored under ids derived from its
+    content hash, so re-indexing an unchanged CV is a no-op. Chunks of
+    unparsed CVs come from heading detection on the raw text; once a parsed
+    CVDocument is available the CV is upgraded to its structured sections.
+    Queries use chromadb's HNSW index (cosine distance), so latency grows
+    logarithmically with the number of indexed chunks.
+    """
+
+    def __init__(self, path: str = SEARCH_INDEX_PATH, collection: str = SEARCH_COLLECTION, embedding_function=None):
+        self.path = path
+        self.collection_name = collection
+        # Never fall back to chromadb's default embedder, which downloads a model on first use
+        self.embedding_function = embedding_function or local_embedding_function()
+        self._collection = None
+        self._lock = threading.Lock()
+        # A single writer thread keeps embedding work off the event loop and upserts ordered
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-index")
+        self._pending = set()
+
+    @property
+    def collection(self):
+        with self._lock:
+            if self._collection is None:
+                client = chromadb.PersistentClient(path=self.path)
+                self._collection = client.get_or_create_collection(
+                    self.collection_name, metadata={"hnsw:space": "cosine"}, embedding_function=self.embedding_function
+                )
+            return self._collection
+
+    def index(self, cv_hash: str, cv_content: str, filename: Optional[str] = None,
+              document: Optional[CVDocument] = None) -> bool:
+        """
+        Upsert a CV's section chunks unless they are already indexed.
+
+        Returns:
+            True if chunks were written, False if the CV was already up to date
+        """
+        existing = self.collection.get(where={"cv_hash": cv_hash}, include=["metadatas"])
+        if existing["ids"]:
+            structured = any(metadata.get("structured") for metadata in existing["metadatas"])
+            if structured or document is None:
+                return False
+            # Replace heading-based chunks with the parsed sections
+            self.collection.delete(ids=existing["ids"])
+
+        chunks = document.sections() if document is not None else chunk_text(cv_content)
+        if not chunks:
+            return False
+
+        self.collection.upsert(
+            ids=[f"{cv_hash}:{position}" for position in range(len(chunks))],
+            documents=[text for _, text in chunks],
+            metadatas=[
+                {
+                    "cv_hash": cv_hash,
+                    "filename": filename or "",
+                    "section": section,
+                    "structured": document is not None,
+                }
+                for section, _ in chunks
+            ]
+        )
+        return True
+
+    def schedule(self, cv_hash: str, cv_content: str, filename: Optional[str] = None,
+                 document: Optional[CVDocument] = None):
+        """Index a CV on the writer thread without waiting for it"""
+        future = self._writer.submit(self._index_quietly, cv_hash, cv_content, filename, document)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+
+    def _index_quietly(self, *args):
+        try:
+            self.index(*args)
+        except Exception as e:
+            print(f"⚠️ Search indexing failed: {str(e)}")
+
+    def search(self, query: str, top_k: int = 10, section: Optional[str] = None) -> List[dict]:
+        """
+        Find the CVs whose sections best match a free-text query.
+
+        Args:
+            query: Natural language query, e.g. "Kubernetes SRE with fintech background"
+            top_k: Number of CVs to return
+            section: Only match chunks of this section (experience, skills, ...)
+
+        Returns:
+            CVs best first, each with its best score and matching chunks
+        """
+        collection = self.collection
+        total = collection.count()
+        if total == 0 or top_k <= 0:
+            return []
+
+        # Several chunks of one CV can match, so over-fetch before grouping by CV
+        results = collection.query(
+            query_texts=[query],
+            n_results=min(top_k * 4, total),
+            where={"section": section} if section else None,
+            include=["documents", "metadatas", "distances"]
+        )
+
+        matches = {}
+        for text, metadata, distance in zip(results["documents"][0], results["metadatas"][0], results["distances"][0]):
+            score = round(1.0 - distance, 4)
+            entry = matches.setdefault(metadata["cv_hash"], {
+                "cv_hash": metadata["cv_hash"],
+                "filename": metadata.get("filename") or None,
+                "score": score,
+                "matches": [],
+            })
+            entry["score"] = max(entry["score"], score)
+            entry["matches"].append({"section": metadata["section"], "score": score, "text": text})
+
+        ranked = sorted(matches.values(), key=lambda entry: -entry["score"])[:top_k]
+        for entry in ranked:
+            entry["matches"] = entry["matches"][:3]
+        return ranked
+
+    async def asearch(self, query: str, top_k: int = 10, section: Optional[str] = None) -> List[dict]:
+        """Async variant of search; runs in a worker thread"""
+        return await asyncio.to_thread(self.search, query, top_k, section)
+
+    def remove(self, cv_hash: str) -> int:
+        """Delete every chunk of a CV; returns the number of chunks removed"""
+        ids = self.collection.get(where={"cv_hash": cv_hash}, include=[])["ids"]
+        if ids:
+            self.collection.delete(ids=ids)
+        return len(ids)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": SEARCH_INDEX_ENABLED,
+            "chunks": self.collection.count() if self._collection is not None else None,
+            "pending": len(self._pending),
+        }
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+
+
+def chunk_text(text: str, max_chars: int = SEARCH_CHUNK_CHARS) -> List[Tuple[str, str]]:
+    """Split raw CV text into (section, text) chunks at recognised headings"""
+    chunks = []
+    for name, body in split_sections(text):
+        # Long sections are cut at line boundaries so each chunk stays focused
+        current = ""
+        for line in body.splitlines():
+            if current and len(current) + len(line) > max_chars:
+                chunks.append((name, current))
+                current = ""
+            current = f"{current}\n{line}".strip()
+        if current:
+            chunks.append((name, current))
+    return chunks
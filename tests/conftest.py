@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# Tests never call a real provider, write traces or touch the working directory's job database
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("TRACE_EXPORTER", "none")
+os.environ.setdefault("SEARCH_INDEX_ENABLED", "false")
+os.environ.setdefault("JOBS_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="resume-agent-tests-"), "jobs.db"))
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+import agent_pool
+from agent_pool import AgentPool
+
+
+@pytest.fixture(autouse=True)
+def fake_agents(monkeypatch):
+    async def create_agent(session_id=None, with_history=True):
+        return object()
+
+    monkeypatch.setattr(agent_pool, "create_agent", create_agent)
+
+
+def test_runs_on_one_session_are_serialized():
+    async def scenario():
+        pool = AgentPool()
+        first = await pool.acquire("s1")
+        second = asyncio.ensure_future(pool.acquire("s1"))
+        await asyncio.sleep(0.01)
+        assert not second.done()
+        pool.release(first)
+        assert (await second).agent is first.agent
+        pool.release(await second)
+
+    asyncio.run(scenario())
+
+
+def test_busy_session_is_not_evicted_until_released():
+    async def scenario():
+        pool = AgentPool(max_sessions=1)
+        busy = await pool.acquire("busy")
+        other = await pool.acquire("other")
+        # Over the limit, but both sessions have a run in progress
+        assert len(pool) == 2
+        pool.release(busy)
+        # Once released, the least recently used idle session goes
+        assert len(pool) == 1
+        pool.release(other)
+        again = await pool.acquire("other")
+        assert again is other
+        pool.release(again)
+
+    asyncio.run(scenario())
+
+
+def test_busy_session_outlives_its_idle_ttl():
+    async def scenario():
+        pool = AgentPool(idle_ttl=0.01)
+        busy = await pool.acquire("busy")
+        await asyncio.sleep(0.05)
+        pool.release(await pool.acquire("other"))
+        again = asyncio.ensure_future(pool.acquire("busy"))
+        await asyncio.sleep(0.01)
+        pool.release(busy)
+        # The waiting run gets the same agent and history, not a fresh one
+        assert (await again) is busy
+        pool.release(busy)
+
+    asyncio.run(scenario())
+
+
+def test_expired_idle_session_starts_over():
+    async def scenario():
+        pool = AgentPool(idle_ttl=0.01)
+        first = await pool.acquire("s1")
+        pool.release(first)
+        await asyncio.sleep(0.05)
+        second = await pool.acquire("s1")
+        assert second is not first
+        pool.release(second)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_pin_the_session():
+    async def scenario():
+        pool = AgentPool(max_sessions=1)
+        holder = await pool.acquire("s1")
+        waiter = asyncio.ensure_future(pool.acquire("s1"))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        pool.release(holder)
+        assert holder.users == 0
+        pool.release(await pool.acquire("s2"))
+        assert len(pool) == 1
+
+    asyncio.run(scenario())
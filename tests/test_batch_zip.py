@@ -0,0 +1,74 @@
+import io
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from batch import ArchiveMemberTooLarge, TooManyArchiveMembers, items_from_zip
+import api
+import uploads
+
+MB = 1024 * 1024
+
+
+def _zip(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_members_are_expanded_skipping_metadata():
+    archive = _zip({"a.txt": b"Jane Doe", "__MACOSX/a.txt": b"x", "docs/.DS_Store": b"x", "docs/b.txt": b"John Roe"})
+    items = items_from_zip(archive, MB)
+    assert [(item.source, item.data) for item in items] == [("a.txt", b"Jane Doe"), ("docs/b.txt", b"John Roe")]
+
+
+def test_bomb_member_is_refused():
+    # 64 MB of zeros compresses to well under 1 MB
+    archive = _zip({"bomb.txt": bytes(64 * MB)})
+    assert len(archive) < MB
+    with pytest.raises(ArchiveMemberTooLarge):
+        items_from_zip(archive, 10 * MB)
+
+
+def test_member_lying_about_its_size_is_refused_while_reading():
+    archive = bytearray(_zip({"cv.txt": bytes(2 * MB)}))
+    # Rewrite the declared uncompressed size (local header and central directory) to 1 KB
+    for signature, offset in ((b"PK\x03\x04", 22), (b"PK\x01\x02", 24)):
+        start = archive.index(signature) + offset
+        archive[start:start + 4] = (1024).to_bytes(4, "little")
+    with pytest.raises((ArchiveMemberTooLarge, zipfile.BadZipFile)):
+        items_from_zip(bytes(archive), MB)
+
+
+def test_too_many_members_are_refused_before_reading():
+    archive = _zip({f"cv{index}.txt": b"CV" for index in range(5)})
+    reserved = []
+    with pytest.raises(TooManyArchiveMembers):
+        items_from_zip(archive, MB, max_items=4, reserve=reserved.append)
+    assert reserved == []
+
+
+def test_decompressed_total_is_charged_and_can_stop_the_expansion():
+    archive = _zip({f"cv{index}.txt": bytes(600 * 1024) for index in range(4)})
+    charged = []
+
+    def reserve(size):
+        if sum(charged) + size > MB:
+            raise ValueError("over budget")
+        charged.append(size)
+
+    with pytest.raises(ValueError, match="over budget"):
+        items_from_zip(archive, MB, reserve=reserve)
+    assert sum(charged) <= MB
+
+
+def test_batch_zip_over_the_request_limit_is_413(monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_MAX_REQUEST_BYTES", 2 * MB)
+    archive = _zip({f"cv{index}.txt": bytes(900 * 1024) for index in range(4)})
+    with TestClient(api.app) as client:
+        response = client.post("/batch/ats-score", files={"cv_zip": ("cvs.zip", archive)})
+    assert response.status_code == 413
+    assert uploads.upload_budget.in_use == 0
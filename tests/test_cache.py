@@ -0,0 +1,101 @@
+import asyncio
+
+from cache import ResponseCache, SingleFlight, _SQLiteTier
+
+
+def test_sqlite_tier_evicts_in_batches_and_stays_bounded(tmp_path):
+    tier = _SQLiteTier(str(tmp_path / "cache.db"), max_entries=100, ttl=None, evict_every=50)
+    for index in range(49):
+        tier.set(f"key{index}", "value")
+    assert tier._writes_since_eviction == 49
+
+    for index in range(49, 500):
+        tier.set(f"key{index}", "value")
+        assert tier.count() <= 100
+    # Oldest entries go first
+    assert tier.get("key0") is None and tier.get("key499") == "value"
+
+
+def test_async_access_reads_and_writes_the_disk_tier(tmp_path):
+    path = str(tmp_path / "cache.db")
+
+    async def scenario():
+        writer = ResponseCache(sqlite_path=path, enabled=True)
+        await writer.aset("key", "completion")
+        # A fresh process only has the disk tier
+        reader = ResponseCache(sqlite_path=path, enabled=True)
+        return await reader.aget("key"), reader.disk_hits
+
+    assert asyncio.run(scenario()) == ("completion", 1)
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight(enabled=True)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.ado("key", call) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert sorted(results) == [("result", False)] + [("result", True)] * 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_single_flight_shares_the_leader_error():
+    flight = SingleFlight(enabled=True)
+
+    async def call():
+        await asyncio.sleep(0.05)
+        raise ValueError("upstream failed")
+
+    async def scenario():
+        return await asyncio.gather(*(flight.ado("key", call) for _ in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert flight.stats()["upstream_calls"] == 1
+
+
+def test_single_flight_waiter_reruns_when_the_leader_is_cancelled():
+    flight = SingleFlight(enabled=True)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return len(calls)
+
+    async def scenario():
+        leader = asyncio.create_task(flight.ado("key", call))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(flight.ado("key", call))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await waiter
+
+    assert asyncio.run(scenario()) == (2, False)
+    assert len(calls) == 2
+    stats = flight.stats()
+    assert stats["coalesced_calls"] == 0 and stats["in_flight"] == 0
+
+
+def test_single_flight_sync_caller_joins_an_async_call():
+    flight = SingleFlight(enabled=True)
+
+    async def call():
+        await asyncio.sleep(0.1)
+        return "shared"
+
+    async def scenario():
+        leader = asyncio.create_task(flight.ado("key", call))
+        await asyncio.sleep(0.01)
+        joined = await asyncio.to_thread(flight.do, "key", lambda: "own call")
+        return await leader, joined
+
+    assert asyncio.run(scenario()) == (("shared", False), ("shared", True))
@@ -0,0 +1,38 @@
+from compaction import compact_text
+from extraction import PAGE_BREAK
+
+
+def test_repeated_job_titles_are_kept():
+    cv = "\n".join([
+        "Experience",
+        "Software Engineer",
+        "Acme Corp, 2020 - Present",
+        "Python",
+        "Software Engineer",
+        "Globex, 2017 - 2020",
+        "Python",
+        "Software Engineer",
+        "Initech, 2014 - 2017",
+        "Python",
+    ])
+    compacted = compact_text(cv)
+    assert compacted.count("Software Engineer") == 3
+    assert compacted.count("Python") == 3
+
+
+def test_bare_numbers_inside_a_page_are_kept():
+    cv = "Summary\nYears of experience:\n12\nTeams led:\n3\nSkills\nGo"
+    assert "\n12\n" in compact_text(cv)
+    assert "\n3\n" in compact_text(cv)
+
+
+def test_running_headers_and_page_numbers_at_page_edges_are_removed():
+    pages = [
+        "Jane Doe - Curriculum Vitae\nExperience\nSoftware Engineer\nAcme Corp\n1",
+        "Jane Doe - Curriculum Vitae\nSoftware Engineer\nGlobex\n2",
+        "Jane Doe - Curriculum Vitae\nEducation\nBSc Computer Science\n3",
+    ]
+    compacted = compact_text(f"\n{PAGE_BREAK}\n".join(pages))
+    assert compacted.count("Jane Doe - Curriculum Vitae") == 1
+    assert compacted.count("Software Engineer") == 2
+    assert not any(line in ("1", "2", "3") for line in compacted.splitlines())
@@ -0,0 +1,80 @@
+import asyncio
+
+from compaction import compact_text
+from cv_document import CVDocument, Experience
+import report
+import tools
+
+RAW_CV = "\n".join([
+    "JANE DOE",
+    "jane@example.com | +1 555 0100",
+    "",
+    "PROFESSIONAL SUMMARY",
+    "Backend engineer who builds reliable Python services.",
+    "",
+    "EXPERIENCE",
+    "Senior Engineer - Acme Corp (2019 - Present)",
+    "  * Built the billing APIs used by 2M customers",
+])
+
+
+def _document() -> CVDocument:
+    return CVDocument(
+        summary="Backend engineer",
+        experience=[Experience(company="Acme Corp", role="Senior Engineer", responsibilities=["Built billing APIs"])],
+    )
+
+
+def test_comparison_prompt_uses_the_compact_parsed_cv():
+    document = _document()
+    compact = compact_text(document.to_prompt())
+    request = tools._compare_cv_with_job_request(document, "Python developer")
+    assert request["prompt"].startswith(f"CV:\n{compact}\n")
+    assert request["inputs"]["cv_content"] == compact
+
+
+def test_compact_cv_input_only_uses_a_cached_parse():
+    document = _document()
+    tools._cv_documents.set(tools.cv_content_hash(RAW_CV), document)
+    try:
+        assert tools.compact_cv_input(RAW_CV) is document
+        assert tools.compact_cv_input("Unparsed CV") == "Unparsed CV"
+    finally:
+        tools._cv_documents.clear()
+
+
+def test_report_compares_and_plans_on_the_parsed_cv(monkeypatch):
+    document = _document()
+    received = {}
+
+    async def parse_document(cv_content):
+        tools._cv_documents.set(tools.cv_content_hash(cv_content), document)
+        return document
+
+    async def parse(cv_content):
+        return (await parse_document(cv_content)).model_dump_json()
+
+    def recorder(name):
+        async def call(cv_content, *args):
+            received[name] = cv_content
+            return "{}"
+        return call
+
+    monkeypatch.setattr(tools, "aparse_cv_document", parse_document)
+    monkeypatch.setattr(tools, "aparse_cv", parse)
+    monkeypatch.setattr(tools, "aextract_keywords", recorder("keywords"))
+    monkeypatch.setattr(tools, "aevaluate_ats_score", recorder("ats_evaluation"))
+    monkeypatch.setattr(tools, "aanalyze_cv_issues", recorder("issues"))
+    monkeypatch.setattr(tools, "acompare_cv_with_job", recorder("comparison"))
+    monkeypatch.setattr(tools, "agenerate_improvement_plan", recorder("improvement_plan"))
+    try:
+        result = asyncio.run(report.build_report(RAW_CV, "Python developer"))
+    finally:
+        tools._cv_documents.clear()
+
+    assert "errors" not in result
+    assert received["comparison"] is document
+    assert received["improvement_plan"] is document
+    # Formatting-sensitive tools keep the original text
+    assert received["ats_evaluation"] == RAW_CV
+    assert received["issues"] == RAW_CV
@@ -0,0 +1,9 @@
+import pytest
+
+from extraction import SUPPORTED_EXTENSIONS, ExtractionError, extract_text
+
+
+def test_legacy_doc_is_rejected_instead_of_scraped():
+    assert ".doc" not in SUPPORTED_EXTENSIONS
+    with pytest.raises(ExtractionError, match="Unsupported file type"):
+        extract_text(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"Times New Roman" * 10, ".doc")
@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+from jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue
+
+
+def test_jobs_run_to_success_or_failure(tmp_path):
+    async def handler(kind, payload):
+        if kind == "fail":
+            raise ValueError("broken CV")
+        return {"echo": payload["value"]}
+
+    async def scenario():
+        queue = JobQueue(handler, db_path=str(tmp_path / "jobs.db"))
+        await queue.start()
+        try:
+            ok = await queue.submit("echo", {"value": 1})
+            bad = await queue.submit("fail", {})
+            return await queue.wait(ok["job_id"], 5), await queue.wait(bad["job_id"], 5)
+        finally:
+            await queue.stop()
+
+    ok, bad = asyncio.run(scenario())
+    assert ok["status"] == SUCCEEDED and ok["result"] == {"echo": 1}
+    assert bad["status"] == FAILED and bad["error"] == "broken CV"
+
+
+def test_a_job_is_claimed_by_one_worker_only(tmp_path):
+    runs = []
+
+    async def handler(kind, payload):
+        runs.append(kind)
+        await asyncio.sleep(0.05)
+        return {}
+
+    async def scenario():
+        db_path = str(tmp_path / "jobs.db")
+        first, second = JobQueue(handler, db_path=db_path), JobQueue(handler, db_path=db_path)
+        await first.start()
+        await second.start()
+        try:
+            job = await first.submit("report", {})
+            # Both processes learn about the same job; only one claim succeeds
+            second._pending.put_nowait(job["job_id"])
+            return await second.wait(job["job_id"], 5)
+        finally:
+            await first.stop()
+            await second.stop()
+
+    job = asyncio.run(scenario())
+    assert job["status"] == SUCCEEDED
+    assert runs == ["report"]
+
+
+def test_start_requeues_only_expired_leases(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+
+    async def handler(kind, payload):
+        return {}
+
+    async def scenario():
+        seed = JobQueue(handler, db_path=db_path)
+        now = time.time()
+        for job_id, heartbeat in (("stale", now - 120), ("live", now)):
+            await seed._aexecute(
+                "INSERT INTO jobs (id, kind, status, payload, created_at, worker, heartbeat_at) "
+                "VALUES (?, 'report', ?, '{}', ?, 'other', ?)",
+                (job_id, RUNNING, now, heartbeat)
+            )
+        seed._conn.close()
+
+        queue = JobQueue(handler, db_path=db_path, workers=0, lease=60)
+        await queue.start()
+        try:
+            return (await queue.get("stale"))["status"], (await queue.get("live"))["status"]
+        finally:
+            await queue.stop()
+
+    assert asyncio.run(scenario()) == (QUEUED, RUNNING)
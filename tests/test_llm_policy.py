@@ -0,0 +1,137 @@
+import asyncio
+import itertools
+import threading
+import time
+
+import httpx
+import openai
+import pytest
+
+import llm_policy
+import tools
+
+_tool_names = itertools.count()
+
+
+def _tool() -> str:
+    # Statistics are kept per tool name; give every test its own
+    return f"test_tool_{next(_tool_names)}"
+
+
+def _response(status: int) -> httpx.Response:
+    return httpx.Response(status, request=httpx.Request("POST", "https://llm.test/chat/completions"))
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm_policy, "LLM_BACKOFF_BASE", 0.0)
+
+
+def test_retryable_errors_are_retried():
+    tool = _tool()
+    attempts = []
+
+    def call(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise openai.RateLimitError("slow down", response=_response(429), body=None)
+        return "ok"
+
+    assert llm_policy.call_with_policy(tool, call) == "ok"
+    assert len(attempts) == 3
+    assert llm_policy.stats()[tool]["retries"] == 2
+
+
+def test_other_client_errors_are_not_retried():
+    tool = _tool()
+    attempts = []
+
+    def call(timeout):
+        attempts.append(timeout)
+        raise openai.BadRequestError("bad request", response=_response(400), body=None)
+
+    with pytest.raises(openai.BadRequestError):
+        llm_policy.call_with_policy(tool, call)
+    assert len(attempts) == 1
+    assert llm_policy.stats()[tool]["failures"] == 1
+
+
+def test_timeouts_within_the_deadline_become_deadline_errors(monkeypatch):
+    tool = _tool()
+    monkeypatch.setitem(llm_policy.TOOL_DEADLINES, tool, 0.05)
+
+    async def call(timeout):
+        await asyncio.sleep(1)
+
+    with pytest.raises(llm_policy.LLMDeadlineExceeded):
+        asyncio.run(llm_policy.acall_with_policy(tool, call))
+    assert llm_policy.stats()[tool]["timeouts"] == 1
+
+
+def test_passed_deadline_is_shared_and_not_extended():
+    tool = _tool()
+    calls = []
+    with pytest.raises(llm_policy.LLMDeadlineExceeded):
+        llm_policy.call_with_policy(tool, calls.append, deadline=time.monotonic() - 1)
+    assert calls == []
+
+    timeouts = []
+    llm_policy.call_with_policy(tool, timeouts.append, deadline=time.monotonic() + 5)
+    assert 0 < timeouts[0] <= 5
+
+
+def test_slow_call_is_hedged_and_the_backup_wins(monkeypatch):
+    tool = _tool()
+    monkeypatch.setattr(llm_policy, "LLM_HEDGE_TOOLS", {tool})
+    monkeypatch.setattr(llm_policy, "LLM_HEDGE_MIN_SAMPLES", 1)
+    llm_policy._record(tool, latency=0.02)
+    attempts = []
+    lock = threading.Lock()
+
+    def call(timeout):
+        with lock:
+            attempts.append(timeout)
+            first = len(attempts) == 1
+        if first:
+            time.sleep(0.5)
+            return "primary"
+        return "backup"
+
+    assert llm_policy.call_with_policy(tool, call) == "backup"
+    stats = llm_policy.stats()[tool]
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_fallback_models_share_one_deadline(monkeypatch):
+    deadlines = []
+
+    def failing_call(tool, call, deadline=None):
+        deadlines.append(deadline)
+        raise openai.InternalServerError("down", response=_response(503), body=None)
+
+    monkeypatch.setattr(tools, "call_with_policy", failing_call)
+    monkeypatch.setattr(tools.model_router, "candidates", lambda tool: ["model-a", "model-b", "model-c"])
+    with tools.tracing.span("test") as tool_span, pytest.raises(openai.InternalServerError):
+        tools._call_models("parse_cv", "key", {"messages": []}, tool_span)
+    assert len(deadlines) == 3
+    assert deadlines[0] is not None and len(set(deadlines)) == 1
+
+
+@pytest.mark.parametrize("error, falls_back", [
+    (openai.InternalServerError("down", response=_response(503), body=None), True),
+    (openai.NotFoundError("no such model", response=_response(404), body=None), True),
+    (openai.BadRequestError("bad request", response=_response(400), body=None), False),
+    (openai.AuthenticationError("bad key", response=_response(401), body=None), False),
+])
+def test_only_model_specific_failures_fall_back(monkeypatch, error, falls_back):
+    models = []
+
+    def failing_call(tool, call, deadline=None):
+        models.append(tool)
+        raise error
+
+    monkeypatch.setattr(tools, "call_with_policy", failing_call)
+    monkeypatch.setattr(tools.model_router, "candidates", lambda tool: ["model-a", "model-b"])
+    with tools.tracing.span("test") as tool_span, pytest.raises(type(error)):
+        tools._call_models("parse_cv", "key", {"messages": []}, tool_span)
+    assert len(models) == (2 if falls_back else 1)
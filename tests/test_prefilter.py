@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+import numpy as np
+
+from batch import BatchItem, run_shortlisted_batch
+from prefilter import shortlist, similarity_scores
+
+JD = "Senior Python developer with Django, PostgreSQL and AWS experience"
+
+
+def test_scores_rank_the_matching_cv_first():
+    cvs = [
+        "Pastry chef experienced in French desserts and bread",
+        "Python developer building Django services on PostgreSQL, deployed to AWS",
+        "Java developer working with Spring and Oracle",
+    ]
+    scores = similarity_scores(cvs, JD)
+    assert scores.shape == (3,)
+    assert np.all((scores >= 0) & (scores <= 1.0001))
+    assert int(np.argmax(scores)) == 1
+    assert scores[0] == 0
+
+
+def test_scores_without_input():
+    assert similarity_scores([], JD).shape == (0,)
+    assert not similarity_scores(["Python developer"], "the and of").any()
+
+
+def test_shortlist_applies_top_k_and_min_score():
+    scores = np.array([0.2, 0.9, 0.05, 0.5], dtype=np.float32)
+    assert shortlist(scores, top_k=2, min_score=0.0) == [1, 3]
+    assert shortlist(scores, top_k=10, min_score=0.1) == [1, 3, 0]
+    assert shortlist(scores, top_k=0, min_score=0.0) == []
+
+
+def test_shortlisted_batch_only_sends_the_shortlist_to_the_worker():
+    items = [
+        BatchItem("chef.txt", text="Pastry chef experienced in French desserts"),
+        BatchItem("python.txt", text="Python developer using Django, PostgreSQL and AWS"),
+    ]
+    compared = []
+
+    async def worker(cv_text):
+        compared.append(cv_text)
+        return {"match_score": 80}
+
+    async def scenario():
+        return [json.loads(line) async for line in run_shortlisted_batch(items, JD, worker, top_k=1)]
+
+    lines = asyncio.run(scenario())
+    assert compared == [items[1].text]
+    assert lines[0] == {"index": 0, "source": "chef.txt", "success": True, "shortlisted": False, "prefilter_score": 0.0}
+    assert lines[1]["shortlisted"] is True and lines[1]["prefilter_rank"] == 1
+    assert lines[-1]["summary"] == {"total": 2, "shortlisted": 1, "succeeded": 2, "failed": 0}
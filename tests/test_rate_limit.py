@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+import pytest
+
+from rate_limit import RateLimiter, TokenBucket, estimate_request
+
+
+def test_bucket_serves_its_burst_then_queues_reservations_in_order():
+    bucket = TokenBucket(60)  # one per second, burst of 60
+    now = bucket.updated
+    assert [bucket.reserve(1, now) for _ in range(60)] == [0.0] * 60
+    # Each later caller waits one second longer than the one before it
+    assert [bucket.reserve(1, now) for _ in range(3)] == pytest.approx([1.0, 2.0, 3.0])
+
+
+def test_bucket_refills_over_time():
+    bucket = TokenBucket(60)
+    now = bucket.updated
+    bucket.reserve(60, now)
+    assert bucket.reserve(1, now + 1.0) == pytest.approx(0.0)
+    assert bucket.reserve(1, now + 1.0) == pytest.approx(1.0)
+
+
+def test_oversized_reservation_is_capped_at_the_burst():
+    bucket = TokenBucket(600)
+    now = bucket.updated
+    assert bucket.reserve(10_000, now) == 0.0
+    assert bucket.reserve(600, now) == pytest.approx(60.0)
+
+
+def test_limiter_delays_by_the_tighter_limit_and_tracks_the_queue():
+    limiter = RateLimiter(overrides={"model": (600, 1000)})
+    model_limiter, delay = limiter._reserve("model", 1000)
+    assert delay == 0.0
+    # The request bucket has room; the token bucket is empty
+    model_limiter, delay = limiter._reserve("model", 500)
+    assert delay == pytest.approx(30.0)
+    assert limiter.stats()["model"]["queue_depth"] == 1
+    limiter._release(model_limiter)
+    assert limiter.stats()["model"]["queue_depth"] == 0
+
+
+def test_unlimited_models_pass_straight_through():
+    limiter = RateLimiter(rpm=0, tpm=0, overrides={})
+
+    async def scenario():
+        await limiter.aacquire("model", 10_000)
+
+    asyncio.run(scenario())
+    limiter.acquire("model", 10_000)
+    assert limiter.stats() == {}
+
+
+def test_estimate_request():
+    body = json.dumps({"model": "m", "messages": [{"role": "user", "content": "x" * 398}], "max_tokens": 50})
+    assert estimate_request(body.encode()) == ("m", 100 + 50)
+    assert estimate_request(b"not json") == (None, 0)
@@ -1,32 +1,327 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+from typing import Optional, Tuple, Union
+import asyncio
+import importlib.util
+import json
 import os
+import time
+import httpx
+import openai
 from dotenv import load_dotenv
+from cache import LRUCache, content_hash, in_flight, normalize_text, response_cache
+import compaction
+from compaction import prepare_inputs
+from cv_document import CVDocument, CV_DOCUMENT_SHAPE
+from fake_llm import AsyncFakeLLMTransport, FakeLLMTransport, tool_scope
+from keywords import extract_keywords_local
+from llm_policy import RETRYABLE_ERRORS, acall_with_policy, call_with_policy, tool_deadline
+import metrics
+from model_router import model_router
+from prompt_cache import AsyncPromptCacheTransport, PromptCacheTransport, cached_tokens
+from rate_limit import estimate_request, rate_limiter
+import tracing
+from tracing import AsyncTracingTransport, TracingTransport
 
 load_dotenv()
 
+# "openrouter" sends completions to OPENROUTER_BASE_URL; "fake" answers them
+# locally and deterministically (see fake_llm.py) and needs no API key
+LLM_BACKENDS = ("openrouter", "fake")
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openrouter").lower()
+if LLM_BACKEND not in LLM_BACKENDS:
+    raise RuntimeError(f"Invalid LLM_BACKEND: {LLM_BACKEND}. Allowed: {', '.join(LLM_BACKENDS)}")
+
 # Initialize OpenRouter client
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
 if not OPENROUTER_API_KEY:
-    raise RuntimeError("Missing OpenRouter API key")
+    if LLM_BACKEND != "fake":
+        raise RuntimeError("Missing OpenRouter API key. Set OPENROUTER_API_KEY in environment or .env file, or use LLM_BACKEND=fake")
+    OPENROUTER_API_KEY = "fake"
+
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+# HTTP connection pool shared by all tool calls (and the agent's model)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "120"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "120"))
+LLM_PREWARM_CONNECTIONS = int(os.getenv("LLM_PREWARM_CONNECTIONS", "4"))
+
+# HTTP/2 lets concurrent requests share one TLS connection; needs the h2 package
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+
+_limits = httpx.Limits(
+    max_connections=LLM_MAX_CONNECTIONS,
+    max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+)
+_timeout = httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+
+# Outbound completions wait for the shared RPM/TPM limiter before being sent.
+# Hooked into the HTTP clients so the agent's model calls are limited too.
+def _limit_request(request: httpx.Request):
+    if request.method == "POST" and request.url.path.endswith("/chat/completions"):
+        model, tokens = estimate_request(request.content)
+        if model:
+            rate_limiter.acquire(model, tokens)
+
+
+async def _alimit_request(request: httpx.Request):
+    if request.method == "POST" and request.url.path.endswith("/chat/completions"):
+        model, tokens = estimate_request(request.content)
+        if model:
+            await rate_limiter.aacquire(model, tokens)
+
+
+if LLM_BACKEND == "fake":
+    _transport, _async_transport = FakeLLMTransport(), AsyncFakeLLMTransport()
+else:
+    _transport = httpx.HTTPTransport(limits=_limits, http2=HTTP2_ENABLED)
+    _async_transport = httpx.AsyncHTTPTransport(limits=_limits, http2=HTTP2_ENABLED)
+
+# The tracing transports record a span per upstream HTTP call; the prompt cache
+# transports mark cacheable prompt prefixes for providers that need it
+http_client = httpx.Client(
+    transport=TracingTransport(PromptCacheTransport(_transport)), timeout=_timeout,
+    event_hooks={"request": [_limit_request]}
+)
+async_http_client = httpx.AsyncClient(
+    transport=AsyncTracingTransport(AsyncPromptCacheTransport(_async_transport)), timeout=_timeout,
+    event_hooks={"request": [_alimit_request]}
+)
 
+# Retries are handled by llm_policy (with per-tool deadlines), not the SDK
 client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=OPENROUTER_API_KEY
+    base_url=OPENROUTER_BASE_URL,
+    api_key=OPENROUTER_API_KEY,
+    http_client=http_client,
+    max_retries=0
 )
 
+async_client = AsyncOpenAI(
+    base_url=OPENROUTER_BASE_URL,
+    api_key=OPENROUTER_API_KEY,
+    http_client=async_http_client,
+    max_retries=0
+)
 
-def parse_cv(cv_content: str) -> str:
-    """
-    Parse CV/Resume using LLM to extract structured information.
+# Bump whenever a prompt template changes so cached responses are invalidated
+PROMPT_VERSION = "4"
+
+# Parsed CVs are kept per content hash so a CV is parsed once and search
+# indexing can use its sections. Downstream tools send the compact
+# serialization instead of the raw text when a caller passes the CVDocument.
+CV_DOCUMENT_CACHE_ENTRIES = int(os.getenv("CV_DOCUMENT_CACHE_ENTRIES", "1024"))
+_cv_documents = LRUCache(CV_DOCUMENT_CACHE_ENTRIES)
+
+CVInput = Union[str, CVDocument]
+
+# extract_keywords engine: "llm" asks the model, "local" ranks deterministically
+# without an LLM call, "hybrid" lets the model re-rank the local candidates.
+# The LLM stays the default so existing /keywords output is unchanged; the local
+# engine is opt-in per request or deployment.
+KEYWORD_MODES = ("local", "llm", "hybrid")
+KEYWORD_MODE = os.getenv("KEYWORD_MODE", "llm")
+
+
+async def warm_up_connections(count: int = LLM_PREWARM_CONNECTIONS):
+    """Open pooled connections ahead of the first request so it skips the TLS handshake"""
+    if LLM_BACKEND == "fake":
+        return
+
+    async def touch_async():
+        try:
+            await async_http_client.head(OPENROUTER_BASE_URL)
+        except httpx.HTTPError:
+            pass
+
+    def touch_sync():
+        try:
+            http_client.head(OPENROUTER_BASE_URL)
+        except httpx.HTTPError:
+            pass
+
+    await asyncio.gather(
+        *(touch_async() for _ in range(count)),
+        *(asyncio.to_thread(touch_sync) for _ in range(count))
+    )
 
-    Args:
-        cv_content: The CV text content to parse
 
-    Returns:
-        Structured parsing results from LLM
+async def close_clients():
+    """Release pooled connections on shutdown"""
+    await async_http_client.aclose()
+    http_client.close()
+
+
+def _chat_params(system: str, instructions: str, prompt: str, temperature: float, max_tokens: Optional[int],
+                 json_mode: bool = False) -> dict:
+    params = {
+        "messages": [
+            # Identical for every call of a tool: a cacheable prompt prefix
+            {"role": "system", "content": f"{system}\n{instructions}" if instructions else system},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": temperature
+    }
+    if max_tokens is not None:
+        params["max_tokens"] = max_tokens
+    if json_mode:
+        params["response_format"] = {"type": "json_object"}
+    return params
+
+
+def _usage_attributes(response) -> dict:
+    """Token counts of a completion as span attributes"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {}
+    return {"input_tokens": usage.prompt_tokens or 0, "output_tokens": usage.completion_tokens or 0,
+            "cached_tokens": cached_tokens(usage)}
+
+
+def _complete(tool: str, inputs: dict, system: str, instructions: str, prompt: str, temperature: float, max_tokens: Optional[int] = None,
+              json_mode: bool = False) -> str:
+    """
+    Run a chat completion for a tool, serving byte-identical requests from the
+    response cache and joining an identical call that is already in flight
     """
-    prompt = f"""
-    Analyze the following CV/Resume and extract structured information in JSON format.
+    with tracing.span(f"tool.{tool}", tool=tool) as tool_span:
+        key = response_cache.make_key(tool, inputs, model_router.primary(tool), temperature, max_tokens, PROMPT_VERSION)
+        cached = response_cache.get(key)
+        tool_span.set(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
+
+        params = _chat_params(system, instructions, prompt, temperature, max_tokens, json_mode)
+        content, coalesced = in_flight.do(key, lambda: _call_models(tool, key, params, tool_span))
+        tool_span.set(coalesced=coalesced)
+        if coalesced:
+            metrics.record_coalesced(tool)
+        return content
+
+
+# Errors after which the next routed model is tried: transient failures that
+# outlasted the retries, and a model the provider does not serve. Other client
+# errors (bad request, bad key) would fail the same way on every model.
+FALLBACK_ERRORS = RETRYABLE_ERRORS + (openai.NotFoundError,)
+
+
+def _call_models(tool: str, key: str, params: dict, tool_span) -> str:
+    """Complete with the tool's routed models and cache the result"""
+    # Try the routed models in order; a model that still fails after retries falls back to the next.
+    # All of them share the tool's one deadline.
+    models = model_router.candidates(tool)
+    deadline = time.monotonic() + tool_deadline(tool)
+    for position, model in enumerate(models):
+        started = time.perf_counter()
+        try:
+            with tool_scope(tool):
+                response = call_with_policy(
+                    tool, lambda timeout, model=model: client.chat.completions.create(**params, model=model, timeout=timeout),
+                    deadline
+                )
+        except FALLBACK_ERRORS:
+            metrics.observe_llm_call(tool, model, started)
+            model_router.record(model, fallback=position < len(models) - 1)
+            if position == len(models) - 1:
+                raise
+            continue
+        except Exception:
+            metrics.observe_llm_call(tool, model, started)
+            raise
+        metrics.observe_llm_call(tool, model, started, response)
+        model_router.record(model, time.perf_counter() - started)
+        usage = _usage_attributes(response)
+        tool_span.set(model=model, **usage)
+        compaction.record_cached_tokens(usage.get("cached_tokens", 0))
+        break
+
+    content = response.choices[0].message.content
+    # Cached before the in-flight entry is released, so later callers find it
+    response_cache.set(key, content)
+    return content
+
+
+async def _acomplete(tool: str, inputs: dict, system: str, instructions: str, prompt: str, temperature: float, max_tokens: Optional[int] = None,
+                     json_mode: bool = False) -> str:
+    """Async counterpart of _complete using the pooled async client"""
+    with tracing.span(f"tool.{tool}", tool=tool) as tool_span:
+        key = response_cache.make_key(tool, inputs, model_router.primary(tool), temperature, max_tokens, PROMPT_VERSION)
+        cached = await response_cache.aget(key)
+        tool_span.set(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
+
+        params = _chat_params(system, instructions, prompt, temperature, max_tokens, json_mode)
+        content, coalesced = await in_flight.ado(key, lambda: _acall_models(tool, key, params, tool_span))
+        tool_span.set(coalesced=coalesced)
+        if coalesced:
+            metrics.record_coalesced(tool)
+        return content
+
+
+async def _acall_models(tool: str, key: str, params: dict, tool_span) -> str:
+    """Async counterpart of _call_models"""
+    models = model_router.candidates(tool)
+    deadline = time.monotonic() + tool_deadline(tool)
+    for position, model in enumerate(models):
+        started = time.perf_counter()
+        try:
+            with tool_scope(tool):
+                response = await acall_with_policy(
+                    tool, lambda timeout, model=model: async_client.chat.completions.create(**params, model=model, timeout=timeout),
+                    deadline
+                )
+        except FALLBACK_ERRORS:
+            metrics.observe_llm_call(tool, model, started)
+            model_router.record(model, fallback=position < len(models) - 1)
+            if position == len(models) - 1:
+                raise
+            continue
+        except Exception:
+            metrics.observe_llm_call(tool, model, started)
+            raise
+        metrics.observe_llm_call(tool, model, started, response)
+        model_router.record(model, time.perf_counter() - started)
+        usage = _usage_attributes(response)
+        tool_span.set(model=model, **usage)
+        compaction.record_cached_tokens(usage.get("cached_tokens", 0))
+        break
+
+    content = response.choices[0].message.content
+    await response_cache.aset(key, content)
+    return content
+
+
+def cv_content_hash(cv_content: str) -> str:
+    """Hash identifying a CV regardless of whitespace differences"""
+    return content_hash(normalize_text(cv_content))
+
+
+def cached_cv_document(cv_content: str) -> Optional[CVDocument]:
+    """The parsed form of a CV if parse_cv has already produced it"""
+    return _cv_documents.get(cv_content_hash(cv_content))
+
+
+def compact_cv_input(cv_content: str) -> CVInput:
+    """The parsed form of a CV for comparison and planning prompts if it is cached, else the text"""
+    return cached_cv_document(cv_content) or cv_content
+
+
+def _prompt_inputs(cv_content: CVInput, job_description: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """CV and job description text for a prompt, compacted and fitted to the token budget"""
+    cv_text = cv_content.to_prompt() if isinstance(cv_content, CVDocument) else cv_content
+    return prepare_inputs(cv_text, job_description)
+
+
+# Prompt templates: static task instructions go in the system message, ahead
+# of everything that varies per request, so providers can cache the prefix.
+# The user message carries only the CV/JD text and per-call parameters.
+
+_PARSE_CV_INSTRUCTIONS = f"""
+    Analyze the CV/Resume in the user message and extract structured information in JSON format.
 
     Extract the following sections:
     - Contact Information (name, email, phone, LinkedIn, location)
@@ -38,37 +333,84 @@ def parse_cv(cv_content: str) -> str:
     - Projects (if any)
     - Additional sections (awards, publications, volunteer work, etc.)
 
-    CV Content:
-    {cv_content}
-
-    Provide a comprehensive structured analysis in JSON format.
+    Return a single JSON object with exactly this shape (use null or [] for missing data):
+    {CV_DOCUMENT_SHAPE}
     """
 
-    response = client.chat.completions.create(
-        model="google/gemini-2.5-flash",
-        messages=[
-            {"role": "system", "content": "You are an expert CV parser. Extract information accurately and return valid JSON."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.3
+
+def _parse_cv_request(cv_content: str) -> dict:
+    cv_text, _ = _prompt_inputs(cv_content)
+    return dict(
+        tool="parse_cv",
+        inputs={"cv_content": cv_text},
+        system="You are an expert CV parser. Extract information accurately and return valid JSON.",
+        instructions=_PARSE_CV_INSTRUCTIONS,
+        prompt=f"CV Content:\n{cv_text}",
+        temperature=0.3,
+        json_mode=True
     )
 
-    return response.choices[0].message.content
 
+def parse_cv_document(cv_content: str) -> CVDocument:
+    """
+    Parse a CV into a validated CVDocument, cached per content hash.
 
-def extract_keywords(text: str, top_n: int = 20) -> str:
+    Args:
+        cv_content: The CV text content to parse
+
+    Returns:
+        Structured CVDocument
+
+    Raises:
+        ValueError: If the model output is not a valid CV document
+    """
+    key = cv_content_hash(cv_content)
+    document = _cv_documents.get(key)
+    if document is None:
+        document = CVDocument.from_llm_json(_complete(**_parse_cv_request(cv_content)), content_hash=key)
+        _cv_documents.set(key, document)
+    return document
+
+
+async def aparse_cv_document(cv_content: str) -> CVDocument:
+    """Async variant of parse_cv_document."""
+    key = cv_content_hash(cv_content)
+    document = _cv_documents.get(key)
+    if document is None:
+        document = CVDocument.from_llm_json(await _acomplete(**_parse_cv_request(cv_content)), content_hash=key)
+        _cv_documents.set(key, document)
+    return document
+
+
+def parse_cv(cv_content: str) -> str:
     """
-    Extract important keywords from text using LLM analysis.
+    Parse CV/Resume using LLM to extract structured information.
 
     Args:
-        text: Text to extract keywords from
-        top_n: Number of top keywords to return
+        cv_content: The CV text content to parse
 
     Returns:
-        List of keywords with relevance analysis
+        Structured parsing results from LLM
     """
-    prompt = f"""
-    Analyze the following text and extract the top {top_n} most important keywords and key phrases.
+    try:
+        return parse_cv_document(cv_content).model_dump_json(indent=2, exclude={"content_hash"})
+    except ValueError:
+        # Unvalidated output is still useful to a reader; it is served from the response cache
+        return _complete(**_parse_cv_request(cv_content))
+
+
+async def aparse_cv(cv_content: str) -> str:
+    """Async variant of parse_cv."""
+    try:
+        document = await aparse_cv_document(cv_content)
+        return document.model_dump_json(indent=2, exclude={"content_hash"})
+    except ValueError:
+        return await _acomplete(**_parse_cv_request(cv_content))
+
+
+_EXTRACT_KEYWORDS_INSTRUCTIONS = """
+    Analyze the text in the user message and extract the most important keywords and key phrases,
+    as many as the user message asks for.
 
     Focus on:
     - Technical skills and tools
@@ -79,37 +421,88 @@ def extract_keywords(text: str, top_n: int = 20) -> str:
 
     Rank them by importance and relevance for job matching and ATS systems.
 
-    Text:
-    {text}
-
     Return a JSON array with keywords, their category (skill/tool/action/domain), and importance score.
     """
 
-    response = client.chat.completions.create(
-        model="google/gemini-2.5-flash",
-        messages=[
-            {"role": "system", "content": "You are an expert in keyword extraction for resumes and job descriptions. Focus on ATS-relevant terms."},
-            {"role": "user", "content": prompt}
-        ],
+
+def _extract_keywords_request(text: str, top_n: int = 20) -> dict:
+    text, _ = prepare_inputs(text)
+    return dict(
+        tool="extract_keywords",
+        inputs={"text": text, "top_n": top_n},
+        system="You are an expert in keyword extraction for resumes and job descriptions. Focus on ATS-relevant terms.",
+        instructions=_EXTRACT_KEYWORDS_INSTRUCTIONS,
+        prompt=f"Number of keywords: {top_n}\n\nText:\n{text}",
         temperature=0.3
     )
 
-    return response.choices[0].message.content
 
+_RERANK_KEYWORDS_INSTRUCTIONS = """
+    Re-rank the candidate keywords in the user message by importance for job matching and ATS systems
+    and return as many as the user message asks for. Only use candidates from the list; do not invent new ones.
+    The text excerpt is context only.
 
-def compare_cv_with_job(cv_content: str, job_description: str) -> str:
+    Return a JSON array with keywords, their category (skill/tool/action/domain), and importance score.
     """
-    Compare CV against job description using LLM to identify matches and gaps.
+
+
+def _rerank_keywords_request(text: str, top_n: int = 20) -> dict:
+    text, _ = prepare_inputs(text)
+    candidates = extract_keywords_local(text, top_n * 3)
+    candidate_list = "\n".join(f"- {item['keyword']} ({item['category']})" for item in candidates)
+    return dict(
+        tool="extract_keywords_rerank",
+        inputs={"text": text, "top_n": top_n},
+        system="You are an expert in keyword extraction for resumes and job descriptions. Focus on ATS-relevant terms.",
+        instructions=_RERANK_KEYWORDS_INSTRUCTIONS,
+        prompt=f"Number of keywords: {top_n}\n\nCandidates:\n{candidate_list}\n\nText excerpt for context:\n{text[:2000]}",
+        temperature=0.2,
+        max_tokens=1000
+    )
+
+
+def _keyword_mode(mode: Optional[str]) -> str:
+    mode = (mode or KEYWORD_MODE).lower()
+    if mode not in KEYWORD_MODES:
+        raise ValueError(f"Invalid keyword mode: {mode}. Allowed: {', '.join(KEYWORD_MODES)}")
+    return mode
+
+
+def extract_keywords(text: str, top_n: int = 20, mode: Optional[str] = None) -> str:
+    """
+    Extract important keywords from text.
 
     Args:
-        cv_content: CV text content
-        job_description: Job description text
+        text: Text to extract keywords from
+        top_n: Number of top keywords to return
+        mode: "local" (deterministic, no LLM call), "llm" or "hybrid" (LLM re-ranks
+            local candidates); defaults to KEYWORD_MODE
 
     Returns:
-        Detailed comparison analysis
+        List of keywords with relevance analysis
     """
-    prompt = f"""
-    Compare the following CV with the Job Description and provide a comprehensive analysis.
+    mode = _keyword_mode(mode)
+    if mode == "local":
+        with tracing.span("tool.extract_keywords", tool="extract_keywords", mode="local"):
+            return json.dumps(extract_keywords_local(text, top_n), indent=2)
+    if mode == "hybrid":
+        return _complete(**_rerank_keywords_request(text, top_n))
+    return _complete(**_extract_keywords_request(text, top_n))
+
+
+async def aextract_keywords(text: str, top_n: int = 20, mode: Optional[str] = None) -> str:
+    """Async variant of extract_keywords."""
+    mode = _keyword_mode(mode)
+    if mode == "local":
+        with tracing.span("tool.extract_keywords", tool="extract_keywords", mode="local"):
+            return json.dumps(extract_keywords_local(text, top_n), indent=2)
+    if mode == "hybrid":
+        return await _acomplete(**_rerank_keywords_request(text, top_n))
+    return await _acomplete(**_extract_keywords_request(text, top_n))
+
+
+_COMPARE_CV_WITH_JOB_INSTRUCTIONS = """
+    Compare the CV in the user message with the Job Description and provide a comprehensive analysis.
 
     Analyze:
     1. Keyword Match - Which required keywords from the job description are present/missing in the CV
@@ -119,43 +512,44 @@ def compare_cv_with_job(cv_content: str, job_description: str) -> str:
     5. Overall Fit Score (0-100)
     6. Specific recommendations to improve match
 
-    CV:
-    {cv_content}
-
-    Job Description:
-    {job_description}
-
     Provide detailed analysis in JSON format with specific examples and actionable recommendations.
     """
 
-    response = client.chat.completions.create(
-        model="google/gemini-2.5-flash",
-        messages=[
-            {"role": "system", "content": "You are an expert recruiter and ATS specialist. Provide detailed, actionable matching analysis."},
-            {"role": "user", "content": prompt}
-        ],
+
+def _compare_cv_with_job_request(cv_content: CVInput, job_description: str) -> dict:
+    cv_content, job_description = _prompt_inputs(cv_content, job_description)
+    return dict(
+        tool="compare_cv_with_job",
+        inputs={"cv_content": cv_content, "job_description": job_description},
+        system="You are an expert recruiter and ATS specialist. Provide detailed, actionable matching analysis.",
+        instructions=_COMPARE_CV_WITH_JOB_INSTRUCTIONS,
+        prompt=f"CV:\n{cv_content}\n\nJob Description:\n{job_description}",
         temperature=0.3,
         max_tokens=2000
     )
 
-    return response.choices[0].message.content
-
 
-def evaluate_ats_score(cv_content: str, job_description: str = None) -> str:
+def compare_cv_with_job(cv_content: str, job_description: str) -> str:
     """
-    Evaluate ATS (Applicant Tracking System) compatibility using LLM.
+    Compare CV against job description using LLM to identify matches and gaps.
 
     Args:
         cv_content: CV text content
-        job_description: Optional job description for context
+        job_description: Job description text
 
     Returns:
-        Comprehensive ATS evaluation with score and recommendations
+        Detailed comparison analysis
     """
-    jd_context = f"\n\nJob Description for context:\n{job_description}" if job_description else ""
+    return _complete(**_compare_cv_with_job_request(cv_content, job_description))
+
+
+async def acompare_cv_with_job(cv_content: CVInput, job_description: str) -> str:
+    """Async variant of compare_cv_with_job."""
+    return await _acomplete(**_compare_cv_with_job_request(cv_content, job_description))
 
-    prompt = f"""
-    Evaluate the following CV for ATS (Applicant Tracking System) compatibility.
+
+_EVALUATE_ATS_SCORE_INSTRUCTIONS = """
+    Evaluate the CV in the user message for ATS (Applicant Tracking System) compatibility.
 
     Analyze these critical areas:
 
@@ -180,10 +574,6 @@ def evaluate_ats_score(cv_content: str, job_description: str = None) -> str:
     5. **Job Match** (0-10 points)
        - Alignment with job requirements (if job description provided)
 
-    CV Content:
-    {cv_content}
-    {jd_context}
-
     Provide:
     - Overall ATS Score (0-100)
     - Score breakdown for each area
@@ -194,31 +584,42 @@ def evaluate_ats_score(cv_content: str, job_description: str = None) -> str:
     Return analysis in JSON format.
     """
 
-    response = client.chat.completions.create(
-        model="google/gemini-2.5-flash",
-        messages=[
-            {"role": "system", "content": "You are an ATS (Applicant Tracking System) expert. Evaluate resumes thoroughly and provide actionable feedback."},
-            {"role": "user", "content": prompt}
-        ],
+
+def _evaluate_ats_score_request(cv_content: CVInput, job_description: str = None) -> dict:
+    cv_content, job_description = _prompt_inputs(cv_content, job_description)
+    jd_context = f"\n\nJob Description for context:\n{job_description}" if job_description else ""
+    return dict(
+        tool="evaluate_ats_score",
+        inputs={"cv_content": cv_content, "job_description": job_description},
+        system="You are an ATS (Applicant Tracking System) expert. Evaluate resumes thoroughly and provide actionable feedback.",
+        instructions=_EVALUATE_ATS_SCORE_INSTRUCTIONS,
+        prompt=f"CV Content:\n{cv_content}{jd_context}",
         temperature=0.3,
         max_tokens=2500
     )
 
-    return response.choices[0].message.content
-
 
-def analyze_cv_issues(cv_content: str) -> str:
+def evaluate_ats_score(cv_content: str, job_description: str = None) -> str:
     """
-    Deep analysis of CV to identify all issues and improvement areas using LLM.
+    Evaluate ATS (Applicant Tracking System) compatibility using LLM.
 
     Args:
         cv_content: CV text content
+        job_description: Optional job description for context
 
     Returns:
-        Comprehensive issue analysis with categorized problems
+        Comprehensive ATS evaluation with score and recommendations
     """
-    prompt = f"""
-    Perform a comprehensive analysis of this CV to identify all issues and areas for improvement.
+    return _complete(**_evaluate_ats_score_request(cv_content, job_description))
+
+
+async def aevaluate_ats_score(cv_content: CVInput, job_description: str = None) -> str:
+    """Async variant of evaluate_ats_score."""
+    return await _acomplete(**_evaluate_ats_score_request(cv_content, job_description))
+
+
+_ANALYZE_CV_ISSUES_INSTRUCTIONS = """
+    Perform a comprehensive analysis of the CV in the user message to identify all issues and areas for improvement.
 
     Categorize issues into:
 
@@ -242,9 +643,6 @@ def analyze_cv_issues(cv_content: str) -> str:
        - Content enrichment ideas
        - Modern best practices
 
-    CV Content:
-    {cv_content}
-
     For each issue:
     - Clearly describe the problem
     - Explain why it matters
@@ -254,36 +652,41 @@ def analyze_cv_issues(cv_content: str) -> str:
     Return comprehensive analysis in JSON format.
     """
 
-    response = client.chat.completions.create(
-        model="google/gemini-2.5-flash",
-        messages=[
-            {"role": "system", "content": "You are a professional resume writer and career coach. Identify issues comprehensively and provide actionable solutions."},
-            {"role": "user", "content": prompt}
-        ],
+
+def _analyze_cv_issues_request(cv_content: CVInput) -> dict:
+    cv_content, _ = _prompt_inputs(cv_content)
+    return dict(
+        tool="analyze_cv_issues",
+        inputs={"cv_content": cv_content},
+        system="You are a professional resume writer and career coach. Identify issues comprehensively and provide actionable solutions.",
+        instructions=_ANALYZE_CV_ISSUES_INSTRUCTIONS,
+        prompt=f"CV Content:\n{cv_content}",
         temperature=0.3,
         max_tokens=2500
     )
 
-    return response.choices[0].message.content
 
-
-def generate_cv_rewrite(cv_content: str, job_description: str = None, focus_areas: str = None) -> str:
+def analyze_cv_issues(cv_content: str) -> str:
     """
-    Generate rewritten/improved version of CV using LLM.
+    Deep analysis of CV to identify all issues and improvement areas using LLM.
 
     Args:
-        cv_content: Original CV text content
-        job_description: Optional job description to tailor CV
-        focus_areas: Specific areas to focus improvement on
+        cv_content: CV text content
 
     Returns:
-        Rewritten CV with improvements and explanation of changes
+        Comprehensive issue analysis with categorized problems
     """
-    jd_context = f"\n\nTailor the CV for this job:\n{job_description}" if job_description else ""
-    focus_context = f"\n\nFocus especially on: {focus_areas}" if focus_areas else ""
+    return _complete(**_analyze_cv_issues_request(cv_content))
+
+
+async def aanalyze_cv_issues(cv_content: CVInput) -> str:
+    """Async variant of analyze_cv_issues."""
+    return await _acomplete(**_analyze_cv_issues_request(cv_content))
 
-    prompt = f"""
-    Rewrite and improve the following CV to make it more effective and ATS-friendly.
+
+_GENERATE_CV_REWRITE_INSTRUCTIONS = """
+    Rewrite and improve the CV in the user message to make it more effective and ATS-friendly.
+    If the user message includes a job to tailor for or areas to focus on, apply them.
 
     Improvements to make:
     1. Strengthen action verbs and quantify achievements
@@ -292,11 +695,6 @@ def generate_cv_rewrite(cv_content: str, job_description: str = None, focus_area
     4. Enhance professional summary
     5. Refine experience descriptions
     6. Better showcase skills and accomplishments
-    {jd_context}
-    {focus_context}
-
-    Original CV:
-    {cv_content}
 
     Provide:
     1. Complete rewritten CV in professional format
@@ -307,38 +705,46 @@ def generate_cv_rewrite(cv_content: str, job_description: str = None, focus_area
     Return in JSON format with separate fields for the rewritten CV and change explanations.
     """
 
-    response = client.chat.completions.create(
-        model="google/gemini-2.5-flash",
-        messages=[
-            {"role": "system", "content": "You are an expert resume writer with 15+ years experience. Create compelling, ATS-optimized resumes that get interviews."},
-            {"role": "user", "content": prompt}
-        ],
+
+def _generate_cv_rewrite_request(cv_content: str, job_description: str = None, focus_areas: str = None) -> dict:
+    cv_content, job_description = _prompt_inputs(cv_content, job_description)
+    jd_context = f"\n\nTailor the CV for this job:\n{job_description}" if job_description else ""
+    focus_context = f"\n\nFocus especially on: {focus_areas}" if focus_areas else ""
+    return dict(
+        tool="generate_cv_rewrite",
+        inputs={"cv_content": cv_content, "job_description": job_description, "focus_areas": focus_areas},
+        system="You are an expert resume writer with 15+ years experience. Create compelling, ATS-optimized resumes that get interviews.",
+        instructions=_GENERATE_CV_REWRITE_INSTRUCTIONS,
+        prompt=f"Original CV:\n{cv_content}{jd_context}{focus_context}",
         temperature=0.4,
         max_tokens=3500
     )
 
-    return response.choices[0].message.content
-
 
-def generate_improvement_plan(cv_content: str, job_description: str = None) -> str:
+def generate_cv_rewrite(cv_content: str, job_description: str = None, focus_areas: str = None) -> str:
     """
-    Generate comprehensive improvement plan for CV using LLM.
+    Generate rewritten/improved version of CV using LLM.
 
     Args:
-        cv_content: CV text content
-        job_description: Optional job description for context
+        cv_content: Original CV text content
+        job_description: Optional job description to tailor CV
+        focus_areas: Specific areas to focus improvement on
 
     Returns:
-        Detailed step-by-step improvement plan
+        Rewritten CV with improvements and explanation of changes
     """
-    jd_context = f"\n\nJob Description:\n{job_description}" if job_description else ""
+    return _complete(**_generate_cv_rewrite_request(cv_content, job_description, focus_areas))
+
+
+async def agenerate_cv_rewrite(cv_content: str, job_description: str = None, focus_areas: str = None) -> str:
+    """Async variant of generate_cv_rewrite."""
+    return await _acomplete(**_generate_cv_rewrite_request(cv_content, job_description, focus_areas))
 
-    prompt = f"""
-    Create a comprehensive, prioritized improvement plan for this CV.
 
-    CV Content:
-    {cv_content}
-    {jd_context}
+_GENERATE_IMPROVEMENT_PLAN_INSTRUCTIONS = """
+    Create a comprehensive, prioritized improvement plan for the CV in the user message.
+    If the user message includes a job description, tailor the plan to it; if it includes
+    findings from an earlier ATS evaluation and issue analysis, build the plan on them.
 
     Provide a step-by-step plan that includes:
 
@@ -369,14 +775,36 @@ def generate_improvement_plan(cv_content: str, job_description: str = None) -> s
     Return detailed plan in JSON format.
     """
 
-    response = client.chat.completions.create(
-        model="google/gemini-2.5-flash",
-        messages=[
-            {"role": "system", "content": "You are a career coach and resume expert. Create actionable, prioritized improvement plans."},
-            {"role": "user", "content": prompt}
-        ],
+
+def _generate_improvement_plan_request(cv_content: CVInput, job_description: str = None, findings: str = None) -> dict:
+    cv_content, job_description = _prompt_inputs(cv_content, job_description)
+    jd_context = f"\n\nJob Description:\n{job_description}" if job_description else ""
+    findings_context = f"\n\nFindings from the ATS evaluation and issue analysis:\n{findings}" if findings else ""
+    return dict(
+        tool="generate_improvement_plan",
+        inputs={"cv_content": cv_content, "job_description": job_description, "findings": findings},
+        system="You are a career coach and resume expert. Create actionable, prioritized improvement plans.",
+        instructions=_GENERATE_IMPROVEMENT_PLAN_INSTRUCTIONS,
+        prompt=f"CV Content:\n{cv_content}{jd_context}{findings_context}",
         temperature=0.3,
         max_tokens=3000
     )
 
-    return response.choices[0].message.content
+
+def generate_improvement_plan(cv_content: str, job_description: str = None) -> str:
+    """
+    Generate comprehensive improvement plan for CV using LLM.
+
+    Args:
+        cv_content: CV text content
+        job_description: Optional job description for context
+
+    Returns:
+        Detailed step-by-step improvement plan
+    """
+    return _complete(**_generate_improvement_plan_request(cv_content, job_description))
+
+
+async def agenerate_improvement_plan(cv_content: CVInput, job_description: str = None, findings: str = None) -> str:
+    """Async variant of generate_improvement_plan; `findings` grounds the plan in earlier analysis results."""
+    return await _acomplete(**_generate_improvement_plan_request(cv_content, job_description, findings))
@@ -0,0 +1,223 @@
+from contextlib import contextmanager
+from typing import List, Optional
+import contextvars
+import json
+import os
+import queue
+import random
+import secrets
+import threading
+import time
+
+import httpx
+
+# "none" (default) disables export, "otlp" posts OTLP/HTTP JSON to
+# TRACE_OTLP_ENDPOINT, "jsonl" appends spans to TRACE_FILE for local debugging
+# (the file is not rotated)
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+# Share of requests whose spans are exported; the trace ID header is always set
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "resume-agent")
+
+_BATCH_SIZE = 100
+_FLUSH_INTERVAL = 1.0
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "end", "attributes", "status", "sampled")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool, attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.end = None
+        self.attributes = attributes
+        self.status = "ok"
+        self.sampled = sampled
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round((self.end - self.start) * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _Exporter:
+    """Background thread that batches finished spans to the configured sink"""
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=10000)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, span: Span):
+        if TRACE_EXPORTER == "none":
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass  # Never block the request path on tracing
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + _FLUSH_INTERVAL
+            while len(batch) < _BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                if TRACE_EXPORTER == "otlp":
+                    _export_otlp(batch)
+                else:
+                    _export_jsonl(batch)
+            except Exception as e:
+                print(f"⚠️ Trace export failed: {str(e)}")
+
+
+def _export_jsonl(spans: List[Span]):
+    with open(TRACE_FILE, "a", encoding="utf-8") as trace_file:
+        trace_file.writelines(json.dumps(span.to_dict()) + "\n" for span in spans)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _export_otlp(spans: List[Span]):
+    payload = {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": "resume-agent.tracing"},
+                "spans": [
+                    {
+                        "traceId": span.trace_id,
+                        "spanId": span.span_id,
+                        "parentSpanId": span.parent_id or "",
+                        "name": span.name,
+                        "kind": 1,
+                        "startTimeUnixNano": str(int(span.start * 1e9)),
+                        "endTimeUnixNano": str(int(span.end * 1e9)),
+                        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+                        "status": {"code": 2 if span.status == "error" else 1},
+                    }
+                    for span in spans
+                ],
+            }],
+        }]
+    }
+    httpx.post(TRACE_OTLP_ENDPOINT, json=payload, timeout=5).raise_for_status()
+
+
+_exporter = _Exporter()
+_current_span = contextvars.ContextVar("trace_span", default=None)
+
+
+@contextmanager
+def _activate(span: Span):
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.status = "error"
+        span.attributes["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.end = time.time()
+        _current_span.reset(token)
+        if span.sampled:
+            _exporter.submit(span)
+
+
+@contextmanager
+def trace(name: str, traceparent: Optional[str] = None, **attributes):
+    """
+    Start a root span for a request, applying the sampling rate.
+
+    A valid W3C traceparent header continues the caller's trace and sampling decision.
+    """
+    trace_id, parent_id, sampled = secrets.token_hex(16), None, random.random() < TRACE_SAMPLE_RATE
+    parts = (traceparent or "").split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        trace_id, parent_id, sampled = parts[1], parts[2], parts[3].endswith("1")
+    with _activate(Span(name, trace_id, parent_id, sampled, attributes)) as root:
+        yield root
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child span of the current span; outside a trace it is created but never exported"""
+    parent = _current_span.get()
+    if parent is None:
+        child = Span(name, secrets.token_hex(16), None, False, attributes)
+    else:
+        child = Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+    with _activate(child) as active:
+        yield active
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def _http_attributes(request: httpx.Request) -> dict:
+    return {"http.method": request.method, "http.url": str(request.url.copy_with(query=None))}
+
+
+class TracingTransport(httpx.BaseTransport):
+    """Wraps a transport and records a span for every outbound request"""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with span(f"http {request.method} {request.url.path}", **_http_attributes(request)) as http_span:
+            response = self._transport.handle_request(request)
+            http_span.set(**{"http.status_code": response.status_code})
+            return response
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncTracingTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of TracingTransport"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with span(f"http {request.method} {request.url.path}", **_http_attributes(request)) as http_span:
+            response = await self._transport.handle_async_request(request)
+            http_span.set(**{"http.status_code": response.status_code})
+            return response
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -0,0 +1,190 @@
+import contextvars
+import os
+import threading
+from contextlib import aclosing
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.routing import APIRoute
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.responses import JSONResponse
+
+# Largest single uploaded document (a CV or job description file, or a zip member)
+UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(10 * 1024 * 1024)))
+# Largest multipart request body, e.g. a batch of CVs or a zip archive
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(100 * 1024 * 1024)))
+# Upload bytes buffered across all requests being received at once (memory spools and temp files)
+UPLOAD_DISK_CAP_BYTES = int(os.getenv("UPLOAD_DISK_CAP_BYTES", str(1024 * 1024 * 1024)))
+# Uploaded parts up to this size are kept in memory and never touch disk
+UPLOAD_MEMORY_BYTES = int(os.getenv("UPLOAD_MEMORY_BYTES", str(1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+
+def _megabytes(size: int) -> str:
+    return f"{size / (1024 * 1024):.3g} MB"
+
+
+class UploadBudget:
+    """Bytes of upload bodies currently buffered, shared by all requests"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_use = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, size: int) -> bool:
+        with self._lock:
+            if self.capacity and self.in_use + size > self.capacity:
+                self.rejected += 1
+                return False
+            self.in_use += size
+            return True
+
+    def release(self, size: int):
+        with self._lock:
+            self.in_use -= size
+
+
+upload_budget = UploadBudget(UPLOAD_DISK_CAP_BYTES)
+
+
+class UploadCharge:
+    """Upload bytes one request holds: its body plus anything expanded from it, such as zip members"""
+
+    def __init__(self):
+        self.size = 0
+
+    def add(self, size: int):
+        if self.size + size > UPLOAD_MAX_REQUEST_BYTES:
+            raise HTTPException(status_code=413, detail=f"Upload too large (max {_megabytes(UPLOAD_MAX_REQUEST_BYTES)})")
+        if not upload_budget.reserve(size):
+            raise HTTPException(status_code=503, detail="Too many uploads in progress, retry shortly",
+                                headers={"Retry-After": "1"})
+        self.size += size
+
+
+_current_charge: contextvars.ContextVar[Optional[UploadCharge]] = contextvars.ContextVar("upload_charge", default=None)
+
+
+def charge_upload(size: int):
+    """
+    Count bytes derived from the current request's upload (e.g. decompressed
+    zip members) against its size limit and the shared budget. They are
+    released with the request. Raises HTTPException 413/503 when over.
+    """
+    charge = _current_charge.get()
+    if charge is not None:
+        charge.add(size)
+
+
+class UploadLimitMiddleware:
+    """
+    Enforce the request size limit and the shared upload budget while a
+    multipart body is received, before it is spooled. Bodies that declare an
+    oversized Content-Length are refused without reading them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        declared = headers.get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > UPLOAD_MAX_REQUEST_BYTES:
+            response = JSONResponse(
+                status_code=413, content={"detail": f"Upload too large (max {_megabytes(UPLOAD_MAX_REQUEST_BYTES)})"}
+            )
+            await response(scope, receive, send)
+            return
+
+        charge = UploadCharge()
+
+        async def limited_receive():
+            message = await receive()
+            size = len(message.get("body", b""))
+            if size:
+                charge.add(size)
+            return message
+
+        token = _current_charge.set(charge)
+        try:
+            await self.app(scope, limited_receive, send)
+        finally:
+            # The form's spooled files are closed once the endpoint (and its streamed response) has returned
+            _current_charge.reset(token)
+            upload_budget.release(charge.size)
+
+
+class _UploadParser(MultiPartParser):
+    # Parts up to this size stay in memory; larger ones roll over to an anonymous temp file
+    spool_max_size = UPLOAD_MEMORY_BYTES
+
+
+class _UploadRequest(Request):
+    """Request whose multipart form is parsed with _UploadParser"""
+
+    async def _get_form(self, *, max_files=1000, max_fields=1000, max_part_size=1024 * 1024):
+        if self._form is None and self.headers.get("content-type", "").startswith("multipart/form-data"):
+            try:
+                async with aclosing(self.stream()) as stream:
+                    parser = _UploadParser(
+                        self.headers, stream, max_files=max_files, max_fields=max_fields, max_part_size=max_part_size
+                    )
+                    self._form = await parser.parse()
+            except MultiPartException as exc:
+                raise HTTPException(status_code=400, detail=exc.message)
+        return await super()._get_form(max_files=max_files, max_fields=max_fields, max_part_size=max_part_size)
+
+
+class UploadRoute(APIRoute):
+    """Route class applying the upload spooling threshold to this app's forms only"""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def upload_route_handler(request: Request):
+            return await handler(_UploadRequest(request.scope, request.receive))
+
+        return upload_route_handler
+
+
+async def read_upload(file: UploadFile, input_name: str, max_bytes: int = UPLOAD_MAX_FILE_BYTES) -> bytes:
+    """
+    Read an uploaded file in chunks, stopping as soon as it exceeds max_bytes.
+
+    Args:
+        file: The uploaded file
+        input_name: Name used in the error message
+        max_bytes: Size limit for this file
+
+    Returns:
+        The file content
+    """
+    too_large = HTTPException(status_code=413, detail=f"{input_name} is too large (max {_megabytes(max_bytes)})")
+    if file.size is not None and file.size > max_bytes:
+        raise too_large
+
+    content = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        content += chunk
+        if len(content) > max_bytes:
+            raise too_large
+    return bytes(content)
+
+
+def stats() -> dict:
+    return {
+        "max_file_bytes": UPLOAD_MAX_FILE_BYTES,
+        "max_request_bytes": UPLOAD_MAX_REQUEST_BYTES,
+        "disk_cap_bytes": UPLOAD_DISK_CAP_BYTES,
+        "in_flight_bytes": upload_budget.in_use,
+        "rejected": upload_budget.rejected,
+    }